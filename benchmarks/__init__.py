@@ -0,0 +1,14 @@
+import os
+import tempfile
+from pathlib import Path
+
+# Settings of the framework are read from environment on import. Benchmarks
+# must work without any external service, therefore they use sqlite
+# database in temporary directory, if environment doesn't define other.
+# It needs aiosqlite driver: pip install aiosqlite
+os.environ.setdefault('SERVER_HOST', '127.0.0.1')
+os.environ.setdefault('SERVER_PORT', '8001')
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+os.environ.setdefault('POSTGRES_URL', 'sqlite+aiosqlite:///{}'.format(
+    Path(tempfile.gettempdir()) / 'martin_eden_benchmarks.sqlite3',
+))
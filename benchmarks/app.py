@@ -0,0 +1,94 @@
+import json
+
+from sqlalchemy import select
+from sqlalchemy.orm import Mapped, mapped_column
+
+from martin_eden.core import db
+from martin_eden.database import (
+    Base,
+    MarshmallowToDataclass,
+    SqlAlchemyToMarshmallow,
+)
+from martin_eden.middleware import Middleware
+from martin_eden.routing import register_route
+
+USERS_COUNT = 100
+
+
+class BenchUser(Base):
+    __tablename__ = 'bench_user'
+    pk: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str]
+    age: Mapped[int]
+
+
+class BenchUserSchema(BenchUser, metaclass=SqlAlchemyToMarshmallow):
+    pass
+
+
+class BenchUserDataclass(BenchUserSchema, metaclass=MarshmallowToDataclass):
+    pass
+
+
+class BenchMiddleware(Middleware):
+    """Middleware with the cheapest hooks, it shows overhead of chain"""
+
+    async def before_request(self, _handler, _request) -> None:
+        return None
+
+    async def after_response(self, _handler, _request, response):
+        return response
+
+
+@register_route('/bench/ping/', 'get')
+async def ping() -> str:
+    return 'pong'
+
+
+@register_route(
+    '/bench/ping_middleware/', 'get',
+    middlewares=[BenchMiddleware(), BenchMiddleware()],
+)
+async def ping_with_middleware() -> str:
+    return 'pong'
+
+
+@register_route(
+    '/bench/users/', 'get',
+    response_schema=BenchUserSchema(many=True),
+    query_params={BenchUser: ['name', 'age']},
+)
+async def get_users(query_params: list) -> str:
+    async with db.create_session() as session:
+        result = await session.execute(
+            select(BenchUser).where(*query_params).limit(20),
+        )
+        return BenchUserSchema(many=True).dumps(result.scalars().all())
+
+
+@register_route(
+    '/bench/users/', 'post',
+    request_schema=BenchUserSchema(),
+    response_schema=BenchUserSchema(),
+)
+async def create_user(user: BenchUserDataclass) -> str:
+    async with db.create_session() as session:
+        session.add(BenchUser(name=user.name, age=user.age))
+        await session.commit()
+    return json.dumps({'name': user.name, 'age': user.age})
+
+
+async def prepare_database() -> None:
+    async with db.engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+
+    async with db.create_session() as session:
+        session.add_all([
+            BenchUser(name=f'user_{number}', age=20 + number % 50)
+            for number in range(USERS_COUNT)
+        ])
+        await session.commit()
+
+    # Connections must not be reused in other event loop
+    await db.engine.dispose()
@@ -0,0 +1,77 @@
+import asyncio
+import json
+import platform
+import sys
+import time
+import timeit
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Optional
+
+
+def measure(func: Callable, repeat: int = 5) -> dict[str, float]:
+    """Runs func so many times, that one measurement takes at least
+    0.2 second, and repeats measurement. The minimum is the most stable
+    value between runs, therefore it is used for comparison"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    durations = [
+        duration / number
+        for duration in timer.repeat(repeat=repeat, number=number)
+    ]
+    return _durations_to_result(durations, number)
+
+
+def measure_async(
+    func: Callable[[], Awaitable], repeat: int = 5, number: int = 1000,
+) -> dict[str, float]:
+    """The same as measure, but for coroutine functions. All calls are
+    done inside one event loop, so creation of loop is not measured"""
+    async def run_once() -> float:
+        start_time = time.perf_counter()
+        for _ in range(number):
+            await func()
+        return (time.perf_counter() - start_time) / number
+
+    async def run() -> list[float]:
+        return [await run_once() for _ in range(repeat)]
+
+    return _durations_to_result(asyncio.run(run()), number)
+
+
+def _durations_to_result(
+    durations: list[float], number: int,
+) -> dict[str, float]:
+    best = min(durations)
+    return {
+        'min_us': best * 1_000_000,
+        'mean_us': sum(durations) / len(durations) * 1_000_000,
+        'ops_per_sec': 1 / best,
+        'loops': number,
+    }
+
+
+def get_environment_info() -> dict[str, Any]:
+    return {
+        'python': sys.version,
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def write_results(
+    kind: str, results: dict[str, dict], output: Optional[str],
+) -> None:
+    """Results are written as json, so different runs can be compared
+    with benchmarks.compare module"""
+    document = json.dumps({
+        'kind': kind,
+        'environment': get_environment_info(),
+        'results': results,
+    }, indent=4)
+    if output:
+        with open(output, 'w') as file:
+            file.write(document)
+    else:
+        sys.stdout.write(document + '\n')
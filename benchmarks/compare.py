@@ -0,0 +1,67 @@
+"""Compares two json files with results of benchmarks.
+
+Usage: python -m benchmarks.compare old.json new.json [--threshold 10]
+
+Exit code is 1 if any benchmark became slower than threshold percents"""
+import argparse
+import json
+import sys
+
+# For every metric: True if bigger value is better
+COMPARED_METRICS = {
+    'min_us': False,
+    'rps': True,
+    'p99_ms': False,
+    'seconds': False,
+}
+
+
+def compare(old: dict, new: dict, threshold: float) -> list[str]:
+    """Returns names of regressed benchmarks and writes table
+    with changes of all benchmarks to stdout"""
+    regressions = []
+    for name, new_result in new['results'].items():
+        old_result = old['results'].get(name)
+        if old_result is None:
+            continue
+        for metric, bigger_is_better in COMPARED_METRICS.items():
+            if metric not in new_result or not old_result.get(metric):
+                continue
+            change = (
+                (new_result[metric] - old_result[metric]) /
+                old_result[metric] * 100
+            )
+            regressed = (
+                -change if bigger_is_better else change
+            ) > threshold
+            if regressed:
+                regressions.append(name)
+            sys.stdout.write(
+                f'{name:45} {metric:8} {old_result[metric]:12.2f} '
+                f'{new_result[metric]:12.2f} {change:+8.1f}%'
+                f'{"  REGRESSION" if regressed else ""}\n'
+            )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument(
+        '--threshold', type=float, default=10,
+        help='allowed slowdown in percents',
+    )
+    args = parser.parse_args()
+
+    with open(args.old) as file:
+        old = json.load(file)
+    with open(args.new) as file:
+        new = json.load(file)
+
+    if compare(old, new, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
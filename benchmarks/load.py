@@ -0,0 +1,155 @@
+"""End-to-end load test. Starts Backend with sqlite database in separate
+process and sends requests to it from built-in async client.
+
+Usage: python -m benchmarks.load [--requests 2000] [--concurrency 50]
+                                 [--output load.json]"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from benchmarks.common import write_results
+
+SCENARIOS = {
+    'ping': (
+        'GET /bench/ping/ HTTP/1.0\r\n'
+        'Host: localhost\r\n\r\n'
+    ),
+    'list_users': (
+        'GET /bench/users/?bench_user__age__in=20,21,22 HTTP/1.0\r\n'
+        'Host: localhost\r\n\r\n'
+    ),
+    'create_user': (
+        'POST /bench/users/ HTTP/1.0\r\n'
+        'Host: localhost\r\n'
+        'Content-Type: application/json\r\n\r\n'
+        '{"name": "martin", "age": 30}'
+    ),
+}
+SERVER_START_TIMEOUT = 10
+
+
+def get_free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def is_server_started(host: str, port: int) -> bool:
+    try:
+        with socket.create_connection((host, port), timeout=1) as sock:
+            sock.sendall(SCENARIOS['ping'].encode('utf8'))
+            sock.recv(1024)
+    except OSError:
+        return False
+    return True
+
+
+def wait_for_server(host: str, port: int) -> None:
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if is_server_started(host, port):
+            return
+        time.sleep(0.05)
+    raise TimeoutError(f'server has not started on {host}:{port}')
+
+
+@contextmanager
+def run_server(host: str, port: int) -> Iterator[None]:
+    env = dict(os.environ, SERVER_HOST=host, SERVER_PORT=str(port))
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.server'], env=env,  # noqa: S603
+    )
+    try:
+        wait_for_server(host, port)
+        yield
+    finally:
+        process.terminate()
+        process.wait()
+
+
+async def send_request(host: str, port: int, request: bytes) -> bytes:
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(request)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    await writer.wait_closed()
+    return response
+
+
+async def run_scenario(
+    host: str, port: int, request: bytes, requests: int, concurrency: int,
+) -> dict[str, float]:
+    latencies = []
+    errors = 0
+    remaining = requests
+
+    async def worker() -> None:
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            start_time = time.perf_counter()
+            try:
+                response = await send_request(host, port, request)
+            except OSError:
+                errors += 1
+                continue
+            if not response.startswith(b'HTTP/1.0 200'):
+                errors += 1
+            latencies.append(time.perf_counter() - start_time)
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = time.perf_counter() - start_time
+
+    latencies.sort()
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': errors,
+        'rps': len(latencies) / duration,
+        'p50_ms': _percentile(latencies, 0.5) * 1000,
+        'p90_ms': _percentile(latencies, 0.9) * 1000,
+        'p99_ms': _percentile(latencies, 0.99) * 1000,
+        'max_ms': latencies[-1] * 1000 if latencies else 0,
+    }
+
+
+def _percentile(sorted_values: list[float], part: float) -> float:
+    if not sorted_values:
+        return 0
+    index = min(int(len(sorted_values) * part), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--output', help='path of json file with results')
+    parser.add_argument(
+        '--scenario', action='append', choices=list(SCENARIOS),
+        help='scenarios to run, all by default',
+    )
+    args = parser.parse_args()
+
+    host = '127.0.0.1'
+    port = get_free_port()
+    results = {}
+    with run_server(host, port):
+        for name in args.scenario or SCENARIOS:
+            results[name] = asyncio.run(run_scenario(
+                host, port, SCENARIOS[name].encode('utf8'),
+                args.requests, args.concurrency,
+            ))
+    write_results('load', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
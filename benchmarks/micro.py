@@ -0,0 +1,163 @@
+"""Microbenchmarks of hot paths of the framework.
+
+Usage: python -m benchmarks.micro [--output micro.json] [--filter name]"""
+import argparse
+import dataclasses
+import json
+
+from dacite import from_dict as dataclass_from_dict
+from sqlalchemy import select
+
+from benchmarks.app import BenchUser, BenchUserDataclass, BenchUserSchema
+from benchmarks.common import measure, measure_async, write_results
+from martin_eden.core import HttpMessageHandler
+from martin_eden.database import (
+    MarshmallowToDataclass,
+    QueryTemplate,
+    SqlAlchemyToMarshmallow,
+    _introspect_model_fields,
+    get_model_fields,
+    query_params_to_alchemy_filters,
+)
+from martin_eden.http_utils import HttpHeadersParser, create_response_headers
+from martin_eden.openapi import OpenApiBuilder
+
+HTTP_REQUEST = (
+    'GET /bench/users/?bench_user__age__in=20,21,22 HTTP/1.1\r\n'
+    'Host: localhost:8001\r\n'
+    'Connection: keep-alive\r\n'
+    'User-Agent: Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7)\r\n'
+    'Accept: application/json\r\n'
+    'Accept-Encoding: gzip, deflate, br\r\n'
+    'Accept-Language: en-US,en;q=0.9\r\n'
+    'Cookie: token=a0966813f9b27b2a545c75966fd87815660787a3\r\n'
+    '\r\n'
+)
+PING_REQUEST = HTTP_REQUEST.replace(
+    '/bench/users/?bench_user__age__in=20,21,22', '/bench/ping/',
+).encode('utf8')
+PING_MIDDLEWARE_REQUEST = PING_REQUEST.replace(
+    b'/bench/ping/', b'/bench/ping_middleware/',
+)
+USER_JSON = json.dumps({'pk': 1, 'name': 'martin', 'age': 30})
+QUERY_FILTERS = {BenchUser: ['name', 'age']}
+
+
+def bench_http_headers_parser() -> None:
+    HttpHeadersParser(HTTP_REQUEST)
+
+
+def bench_create_response_headers() -> None:
+    create_response_headers(200, content_type='application/json')
+
+
+def bench_query_params_like() -> None:
+    query_params_to_alchemy_filters(
+        QUERY_FILTERS, 'bench_user__name__like', 'martin',
+    )
+
+
+def bench_query_params_in() -> None:
+    query_params_to_alchemy_filters(
+        QUERY_FILTERS, 'bench_user__age__in', '20,21,22',
+    )
+
+
+def bench_query_statement_build() -> None:
+    select(BenchUser).where(
+        query_params_to_alchemy_filters(
+            QUERY_FILTERS, 'bench_user__name__like', 'martin',
+        ),
+        query_params_to_alchemy_filters(
+            QUERY_FILTERS, 'bench_user__age__in', '20,21,22',
+        ),
+    )
+
+
+query_template = QueryTemplate(select(BenchUser), QUERY_FILTERS)
+
+
+def bench_query_template_bind() -> None:
+    query_template.bind({
+        'bench_user__name__like': 'martin',
+        'bench_user__age__in': '20,21,22',
+    })
+
+
+def bench_schema_generation() -> None:
+    schema = SqlAlchemyToMarshmallow('GeneratedSchema', (BenchUser,), {})
+    MarshmallowToDataclass(
+        'GeneratedDataclass', (schema,), {'__annotations__': {}},
+    )
+
+
+def bench_model_fields_introspection() -> None:
+    _introspect_model_fields(BenchUser)
+
+
+def bench_model_fields_cached() -> None:
+    get_model_fields(BenchUser)
+
+
+request_schema = BenchUserSchema()
+
+
+def bench_schema_round_trip() -> None:
+    request_data = request_schema.loads(USER_JSON)
+    user = dataclass_from_dict(BenchUserDataclass, request_data)
+    request_schema.dumps(dataclasses.asdict(user))
+
+
+def bench_openapi_generation() -> None:
+    builder = OpenApiBuilder()
+    builder.write_marshmallow_schemas_to_openapi_doc()
+    json.dumps(builder.openapi_object)
+
+
+async def bench_handler_get() -> None:
+    await HttpMessageHandler(PING_REQUEST).handle_request()
+
+
+async def bench_handler_get_middleware() -> None:
+    await HttpMessageHandler(PING_MIDDLEWARE_REQUEST).handle_request()
+
+
+BENCHMARKS = {
+    'http_headers_parser': bench_http_headers_parser,
+    'create_response_headers': bench_create_response_headers,
+    'query_params_to_alchemy_filters_like': bench_query_params_like,
+    'query_params_to_alchemy_filters_in': bench_query_params_in,
+    'query_statement_build': bench_query_statement_build,
+    'query_template_bind': bench_query_template_bind,
+    'schema_generation': bench_schema_generation,
+    'model_fields_introspection': bench_model_fields_introspection,
+    'model_fields_cached': bench_model_fields_cached,
+    'schema_round_trip': bench_schema_round_trip,
+    'openapi_generation': bench_openapi_generation,
+}
+ASYNC_BENCHMARKS = {
+    'http_message_handler_get': bench_handler_get,
+    'http_message_handler_get_middleware': bench_handler_get_middleware,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--output', help='path of json file with results')
+    parser.add_argument(
+        '--filter', default='', help='run only benchmarks with the substring',
+    )
+    args = parser.parse_args()
+
+    results = {}
+    for name, func in BENCHMARKS.items():
+        if args.filter in name:
+            results[name] = measure(func)
+    for name, func in ASYNC_BENCHMARKS.items():
+        if args.filter in name:
+            results[name] = measure_async(func)
+    write_results('micro', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
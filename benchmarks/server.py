@@ -0,0 +1,17 @@
+"""Server for end-to-end benchmarks, it is started by benchmarks.load
+in separate process, so the load generator doesn't share event loop
+with Backend. Models and routes are defined in benchmarks.app"""
+import asyncio
+
+from benchmarks.app import prepare_database
+from martin_eden.core import Backend
+
+
+def main() -> None:
+    asyncio.run(prepare_database())
+    backend = Backend()
+    asyncio.run(backend.main())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Startup time of the framework. Every measurement is done in new
+python process, so modules are not cached between them.
+
+Usage: python -m benchmarks.startup [--repeat 10] [--output startup.json]"""
+import argparse
+import os
+import subprocess
+import sys
+
+from benchmarks.common import write_results
+
+# Every snippet prints time in seconds, spent to run it
+SNIPPETS = {
+    'python': '',
+    'import_martin_eden': 'import martin_eden',
+    'import_core': 'import martin_eden.core',
+    'import_benchmark_app': 'import benchmarks.app',
+    'backend_init': (
+        'import benchmarks.app\n'
+        'from martin_eden.core import Backend\n'
+        'Backend().server_socket.close()'
+    ),
+}
+TIMER_TEMPLATE = (
+    'import time\n'
+    'start_time = time.perf_counter()\n'
+    '{}\n'
+    'print(time.perf_counter() - start_time)'
+)
+
+
+def measure_snippet(snippet: str, repeat: int) -> dict[str, float]:
+    durations = []
+    for _ in range(repeat):
+        command = [sys.executable, '-c', TIMER_TEMPLATE.format(snippet)]
+        output = subprocess.check_output(
+            command,  # noqa: S603
+            env=dict(os.environ, SERVER_PORT='0'),
+        )
+        durations.append(float(output))
+    return {
+        'seconds': min(durations),
+        'mean_seconds': sum(durations) / len(durations),
+        'loops': repeat,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--output', help='path of json file with results')
+    args = parser.parse_args()
+
+    results = {
+        name: measure_snippet(snippet, args.repeat)
+        for name, snippet in SNIPPETS.items()
+    }
+    write_results('startup', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,30 @@
-from martin_eden import (
-    base,
-    core,
-    database,
-    http_utils,
-    openapi,
-    routing,
-    utils,
-)
+import importlib
 
 __all__ = [
     'core',
     'database',
+    'export',
     'http_utils',
+    'loop_monitor',
     'base',
+    'metrics',
+    'middleware',
     'openapi',
+    'pagination',
+    'profiling',
+    'push',
+    'rate_limit',
     'routing',
+    'serialization',
+    'single_flight',
+    'static',
     'utils',
 ]
+
+
+def __getattr__(name: str):
+    """Submodules are imported on first access to them, therefore
+    "import martin_eden" doesn't import sqlalchemy and marshmallow"""
+    if name in __all__:
+        return importlib.import_module(f'{__name__}.{name}')
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
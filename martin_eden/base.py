@@ -1,15 +1,36 @@
-from typing import Any, ParamSpecArgs, ParamSpecKwargs
+from typing import TYPE_CHECKING, Any, Optional, ParamSpecArgs, ParamSpecKwargs
 
 from marshmallow import Schema
 from marshmallow.decorators import post_dump
 from marshmallow_jsonschema import JSONSchema
 
+if TYPE_CHECKING:
+    from martin_eden.database import QueryTemplate
+    from martin_eden.middleware import Middleware, MiddlewareChain
+    from martin_eden.pagination import CountStrategy
+    from martin_eden.rate_limit import RateLimit
+
 
 class Controller:
     """The class needs only as type hint"""
     request_schema: Schema
     response_schema: Schema
     query_params: dict
+    content_type: str
+    bulk: bool
+    bulk_batch_size: int
+    offload_serialization: bool
+    single_flight: bool
+    rate_limit: Optional['RateLimit']
+    middlewares: tuple['Middleware', ...]
+    middleware_chain: Optional['MiddlewareChain']
+    pass_request: bool
+    push_kind: Optional[str]
+    static_prefix: Optional[str]
+    negotiates_accept: bool
+    query_template: Optional['QueryTemplate']
+    count_strategy: Optional['CountStrategy']
+    page_size: int
 
     def __call__(
         self, *args: ParamSpecArgs, **kwargs: ParamSpecKwargs,
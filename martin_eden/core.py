@@ -1,46 +1,220 @@
 import asyncio
+import contextlib
 import dataclasses
+import hmac
+import inspect
 import json
+import logging
+import os
+import signal
 import socket
+import stat
+import time
+import typing
 from asyncio import AbstractEventLoop
 from logging import getLogger
-from typing import Any, Optional
+from pathlib import Path
+from typing import Any, AsyncIterable, AsyncIterator, Optional, Union
 
 from dacite import from_dict as dataclass_from_dict
+from marshmallow import ValidationError
 
 from martin_eden.base import Controller
-from martin_eden.database import DataBase, query_params_to_alchemy_filters
+from martin_eden.database import (
+    FIELDS_QUERY_PARAM,
+    DataBase,
+    change_feed,
+    get_projected_schema,
+    parse_fields,
+    query_cache,
+    query_params_to_alchemy_filters,
+)
+from martin_eden.export import (
+    CONTENT_TYPES,
+    EXPORT_FORMATS,
+    FORMAT_QUERY_PARAM,
+    JSON,
+    dump_row,
+    iter_export_chunks,
+    negotiate_export_format,
+)
 from martin_eden.http_utils import (
+    H2_PREFACE,
     HttpHeadersParser,
     HttpMethod,
+    Request,
+    Response,
     create_response_headers,
+    find_headers_end,
+    get_content_length,
+    is_h2c_message,
+    iter_json_items,
+)
+from martin_eden.logs import AccessLogger, configure_logging
+from martin_eden.loop_monitor import loop_monitor
+from martin_eden.metrics import (
+    CONTROLLER,
+    PARSING,
+    PROMETHEUS_CONTENT_TYPE,
+    ROUTING,
+    SERIALIZATION,
+    SOCKET_WRITE,
+    RequestTimer,
+    metrics,
 )
-from martin_eden.logs import configure_logging
+from martin_eden.middleware import Middleware
 from martin_eden.openapi import OpenApiBuilder
+from martin_eden.pagination import Page, paginate, pop_page_params
+from martin_eden.profiling import (
+    ProfilerConfig,
+    ProfilerConfigSchema,
+    profiler,
+)
+from martin_eden.push import (
+    EVENT_STREAM,
+    EventStreamConnection,
+    PushConnection,
+    WebSocketConnection,
+    broadcast_changes,
+    configure_push,
+)
+from martin_eden.rate_limit import (
+    RateLimit,
+    get_retry_after_header,
+    rate_limiter,
+)
 from martin_eden.routing import (
     ControllerDefinitionError,
     FindControllerError,
+    compile_middleware_chains,
     get_controller,
     register_route,
 )
+from martin_eden.serialization import serializer
 from martin_eden.settings import Settings
+from martin_eden.single_flight import single_flight
+from martin_eden.static import FileResponse
 from martin_eden.utils import get_argument_names
 
 HTTP_MESSAGE_CHUNK_SIZE = 1024
+# Body with known length is read by bigger chunks
+HTTP_BODY_CHUNK_SIZE = 65536
 db = DataBase()
+metrics.register_collector(db.get_pool_stats)
+metrics.register_collector(query_cache.get_stats)
+metrics.register_collector(db.get_compiled_cache_stats)
+metrics.register_collector(change_feed.get_stats)
+# Changes of tables are pushed to clients, that are subscribed to them
+change_feed.subscribe(broadcast_changes)
 
 
 @register_route('/schema/', 'get')
 async def get_openapi_schema() -> str:
-    return json.dumps(OpenApiBuilder().openapi_object)
+    return OpenApiBuilder().get_openapi_json()
+
+
+@register_route(
+    '/metrics/', 'get',
+    content_type=PROMETHEUS_CONTENT_TYPE,
+    include_in_schema=False,
+)
+async def get_metrics() -> str:
+    return metrics.render_prometheus()
+
+
+class AdminTokenMiddleware(Middleware):
+    """Routes under /admin/ need "Authorization: Bearer <token>" header
+    with token from ADMIN_TOKEN setting"""
+
+    def __init__(self, token: str) -> None:
+        self.authorization = f'Bearer {token}'.encode()
+
+    async def before_request(
+        self, handler: 'HttpMessageHandler', request: Request,
+    ) -> Optional[bytes]:
+        authorization = request.headers.get('authorization', '')
+        if hmac.compare_digest(
+            authorization.encode('utf8'), self.authorization,
+        ):
+            return None
+        return handler.create_status_response(
+            401, '401 unauthorized',
+            extra_headers={'WWW-Authenticate': 'Bearer'},
+        )
+
+
+def register_admin_routes(token: str) -> None:
+    """Routes are registered by Backend, when they are enabled by
+    settings, they are not registered on import"""
+    middlewares = [AdminTokenMiddleware(token)]
+
+    @register_route(
+        '/admin/profiler/', 'get',
+        include_in_schema=False,
+        middlewares=middlewares,
+    )
+    async def get_profiler_report() -> str:
+        return json.dumps(profiler.get_report())
+
+    @register_route(
+        '/admin/profiler/', 'post',
+        request_schema=ProfilerConfigSchema(),
+        include_in_schema=False,
+        middlewares=middlewares,
+    )
+    async def configure_profiler(config: ProfilerConfig) -> str:
+        profiler.configure(config)
+        return json.dumps(profiler.get_report())
+
+
+class Readiness:
+    """Worker is not ready, when it stops and drains requests,
+    health route tells it to load balancer"""
+
+    def __init__(self) -> None:
+        self.ready = True
+
+
+readiness = Readiness()
+
+
+@register_route('/health/', 'get', include_in_schema=False)
+async def get_health() -> Response:
+    if readiness.ready:
+        return Response(json.dumps({'status': 'ready'}))
+    return Response(json.dumps({'status': 'draining'}), status=503)
 
 
 class HttpMessageHandler:
-    def __init__(self, message: bytes) -> None:
+    def __init__(
+        self, message: bytes, client_address: Optional[str] = None,
+    ) -> None:
         self.http_message = message.decode('utf8')
+        # Address of client is needed for rate limit
+        self.client_address = client_address
+        # Next attributes are filled during request handling
+        # and are needed for access log
+        self.method = ''
+        self.path = ''
+        self.status = 200
+        # Path of registered route, None if route is not found
+        self.route: Optional[str] = None
+        self.timer = RequestTimer()
 
-    async def handle_request(self) -> bytes:
+    async def handle_request(
+        self,
+    ) -> Union[
+        bytes, AsyncIterator[bytes], WebSocketConnection, FileResponse,
+    ]:
+        """Returns the whole response, or async iterator of its chunks
+        for responses that are streamed, like NDJSON and CSV export.
+        For websocket route it returns connection, that works with
+        socket after upgrade. File is returned as FileResponse with
+        opened file, that is sent by sendfile"""
         http_parser = HttpHeadersParser(self.http_message)
+        self.method = http_parser.method_name
+        self.path = http_parser.path
+        self.timer.lap(PARSING)
 
         if http_parser.method_name == HttpMethod.OPTIONS:
             return self._get_response_for_options_method()
@@ -50,25 +224,253 @@ class HttpMessageHandler:
                 http_parser.path, http_parser.method_name,
             )
         except FindControllerError:
-            return self._get_response_for_get_and_post_methods(
+            return self._get_rate_limit_response(
+                None, http_parser,
+            ) or self._get_response_for_get_and_post_methods(
                 '404 not found'
             )
+        # Files of static directory are one route in metrics
+        self.route = controller.static_prefix or http_parser.path
+        self.timer.lap(ROUTING)
+
+        too_many_requests = self._get_rate_limit_response(
+            controller.rate_limit, http_parser,
+        )
+        if too_many_requests is not None:
+            return too_many_requests
+
+        if controller.middleware_chain is not None:
+            # Middlewares and controller share one Request
+            request = Request(http_parser, self.client_address)
+            return await controller.middleware_chain.run(
+                self, request,
+                lambda: self._dispatch(controller, http_parser, request),
+            )
+        return await self._dispatch(controller, http_parser)
+
+    async def _dispatch(
+        self,
+        controller: Controller,
+        http_parser: HttpHeadersParser,
+        request: Optional[Request] = None,
+    ) -> Union[
+        bytes, AsyncIterator[bytes], WebSocketConnection, FileResponse,
+    ]:
+        if controller.push_kind is not None:
+            return self._get_push_response(controller, http_parser)
+
+        if not controller.pass_request:
+            request = None
+        elif request is None:
+            request = Request(http_parser, self.client_address)
 
         if http_parser.method_name == HttpMethod.POST:
             response = await self._get_response_for_post_method(
-                controller, http_parser.body,
+                controller, http_parser.body, request,
             )
         else:
+            export_format = self._get_export_format(controller, http_parser)
+            field_names = parse_fields(
+                http_parser.query_params.pop(FIELDS_QUERY_PARAM, None),
+                controller.response_schema,
+            )
+            if controller.single_flight and export_format == JSON:
+                return await self._get_single_flight_response(
+                    controller, http_parser.query_params, field_names,
+                )
             response = await self._get_response_for_get_method(
-                controller, http_parser.query_params,
+                controller, http_parser.query_params, export_format,
+                field_names, request,
             )
+            if export_format != JSON and not isinstance(response, Response):
+                return self._get_streaming_response(
+                    controller, response, export_format, field_names,
+                )
 
-        return self._get_response_for_get_and_post_methods(response)
+        if isinstance(response, FileResponse):
+            return await self._get_file_response(response, http_parser)
+        return self._get_response_for_get_and_post_methods(
+            response, controller.content_type,
+        )
 
     @staticmethod
-    def _get_response_for_get_and_post_methods(response: str) -> bytes:
-        headers = create_response_headers(200, content_type='application/json')
-        return (headers + response).encode('utf8')
+    def _get_export_format(
+        controller: Controller, http_parser: HttpHeadersParser,
+    ) -> str:
+        """Format query parameter is checked first. Headers are parsed
+        for Accept only on routes, that return rows"""
+        format_param = http_parser.query_params.pop(FORMAT_QUERY_PARAM, None)
+        accept = ''
+        if controller.negotiates_accept and format_param not in (
+            EXPORT_FORMATS
+        ):
+            accept = http_parser.headers.get('accept', '')
+        return negotiate_export_format(format_param, accept)
+
+    async def _get_file_response(
+        self, response: FileResponse, http_parser: HttpHeadersParser,
+    ) -> Union[bytes, FileResponse]:
+        """Response to HEAD has headers of file without body"""
+        response = await response.prepare(http_parser.headers)
+        is_head = http_parser.method_name == HttpMethod.HEAD
+        if not isinstance(response, FileResponse):
+            if is_head:
+                response.body = b''
+            return self._render_response(response)
+
+        self.status = response.status
+        if is_head:
+            response.file.close()
+            return response.render_headers()
+        return response
+
+    def create_status_response(
+        self,
+        status: int,
+        body: str,
+        content_type: str = 'text/plain',
+        extra_headers: Optional[dict[str, str]] = None,
+    ) -> bytes:
+        """Response with other status than 200, middlewares
+        can return it too"""
+        self.status = status
+        return (
+            create_response_headers(
+                status, content_type=content_type,
+                extra_headers=extra_headers,
+            ) + body
+        ).encode('utf8')
+
+    def _get_rate_limit_response(
+        self,
+        route_limit: Optional[RateLimit],
+        http_parser: HttpHeadersParser,
+    ) -> Optional[bytes]:
+        """Response 429, if client has exceeded limit of route or
+        default limit. Paths without route count against default limit
+        too, so scanning of unknown paths is limited as well"""
+        if route_limit is None and rate_limiter.default_limit is None:
+            return None
+        retry_after = rate_limiter.check(
+            route_limit, self.route, self.client_address,
+            http_parser.headers,
+        )
+        if not retry_after:
+            return None
+        return self.create_status_response(
+            429, '429 too many requests',
+            extra_headers={
+                'Retry-After': get_retry_after_header(retry_after),
+            },
+        )
+
+    async def _get_single_flight_response(
+        self,
+        controller: Controller,
+        query_params: dict,
+        field_names: Optional[frozenset[str]],
+    ) -> Union[bytes, AsyncIterator[bytes]]:
+        """Concurrent requests of the route with the same query params
+        get bytes and status of one execution of controller. Order of
+        query params doesn't matter. Streamed body can be read only once,
+        so it goes to the request, that has executed controller, and
+        other requests execute controller themselves"""
+        key = (self.route, field_names, tuple(sorted(query_params.items())))
+        executed = False
+
+        async def get_response() -> tuple[int, Any]:
+            nonlocal executed
+            executed = True
+            response = await self._get_response_for_get_method(
+                controller, query_params, JSON, field_names,
+            )
+            response = self._get_response_for_get_and_post_methods(
+                response, controller.content_type,
+            )
+            return self.status, response
+
+        status, response = await single_flight.run(key, get_response)
+        if not isinstance(response, bytes) and not executed:
+            status, response = await get_response()
+        self.status = status
+        return response
+
+    def _get_response_for_get_and_post_methods(
+        self,
+        response: Union[str, Response],
+        content_type: str = 'application/json',
+    ) -> Union[bytes, AsyncIterator[bytes]]:
+        if isinstance(response, Response):
+            return self._render_response(response)
+        headers = create_response_headers(200, content_type=content_type)
+        result = (headers + response).encode('utf8')
+        self.timer.lap(SERIALIZATION)
+        return result
+
+    def _get_push_response(
+        self, controller: Controller, http_parser: HttpHeadersParser,
+    ) -> Union[bytes, AsyncIterator[bytes], WebSocketConnection]:
+        if controller.push_kind == EVENT_STREAM:
+            connection = EventStreamConnection(http_parser.query_params)
+            return connection.stream(controller)
+
+        key = http_parser.headers.get('sec-websocket-key')
+        if http_parser.headers.get('upgrade', '').lower() != 'websocket' or (
+            not key
+        ):
+            return self.create_status_response(
+                400, 'websocket upgrade is expected',
+            )
+        self.status = 101
+        return WebSocketConnection(controller, key, http_parser.query_params)
+
+    def _render_response(
+        self, response: Response,
+    ) -> Union[bytes, AsyncIterator[bytes]]:
+        self.status = response.status
+        body = response.body
+        if isinstance(body, str):
+            body = body.encode('utf8')
+        if isinstance(body, bytes):
+            result = response.render_headers() + body
+            self.timer.lap(SERIALIZATION)
+            return result
+        return self._stream_response_body(response.render_headers(), body)
+
+    async def _stream_response_body(
+        self, headers: bytes, body: AsyncIterable,
+    ) -> AsyncIterator[bytes]:
+        yield headers
+        async for chunk in body:
+            self.timer.lap(SERIALIZATION)
+            yield chunk.encode('utf8') if isinstance(chunk, str) else chunk
+
+    async def _get_streaming_response(
+        self,
+        controller: Controller,
+        response: Any,
+        export_format: str,
+        field_names: Optional[frozenset[str]] = None,
+    ) -> AsyncIterator[bytes]:
+        """Headers are sent at once, then rows are sent by chunks
+        while controller yields them. Time of waiting for rows from
+        async generator is also counted as serialization"""
+        yield create_response_headers(
+            200, content_type=CONTENT_TYPES[export_format],
+        ).encode('utf8')
+
+        if isinstance(response, str):
+            response = json.loads(response)
+        if isinstance(response, dict):
+            response = [response]
+        row_schema = get_projected_schema(
+            controller.response_schema, field_names, many=False,
+        )
+        async for chunk in iter_export_chunks(
+            response, export_format, row_schema,
+        ):
+            self.timer.lap(SERIALIZATION)
+            yield chunk.encode('utf8')
 
     @staticmethod
     def _get_response_for_options_method() -> bytes:
@@ -76,20 +478,116 @@ class HttpMessageHandler:
         return headers.encode('utf8')
 
     async def _get_response_for_get_method(
-        self, controller: Controller, query_params: dict,
-    ) -> str:
+        self,
+        controller: Controller,
+        query_params: dict,
+        export_format: str = JSON,
+        field_names: Optional[frozenset[str]] = None,
+        request: Optional[Request] = None,
+    ) -> Any:
+        """Controller can be async generator of rows. For json format
+        rows are collected to list, for other formats the generator is
+        returned as is, and rows are serialized during sending.
+
+        If fields are requested, response is dumped with schema of only
+        these fields, and query of controller with "query" argument reads
+        only their columns. Response, that is already str, is not changed"""
+        arguments = await self._get_controller_arguments(
+            controller, query_params, field_names, request,
+        )
+        response = controller(**arguments)
+        if inspect.isawaitable(response):
+            response = await response
+        if isinstance(response, Page):
+            return await self._dump_page(
+                controller, response, export_format, field_names,
+            )
+        if export_format != JSON or isinstance(response, Response):
+            return response
+
+        if isinstance(response, AsyncIterable):
+            row_schema = get_projected_schema(
+                controller.response_schema, field_names, many=False,
+            )
+            response = [dump_row(row, row_schema) async for row in response]
+        self.timer.lap(CONTROLLER)
+
+        if field_names and isinstance(response, (list, dict)):
+            response = await serializer.dumps(
+                response,
+                get_projected_schema(
+                    controller.response_schema, field_names,
+                    many=isinstance(response, list),
+                ),
+                controller.offload_serialization,
+            )
+        elif isinstance(response, (list, dict)):
+            response = await serializer.dumps(
+                response, offload=controller.offload_serialization,
+            )
+        return response
+
+    async def _get_controller_arguments(
+        self,
+        controller: Controller,
+        query_params: dict,
+        field_names: Optional[frozenset[str]],
+        request: Optional[Request],
+    ) -> dict:
         controller_argument_names = get_argument_names(controller)
+        arguments = {}
+        if request is not None:
+            arguments['request'] = request
         if 'query_params' in controller_argument_names:
-            query_params = self._prepare_query_parameters(
+            arguments['query_params'] = self._prepare_query_parameters(
                 controller, query_params,
             )
-            response = await controller(query_params)
-        else:
-            response = await controller()
+            self.timer.lap(PARSING)
+        elif 'query' in controller_argument_names:
+            arguments['query'] = controller.query_template.bind(
+                query_params, field_names,
+            )
+            self.timer.lap(PARSING)
+        elif 'page' in controller_argument_names:
+            arguments['page'] = await self._read_page(
+                controller, query_params, field_names,
+            )
+        return arguments
 
-        if isinstance(response, (list, dict)):
-            response = json.dumps(response)
-        return response
+    async def _read_page(
+        self,
+        controller: Controller,
+        query_params: dict,
+        field_names: Optional[frozenset[str]],
+    ) -> Page:
+        """Items and total of page are read concurrently by
+        count strategy of route"""
+        limit, offset = pop_page_params(query_params, controller.page_size)
+        query = controller.query_template.bind(query_params, field_names)
+        self.timer.lap(PARSING)
+        return await paginate(
+            db.create_session, query.statement, limit, offset,
+            controller.count_strategy, query.params,
+        )
+
+    async def _dump_page(
+        self,
+        controller: Controller,
+        page: Page,
+        export_format: str,
+        field_names: Optional[frozenset[str]],
+    ) -> Union[str, list]:
+        """Export gets only rows of page, json has total and
+        strategy of count too"""
+        self.timer.lap(CONTROLLER)
+        if export_format != JSON:
+            return page.items
+        return await serializer.dumps(
+            page.to_dict(get_projected_schema(
+                controller.response_schema, field_names,
+            )),
+            offload=controller.offload_serialization,
+        )
 
     @staticmethod
     def _prepare_query_parameters(
@@ -114,32 +612,108 @@ class HttpMessageHandler:
             return [True]
 
     async def _get_response_for_post_method(
+        self,
+        controller: Controller,
+        http_body: str,
+        request: Optional[Request] = None,
+    ) -> Union[str, Response]:
+        """Controller without request_schema, that has request argument,
+        gets only request and reads body itself"""
+        if controller.bulk:
+            return await self._get_response_for_bulk_post_method(
+                controller, http_body,
+            )
+
+        arguments = {}
+        if request is not None:
+            arguments['request'] = request
+        if controller.request_schema is not None or request is None:
+            request_data = controller.request_schema.loads(http_body)
+            dataclass_name, dataclass_object = (
+                self._get_dataclass_from_argument_for_post_method(controller)
+            )
+            arguments[dataclass_name] = dataclass_from_dict(
+                dataclass_object, request_data,
+            )
+        self.timer.lap(PARSING)
+
+        response = await controller(**arguments)
+        self.timer.lap(CONTROLLER)
+        if isinstance(response, (list, dict)):
+            response = await serializer.dumps(
+                response, offload=controller.offload_serialization,
+            )
+        response = await self._response_of_controller_to_str(
+            controller, response,
+        )
+        return response
+
+    async def _get_response_for_bulk_post_method(
         self, controller: Controller, http_body: str,
     ) -> str:
-        request_data = controller.request_schema.loads(http_body)
+        """Items are validated one by one. Valid items are collected to
+        batches, and every batch is passed to controller. Invalid items
+        are returned with their indexes and errors"""
         dataclass_name, dataclass_object = (
             self._get_dataclass_from_argument_for_post_method(controller)
         )
+        errors = []
+        results = []
+        batch = []
+        accepted_count = 0
+
+        async def send_batch_to_controller() -> None:
+            nonlocal batch, accepted_count
+            self.timer.lap(PARSING)
+            result = await controller(**{dataclass_name: batch})
+            self.timer.lap(CONTROLLER)
+            if result is not None:
+                results.append(result)
+            accepted_count += len(batch)
+            batch = []
 
-        response = await controller(**{
-            dataclass_name: dataclass_from_dict(dataclass_object, request_data)
+        for index, (item, decoding_error) in enumerate(
+            iter_json_items(http_body),
+        ):
+            if decoding_error is not None:
+                errors.append({'index': index, 'errors': decoding_error})
+                continue
+            try:
+                request_data = controller.request_schema.load(item)
+            except ValidationError as exc:
+                errors.append({'index': index, 'errors': exc.messages})
+                continue
+
+            batch.append(dataclass_from_dict(dataclass_object, request_data))
+            if len(batch) >= controller.bulk_batch_size:
+                await send_batch_to_controller()
+
+        if batch:
+            await send_batch_to_controller()
+
+        return json.dumps({
+            'accepted': accepted_count,
+            'rejected': len(errors),
+            'errors': errors,
+            'results': results,
         })
-        if isinstance(response, (list, dict)):
-            response = json.dumps(response)
-        response = self._response_of_controller_to_str(controller, response)
-        return response
 
     @staticmethod
-    def _response_of_controller_to_str(
+    async def _response_of_controller_to_str(
         controller: Controller, response: Any,
     ) -> str:
         if dataclasses.is_dataclass(response):
             response = dataclasses.asdict(response)
         if isinstance(response, dict):
             try:
-                response = controller.response_schema.dumps(response)
+                response = await serializer.dumps(
+                    response, controller.response_schema,
+                    controller.offload_serialization,
+                )
             except TypeError:
-                response = json.dumps(response)
+                response = await serializer.dumps(
+                    response, offload=controller.offload_serialization,
+                )
         return response
 
     @staticmethod
@@ -148,7 +722,11 @@ class HttpMessageHandler:
     ) -> tuple:
         controller_annotations = controller.__annotations__.copy()
         controller_annotations.pop('return', None)
+        controller_annotations.pop('request', None)
         dataclass_name, dataclass_object = controller_annotations.popitem()
+        # Bulk controllers get list of dataclasses
+        if typing.get_origin(dataclass_object) is list:
+            dataclass_object, = typing.get_args(dataclass_object)
         if any((
             len(controller_annotations) > 0,
             not dataclasses.is_dataclass(dataclass_object),
@@ -160,65 +738,462 @@ class HttpMessageHandler:
         return dataclass_name, dataclass_object
 
 
+# The first file descriptor, that systemd passes to service
+SYSTEMD_LISTEN_FDS_START = 3
+
+
+def get_inherited_fd(server_fd: int = -1) -> Optional[int]:
+    """File descriptor of listening socket, that is opened by parent
+    process: SERVER_FD setting or the first socket of systemd socket
+    activation. Variables of systemd are removed, so child processes
+    don't take the socket"""
+    if server_fd >= 0:
+        return server_fd
+    listen_pid = os.environ.pop('LISTEN_PID', None)
+    listen_fds = os.environ.pop('LISTEN_FDS', None)
+    os.environ.pop('LISTEN_FDNAMES', None)
+    if listen_pid != str(os.getpid()) or not listen_fds:
+        return None
+    return SYSTEMD_LISTEN_FDS_START
+
+
+def remove_stale_unix_socket(path: str) -> None:
+    """Socket file stays after process exits, bind fails on it.
+    Files, that are not sockets, are not removed"""
+    socket_path = Path(path)
+    try:
+        is_socket = stat.S_ISSOCK(socket_path.stat().st_mode)
+    except FileNotFoundError:
+        return
+    if is_socket:
+        socket_path.unlink(missing_ok=True)
+
+
 class Backend:
     def __init__(self) -> None:
         self.event_loop: Optional[AbstractEventLoop] = None
         self.server_socket: Optional[socket.socket] = None
+        # Path of unix socket, that is bound by backend, not inherited
+        self.unix_socket_path: Optional[str] = None
+        # TCP_NODELAY is set on accepted sockets of tcp server socket
+        self.tcp_nodelay = False
+        # Tasks of requests, that are handled now
+        self.request_tasks: set[asyncio.Task] = set()
+        self._accept_task: Optional[asyncio.Task] = None
+        # Http/2 connections, they are open for many requests
+        self.h2_connections: set = set()
 
         self.settings = Settings()
         configure_logging(self.settings.log_level)
         self.logger = getLogger()
+        self.access_logger = AccessLogger(
+            self.settings.log_access_sample_rate,
+        )
+
+        if self.settings.admin_routes_enabled:
+            # Token is required, routes under /admin/ are never open
+            register_admin_routes(self.settings.admin_token)
+        if self.settings.profiler_enabled:
+            profiler.enable(
+                self.settings.profiler_every_n,
+                self.settings.profiler_slow_threshold,
+            )
 
+        query_cache.configure(
+            self.settings.query_cache_size,
+            self.settings.query_cache_ttl,
+        )
+        serializer.configure(
+            self.settings.serialization_offload_threshold,
+            self.settings.serialization_executor,
+            self.settings.serialization_max_workers,
+        )
+        change_feed.configure(
+            self.settings.change_feed_channel,
+            self.settings.change_feed_debounce,
+            self.settings.change_feed_max_delay,
+        )
+        default_limit = None
+        if self.settings.rate_limit_rate:
+            default_limit = RateLimit(
+                self.settings.rate_limit_rate,
+                self.settings.rate_limit_burst,
+                self.settings.rate_limit_key,
+            )
+        rate_limiter.configure(
+            default_limit,
+            self.settings.rate_limit_api_key_header,
+            self.settings.rate_limit_trusted_header,
+        )
+        configure_push(
+            self.settings.push_queue_size,
+            self.settings.push_heartbeat_interval,
+            self.settings.websocket_max_message_size,
+        )
+
+        compile_middleware_chains()
         self._configure_sockets()
-        OpenApiBuilder().write_marshmallow_schemas_to_openapi_doc()
+        if self.settings.openapi_on_startup:
+            OpenApiBuilder().get_openapi_json()
         self.logger.info('Backend has initialized')
 
     def _configure_sockets(self) -> None:
-        self.server_socket = socket.socket(
-            socket.AF_INET, socket.SOCK_STREAM,
-        )
-        self.server_socket.setsockopt(
-            socket.SOL_SOCKET, socket.SO_REUSEADDR, 1,
-        )
+        """Server socket is inherited file descriptor, unix socket or tcp
+        socket on host and port from settings, in this order"""
+        inherited_fd = get_inherited_fd(self.settings.server_fd)
+        if inherited_fd is not None:
+            # Inherited socket is already bound, it can already listen
+            self.server_socket = socket.socket(fileno=inherited_fd)
+        elif self.settings.server_unix_socket:
+            self.server_socket = socket.socket(
+                socket.AF_UNIX, socket.SOCK_STREAM,
+            )
+            self.unix_socket_path = self.settings.server_unix_socket
+            remove_stale_unix_socket(self.unix_socket_path)
+            self.server_socket.bind(self.unix_socket_path)
+        else:
+            self.server_socket = socket.socket(
+                socket.AF_INET, socket.SOCK_STREAM,
+            )
+            self.server_socket.setsockopt(
+                socket.SOL_SOCKET, socket.SO_REUSEADDR, 1,
+            )
+            server_address = (
+                self.settings.server_host,
+                self.settings.server_port,
+            )
+            self.server_socket.bind(server_address)
+        self.server_socket.setblocking(False)
+
+        # Accepted sockets get sizes of buffers from server socket
+        if self.settings.socket_send_buffer:
+            self.server_socket.setsockopt(
+                socket.SOL_SOCKET, socket.SO_SNDBUF,
+                self.settings.socket_send_buffer,
+            )
+        if self.settings.socket_receive_buffer:
+            self.server_socket.setsockopt(
+                socket.SOL_SOCKET, socket.SO_RCVBUF,
+                self.settings.socket_receive_buffer,
+            )
 
-        server_address = (
-            self.settings.server_host,
-            self.settings.server_port,
+        is_tcp = self.server_socket.family in (
+            socket.AF_INET, socket.AF_INET6,
         )
-        self.server_socket.setblocking(False)
-        self.server_socket.bind(server_address)
+        # Connection is accepted when the first data has come, so request
+        # can be read without waiting. The option exists only in Linux
+        if (
+            is_tcp
+            and self.settings.tcp_defer_accept
+            and hasattr(socket, 'TCP_DEFER_ACCEPT')
+        ):
+            self.server_socket.setsockopt(
+                socket.IPPROTO_TCP, socket.TCP_DEFER_ACCEPT,
+                self.settings.tcp_defer_accept,
+            )
+        self.tcp_nodelay = is_tcp and self.settings.tcp_nodelay
+
+    async def handle_request(
+        self, client_socket: socket.socket, client_address: Any = None,
+    ) -> None:
+        start_time = time.perf_counter()
+        metrics.in_flight += 1
+        try:
+            await self._handle_request(
+                client_socket, start_time, client_address,
+            )
+        finally:
+            metrics.in_flight -= 1
 
-    async def handle_request(self, client_socket: socket.socket) -> None:
-        message = b''
-        while chunk := await self.event_loop.sock_recv(client_socket, 1024):
+    async def _read_http_message(self, client_socket: socket.socket) -> bytes:
+        """If request has Content-Length header, the method reads exactly
+        so many bytes of body. Otherwise, message ends with the first chunk
+        that is shorter than HTTP_MESSAGE_CHUNK_SIZE"""
+        message = bytearray()
+        body_start = -1
+        content_length = None
+        chunk_size = HTTP_MESSAGE_CHUNK_SIZE
+        while chunk := await self.event_loop.sock_recv(
+            client_socket, chunk_size,
+        ):
             message += chunk
-            if len(chunk) < HTTP_MESSAGE_CHUNK_SIZE:
+            if body_start == -1:
+                # Preface of http/2 is read, frames after it are read by
+                # http/2 connection. Preface can come in several segments
+                if message.startswith(H2_PREFACE):
+                    break
+                if H2_PREFACE.startswith(message):
+                    continue
+                headers_end, line_breaks_length = find_headers_end(message)
+                if headers_end != -1:
+                    body_start = headers_end + line_breaks_length
+                    content_length = get_content_length(
+                        message[:headers_end],
+                    )
+
+            if content_length is None:
+                if len(chunk) < HTTP_MESSAGE_CHUNK_SIZE:
+                    break
+                continue
+
+            remaining = content_length - (len(message) - body_start)
+            if remaining <= 0:
                 break
+            chunk_size = min(remaining, HTTP_BODY_CHUNK_SIZE)
+        return bytes(message)
+
+    async def _handle_request(
+        self,
+        client_socket: socket.socket,
+        start_time: float,
+        client_address: Any = None,
+    ) -> None:
+        try:
+            message = await self._read_http_message(client_socket)
+
+            # Address of tcp socket is pair of host and port
+            if isinstance(client_address, tuple):
+                client_address = client_address[0]
+            if self.settings.http2_enabled and is_h2c_message(message):
+                await self._handle_h2c_connection(
+                    client_socket, client_address, message,
+                )
+                return
 
-        handler = HttpMessageHandler(message)
-        message = await handler.handle_request()
+            handler, message = await self._run_handler(message, client_address)
+            if isinstance(message, bytes):
+                await self.event_loop.sock_sendall(client_socket, message)
+                handler.timer.lap(SOCKET_WRITE)
+                bytes_sent = len(message)
+            elif isinstance(message, WebSocketConnection):
+                bytes_sent = await message.run(self.event_loop, client_socket)
+            elif isinstance(message, FileResponse):
+                bytes_sent = await self._send_file(
+                    client_socket, message, handler.timer,
+                )
+            else:
+                bytes_sent = await self._send_stream(
+                    client_socket, message, handler.timer,
+                )
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug(
+                    'request from %s has handled', client_socket.getpeername(),
+                )
+            self._record_request(handler, start_time, bytes_sent)
+        finally:
+            client_socket.close()
+
+    async def _run_handler(
+        self, message: bytes, client_address: Any = None,
+    ) -> tuple[HttpMessageHandler, Any]:
+        handler = HttpMessageHandler(message, client_address)
+        if profiler.enabled:
+            response = await profiler.run(
+                handler.handle_request(), lambda: handler.route,
+            )
+        else:
+            response = await handler.handle_request()
+        return handler, response
 
-        await self.event_loop.sock_sendall(client_socket, message)
-        self.logger.info(
-            f'request from {client_socket.getpeername()} has handled'
+    def _record_request(
+        self, handler: HttpMessageHandler, start_time: float, bytes_sent: int,
+    ) -> None:
+        duration = time.perf_counter() - start_time
+        metrics.record_request(
+            handler.route,
+            handler.method,
+            handler.status,
+            duration,
+            handler.timer,
+        )
+        self.access_logger.log(
+            handler.method,
+            handler.path,
+            handler.status,
+            duration,
+            bytes_sent,
         )
-        client_socket.close()
 
-    async def main(self) -> None:
-        """The method listen server socket for connections, if connection
-        is gotten, creates client_socket and sends response in it."""
+    async def _handle_h2c_connection(
+        self,
+        client_socket: socket.socket,
+        client_address: Any,
+        message: bytes,
+    ) -> None:
+        """Streams of http/2 connection are handled by _run_handler like
+        http/1 requests, every stream is recorded in metrics and access
+        log. h2 is optional dependency, without it connection is closed"""
+        try:
+            from martin_eden.http2 import H2cConnection
+        except ImportError:
+            self.logger.exception('h2 package is required for http/2 support')
+            return
+        connection = H2cConnection(
+            self.event_loop,
+            client_socket,
+            client_address,
+            self._run_handler,
+            self._record_request,
+            self.settings.http2_max_concurrent_streams,
+        )
+        self.h2_connections.add(connection)
+        try:
+            await connection.run(message)
+        finally:
+            self.h2_connections.discard(connection)
 
-        # Getting of event loop in main because it must be in asyncio.run
-        self.event_loop = asyncio.get_event_loop()
-        self.server_socket.listen()
+    async def _send_stream(
+        self,
+        client_socket: socket.socket,
+        stream: AsyncIterator[bytes],
+        timer: RequestTimer,
+    ) -> int:
+        """Every chunk is sent before the next one is made, so slow
+        client slows down reading of rows too and memory doesn't grow.
+        Response has no Content-Length, its end is closing of connection.
+        Event streams are ended by client, so disconnect is not error"""
+        bytes_sent = 0
+        try:
+            async for chunk in stream:
+                await self.event_loop.sock_sendall(client_socket, chunk)
+                timer.lap(SOCKET_WRITE)
+                bytes_sent += len(chunk)
+        except ConnectionError as exc:
+            self.logger.debug('Client has disconnected from stream: %s', exc)
+        finally:
+            await stream.aclose()
+        return bytes_sent
+
+    async def _send_file(
+        self,
+        client_socket: socket.socket,
+        response: FileResponse,
+        timer: RequestTimer,
+    ) -> int:
+        """Headers are sent from memory, then file is sent by sendfile
+        from page cache to socket, it is not read to user space"""
+        bytes_sent = 0
+        try:
+            headers = response.render_headers()
+            await self.event_loop.sock_sendall(client_socket, headers)
+            bytes_sent = len(headers)
+            if response.count:
+                bytes_sent += await self.event_loop.sock_sendfile(
+                    client_socket, response.file,
+                    response.offset, response.count,
+                )
+            timer.lap(SOCKET_WRITE)
+        except ConnectionError as exc:
+            self.logger.debug('Client has disconnected from file: %s', exc)
+        finally:
+            response.file.close()
+        return bytes_sent
+
+    def toggle_profiler(self) -> None:
+        """Handler of SIGUSR1 signal, it enables profiler, or disables
+        it and writes its report to the file from settings"""
+        if not profiler.enabled:
+            profiler.enable(
+                self.settings.profiler_every_n,
+                self.settings.profiler_slow_threshold,
+            )
+            self.logger.info('Profiler has enabled')
+            return
+
+        profiler.disable()
+        self.logger.info('Profiler has disabled')
+        if self.settings.profiler_dump_path:
+            profiler.dump(self.settings.profiler_dump_path)
+            profiler.reset()
+
+    def stop(self) -> None:
+        """Handler of SIGTERM and SIGINT signals, main stops accepting
+        connections and drains requests"""
+        if self._accept_task is not None and not self._accept_task.done():
+            self.logger.info('Backend is stopping')
+            self._accept_task.cancel()
+
+    async def shutdown(self) -> None:
+        """Requests, that are handled now, get drain timeout to finish,
+        then they are cancelled. Push connections are closed after their
+        queued messages. Http/2 connections get GOAWAY and are closed
+        after their streams. Connection of every http/1 response is closed
+        after it is sent, so there are no idle keep-alive connections"""
+        readiness.ready = False
+        self.server_socket.close()
+        if self.unix_socket_path is not None:
+            remove_stale_unix_socket(self.unix_socket_path)
+        PushConnection.close_all()
+        for connection in self.h2_connections:
+            task = asyncio.create_task(connection.go_away())
+            self.request_tasks.add(task)
+            task.add_done_callback(self.request_tasks.discard)
+
+        if self.request_tasks:
+            self.logger.info(
+                'Draining %s requests', len(self.request_tasks),
+            )
+            _, pending = await asyncio.wait(
+                self.request_tasks,
+                timeout=self.settings.shutdown_drain_timeout,
+            )
+            for task in pending:
+                task.cancel()
+            if pending:
+                self.logger.warning(
+                    '%s requests are cancelled after drain timeout',
+                    len(pending),
+                )
+                await asyncio.wait(pending)
+
+        change_feed.stop()
+        loop_monitor.stop()
+        serializer.shutdown()
+        await db.dispose()
+        self.logger.info('Backend has stopped')
+
+    async def _accept_connections(self) -> None:
         while True:
-            client_socket, _ = (
+            client_socket, client_address = (
                 await self.event_loop.sock_accept(self.server_socket)
             )
-            self.logger.info(
-                f'get request for connection '
-                f'from {client_socket.getpeername()}'
+            if self.tcp_nodelay:
+                client_socket.setsockopt(
+                    socket.IPPROTO_TCP, socket.TCP_NODELAY, 1,
+                )
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug(
+                    'get request for connection from %s',
+                    client_socket.getpeername(),
+                )
+            task = asyncio.create_task(
+                self.handle_request(client_socket, client_address),
             )
-            asyncio.create_task(
-                self.handle_request(client_socket),
+            self.request_tasks.add(task)
+            task.add_done_callback(self.request_tasks.discard)
+
+    async def main(self) -> None:
+        """The method listen server socket for connections, if connection
+        is gotten, creates client_socket and sends response in it.
+        It returns after SIGTERM or SIGINT, when requests are drained"""
+
+        # Getting of event loop in main because it must be in asyncio.run
+        self.event_loop = asyncio.get_event_loop()
+        self.event_loop.add_signal_handler(
+            signal.SIGUSR1, self.toggle_profiler,
+        )
+        for stop_signal in (signal.SIGTERM, signal.SIGINT):
+            self.event_loop.add_signal_handler(stop_signal, self.stop)
+        if self.settings.loop_monitor_interval:
+            loop_monitor.start(
+                self.settings.loop_monitor_interval,
+                self.settings.loop_block_threshold,
             )
+        if self.settings.change_feed_enabled:
+            change_feed.start(self.settings.postgres_url)
+        self.server_socket.listen(self.settings.server_backlog)
+        readiness.ready = True
+        self._accept_task = asyncio.create_task(self._accept_connections())
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._accept_task
+        await self.shutdown()
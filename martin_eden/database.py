@@ -1,28 +1,65 @@
+import asyncio
+import copy
 import dataclasses
+import enum
+import json
+import logging
+import time
+from collections import OrderedDict
 from dataclasses import field, make_dataclass
 from datetime import date, datetime
-from typing import Any, Callable, Iterable
+from functools import cache, cached_property, lru_cache
+from typing import Any, Callable, Iterable, Optional, Union
 
+from marshmallow import Schema
 from marshmallow.fields import Date, DateTime, Int, Nested, Str
 from marshmallow_enum import EnumField as MarshmallowEnum
+from sqlalchemy import (
+    ARRAY,
+    DDL,
+    Executable,
+    Index,
+    String,
+    any_,
+    bindparam,
+    event,
+    func,
+    insert,
+    inspect,
+    make_url,
+    select,
+    text,
+)
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import FrozenResult, Result
+from sqlalchemy.engine.interfaces import CacheStats
 from sqlalchemy.ext.asyncio import (
     AsyncAttrs,
     AsyncEngine,
+    AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.orm import (
+    ColumnProperty,
+    DeclarativeBase,
+    ORMExecuteState,
+    RelationshipProperty,
+    Session,
+    UOWTransaction,
+    lazyload,
+    load_only,
+    selectinload,
+)
+from sqlalchemy.orm.loading import merge_frozen_result
+from sqlalchemy.schema import CreateIndex, DropIndex
+from sqlalchemy.sql.util import find_tables
 
 from martin_eden.base import CustomSchema
 from martin_eden.settings import Settings
-from martin_eden.utils import (
-    get_name_of_model,
-    get_python_field_type_from_alchemy_field,
-    is_enum_alchemy_field,
-    is_property_secondary_relation,
-    is_simple_alchemy_field,
-    is_special_alchemy_field,
-)
+from martin_eden.utils import get_name_of_model
+
+logger = logging.getLogger(__name__)
 
 
 class Base(AsyncAttrs, DeclarativeBase):
@@ -41,32 +78,440 @@ inverse_types_map = {
 }
 
 
+def _parse_query_param(
+    filters: dict, query_param: str,
+) -> tuple[Optional[type], str, str]:
+    """Returns model class, field name and method name of filter,
+    model class is None if it is not declared in filters of route"""
+    model_name, field_name, method_name = query_param.split('__')
+
+    model_class = None
+    for model_class_iter in filters:
+        if get_name_of_model(model_class_iter) == model_name:
+            model_class = model_class_iter
+    return model_class, field_name, method_name
+
+
+# Text search configuration of postgres, that is used by search filter
+# and its index. Index is used only if configuration is the same
+SEARCH_CONFIG = 'simple'
+
+
+def _search_vector(field_obj: Any) -> Any:
+    return func.to_tsvector(text(f"'{SEARCH_CONFIG}'"), field_obj)
+
+
+def _search_filter(field_obj: Any, value: Any) -> Any:
+    return _search_vector(field_obj).bool_op('@@')(
+        func.plainto_tsquery(text(f"'{SEARCH_CONFIG}'"), value),
+    )
+
+
+def _trigram_filter(field_obj: Any, value: Any) -> Any:
+    """Operator % of pg_trgm extension, it is true if similarity of
+    strings is greater than pg_trgm.similarity_threshold"""
+    return field_obj.bool_op('%')(value)
+
+
+def _convert_filter_value(method_name: str, value: str) -> Any:
+    if method_name == 'like':
+        return f'%{value}%'
+    elif method_name in ('search', 'trigram'):
+        return value
+    elif method_name == 'exactly':
+        return [int(value)]
+    elif method_name == 'in':
+        return list(map(int, value.split(',')))
+
+
 def query_params_to_alchemy_filters(
     filters: dict, query_param: str, value: str,
 ) -> Any:
     """Example of query_param argument from url:
        * user__first_name__like=martin
+       * user__first_name__search=martin eden
+       * user__first_name__trigram=martn
        * user__age__in=20,21,22
-       * user__age__exactly=25"""
-    model_name, field_name, method_name = query_param.split('__')
+       * user__age__exactly=25
 
-    model_class = None
-    for model_class_iter in filters:
-        if get_name_of_model(model_class_iter) == model_name:
-            model_class = model_class_iter
+    Search and trigram filters work only in postgres, they can use
+    indexes from create_search_indexes, unlike like filter"""
+    model_class, field_name, method_name = _parse_query_param(
+        filters, query_param,
+    )
     if not model_class:
         return None
 
     field_obj = getattr(model_class, field_name)
+    value = _convert_filter_value(method_name, value)
     if method_name == 'like':
-        method_obj = getattr(field_obj, method_name)
-        return method_obj(f'%{value}%')
-    elif method_name == 'exactly':
-        method_obj = field_obj.in_
-        return method_obj([int(value)])
-    elif method_name == 'in':
-        method_obj = field_obj.in_
-        return method_obj(list(map(int, value.split(','))))
+        return field_obj.like(value)
+    elif method_name == 'search':
+        return _search_filter(field_obj, value)
+    elif method_name == 'trigram':
+        return _trigram_filter(field_obj, value)
+    elif method_name in ('exactly', 'in'):
+        return field_obj.in_(value)
+
+
+def _make_filter_template(
+    filters: dict, query_param: str, use_any: bool,
+) -> Any:
+    """The same filter as query_params_to_alchemy_filters makes, but
+    value is bind parameter with name of query param. List of "in"
+    filter is one array parameter with use_any, so sql doesn't depend
+    on length of list, it is possible in postgres only"""
+    model_class, field_name, method_name = _parse_query_param(
+        filters, query_param,
+    )
+    if not model_class:
+        return None
+
+    field_obj = getattr(model_class, field_name)
+    if method_name == 'like':
+        return field_obj.like(bindparam(query_param))
+    elif method_name == 'search':
+        return _search_filter(
+            field_obj, bindparam(query_param, type_=String),
+        )
+    elif method_name == 'trigram':
+        return _trigram_filter(field_obj, bindparam(query_param))
+    elif method_name in ('exactly', 'in'):
+        if use_any:
+            return field_obj == any_(
+                bindparam(query_param, type_=ARRAY(field_obj.type)),
+            )
+        return field_obj.in_(bindparam(query_param, expanding=True))
+
+
+TRIGRAM_EXTENSION_SQL = 'CREATE EXTENSION IF NOT EXISTS pg_trgm'
+
+
+def create_search_indexes(
+    model: type[Base],
+    field_names: Iterable[str],
+    search: bool = True,
+    trigram: bool = True,
+) -> list[Index]:
+    """Creates GIN indexes for search and trigram filters of fields.
+    Indexes are added to table of model, so metadata.create_all and
+    alembic autogenerate see them. They are created only in postgres,
+    pg_trgm extension is created before table, if it is needed"""
+    table = model.__table__
+    indexes = []
+    for field_name in field_names:
+        column = table.c[field_name]
+        if search:
+            indexes.append(Index(
+                f'ix_{table.name}_{field_name}_search',
+                _search_vector(column),
+                postgresql_using='gin',
+            ).ddl_if(dialect='postgresql'))
+        if trigram:
+            indexes.append(Index(
+                f'ix_{table.name}_{field_name}_trigram',
+                column,
+                postgresql_using='gin',
+                postgresql_ops={column.name: 'gin_trgm_ops'},
+            ).ddl_if(dialect='postgresql'))
+
+    if trigram:
+        event.listen(
+            table, 'before_create',
+            DDL(TRIGRAM_EXTENSION_SQL).execute_if(dialect='postgresql'),
+        )
+    return indexes
+
+
+def render_search_indexes_migration(indexes: Iterable[Index]) -> str:
+    """Returns upgrade and downgrade functions for alembic migration,
+    that create indexes from create_search_indexes in existing database.
+    Indexes are created concurrently, so the migration doesn't lock
+    writes to table, but it must be run outside of transaction"""
+    dialect = postgresql.dialect()
+    upgrade_lines = [TRIGRAM_EXTENSION_SQL]
+    downgrade_lines = []
+    for index in indexes:
+        options = index.dialect_options['postgresql']
+        options['concurrently'] = True
+        try:
+            upgrade_lines.append(str(CreateIndex(
+                index, if_not_exists=True,
+            ).compile(dialect=dialect)).strip())
+            downgrade_lines.append(str(DropIndex(
+                index, if_exists=True,
+            ).compile(dialect=dialect)).strip())
+        finally:
+            # Index must not be created concurrently by create_all
+            options['concurrently'] = False
+
+    def render_function(name: str, lines: list[str]) -> str:
+        body = ''.join(f'        op.execute({line!r})\n' for line in lines)
+        return (
+            f'def {name}() -> None:\n'
+            f'    with op.get_context().autocommit_block():\n{body}'
+        )
+
+    return (
+        render_function('upgrade', upgrade_lines) + '\n\n' +
+        render_function('downgrade', downgrade_lines)
+    )
+
+
+@cache
+def _is_postgres() -> bool:
+    return make_url(Settings().postgres_url).get_backend_name() == (
+        'postgresql'
+    )
+
+
+# Query param with names of fields of response, separated by comma
+FIELDS_QUERY_PARAM = 'fields'
+
+
+def parse_fields(
+    value: Optional[str], schema: Optional[Schema],
+) -> Optional[frozenset[str]]:
+    """Returns names of fields from "fields" query param, names that are
+    not in schema are skipped. Name with dot, like "city.name", selects
+    field of nested schema. None means that all fields are needed"""
+    if not value or schema is None:
+        return None
+
+    field_names = frozenset(
+        field_name for field_name in map(str.strip, value.split(','))
+        if _has_field(schema, field_name)
+    )
+    return field_names or None
+
+
+def _has_field(schema: Schema, field_name: str) -> bool:
+    """Name with dot is checked in nested schema too, otherwise
+    marshmallow raises error on dump with the name"""
+    top_field_name, _, nested_field_name = field_name.partition('.')
+    schema_field = schema.fields.get(top_field_name)
+    if schema_field is None:
+        return False
+    if not nested_field_name:
+        return True
+    if not isinstance(schema_field, Nested):
+        return False
+    return _has_field(schema_field.schema, nested_field_name)
+
+
+# Names of fields are from clients, so count of their sets is limited
+@lru_cache(maxsize=256)
+def _get_projected_schema(
+    schema_class: type[Schema], field_names: frozenset[str], many: bool,
+) -> Schema:
+    # Fields keep order of original schema, it is order of csv columns
+    declared_field_names = list(schema_class._declared_fields)
+    return schema_class(only=sorted(
+        field_names,
+        key=lambda field_name: declared_field_names.index(
+            field_name.partition('.')[0],
+        ),
+    ), many=many)
+
+
+def get_projected_schema(
+    schema: Optional[Schema],
+    field_names: Optional[frozenset[str]],
+    many: Optional[bool] = None,
+) -> Optional[Schema]:
+    """Schema with only requested fields, it is created once for every
+    set of fields. Without field names the schema is returned as is"""
+    if schema is None or not field_names:
+        return schema
+    return _get_projected_schema(
+        type(schema), field_names, schema.many if many is None else many,
+    )
+
+
+def get_projection_options(
+    model: type[Base],
+    field_names: frozenset[str],
+    eager_relations: Iterable[str] = (),
+) -> list:
+    """Loader options, that read from database only requested columns and
+    primary key. Eager relations are loaded only if they are requested,
+    other relations are not loaded"""
+    mapper = inspect(model)
+    top_field_names = {
+        field_name.partition('.')[0] for field_name in field_names
+    }
+    options = [load_only(*(
+        getattr(model, column_property.key)
+        for column_property in mapper.column_attrs
+        if column_property.key in top_field_names or any(
+            column.primary_key for column in column_property.columns
+        )
+    ))]
+    options.extend(
+        lazyload(getattr(model, relationship.key))
+        for relationship in mapper.relationships
+        if relationship.key not in top_field_names
+    )
+    options.extend(
+        selectinload(getattr(model, relation_name))
+        for relation_name in eager_relations
+        if relation_name in top_field_names
+    )
+    return options
+
+
+def _get_statement_entity(statement: Executable) -> Optional[type[Base]]:
+    """Model, if statement selects only objects of one model"""
+    column_descriptions = getattr(statement, 'column_descriptions', ())
+    if len(column_descriptions) != 1:
+        return None
+    description = column_descriptions[0]
+    if description['expr'] is not description['entity']:
+        return None
+    return description['entity']
+
+
+@dataclasses.dataclass
+class BoundQuery:
+    statement: Executable
+    params: dict
+
+    async def execute(self, session: AsyncSession) -> Result:
+        return await session.execute(self.statement, self.params)
+
+
+class QueryTemplate:
+    """Statement of list route with filters from query params. For every
+    shape of filters, that is set of names of query params, statement is
+    built only once. Requests with the same shape get the same statement
+    object and differ only in parameters, so sqlalchemy takes compiled
+    statement from its cache, and asyncpg takes prepared statement from
+    its cache, because sql is the same.
+
+    Requested fields of response are part of shape too, if statement
+    selects objects of model, only their columns are selected.
+
+    Relations, that are loaded eagerly, are passed by names in
+    eager_relations, not as loader options of statement, so they are
+    loaded only when they are requested"""
+
+    def __init__(
+        self,
+        statement: Executable,
+        filters: dict,
+        use_any: Optional[bool] = None,
+        max_size: int = 256,
+        eager_relations: Iterable[str] = (),
+    ) -> None:
+        self.statement = statement
+        self.filters = filters
+        self.eager_relations = frozenset(eager_relations)
+        # None means "any" is used if database is postgres
+        self.use_any = use_any
+        self.max_size = max_size
+        # Shape -> statement and names of query params, that are filters
+        self.statements: OrderedDict[
+            tuple, tuple[Executable, tuple[str, ...]]
+        ] = OrderedDict()
+
+    def _build_statement(
+        self,
+        query_param_names: tuple[str, ...],
+        field_names: Optional[frozenset[str]],
+    ) -> tuple[Executable, tuple[str, ...]]:
+        if self.use_any is None:
+            self.use_any = _is_postgres()
+
+        statement = self.statement
+        model = _get_statement_entity(statement)
+        if field_names and model is not None:
+            statement = statement.options(*get_projection_options(
+                model, field_names, self.eager_relations,
+            ))
+        elif self.eager_relations and model is not None:
+            statement = statement.options(*(
+                selectinload(getattr(model, relation_name))
+                for relation_name in self.eager_relations
+            ))
+
+        filter_names = []
+        for query_param in query_param_names:
+            template = _make_filter_template(
+                self.filters, query_param, self.use_any,
+            )
+            if template is not None:
+                statement = statement.where(template)
+                filter_names.append(query_param)
+        return statement, tuple(filter_names)
+
+    def bind(
+        self,
+        query_params: dict,
+        field_names: Optional[frozenset[str]] = None,
+    ) -> BoundQuery:
+        query_param_names = tuple(sorted(query_params))
+        shape = (query_param_names, field_names)
+        entry = self.statements.get(shape)
+        if entry is None:
+            entry = self.statements[shape] = self._build_statement(
+                query_param_names, field_names,
+            )
+            if len(self.statements) > self.max_size:
+                self.statements.popitem(last=False)
+        else:
+            self.statements.move_to_end(shape)
+
+        statement, filter_names = entry
+        return BoundQuery(statement, {
+            query_param: _convert_filter_value(
+                query_param.rsplit('__', 1)[1], query_params[query_param],
+            ) for query_param in filter_names
+        })
+
+
+# Kinds of model fields, that are used for generation of schemas
+SIMPLE_FIELD = 'simple'
+ENUM_FIELD = 'enum'
+RELATION_FIELD = 'relation'
+
+# Tuples of field name, kind of field and python type of field,
+# for relation the type is None
+ModelFields = tuple[tuple[str, str, Optional[type]], ...]
+
+
+def _introspect_model_fields(model: type[Base]) -> ModelFields:
+    """Fields are taken from descriptors of mapper. Unlike mapper.attrs,
+    all_orm_descriptors doesn't configure mappers, therefore schema can
+    be generated before related models are defined"""
+    result = []
+    for field_name, descriptor in inspect(model).all_orm_descriptors.items():
+        if field_name.startswith('_'):
+            continue
+
+        model_property = getattr(descriptor, 'prop', None)
+        if isinstance(model_property, ColumnProperty):
+            python_type = model_property.columns[0].type.python_type
+            field_kind = (
+                ENUM_FIELD if issubclass(python_type, enum.Enum)
+                else SIMPLE_FIELD
+            )
+            result.append((field_name, field_kind, python_type))
+        # Relations with collection are secondary relations,
+        # look at utils.is_property_secondary_relation
+        elif (
+            isinstance(model_property, RelationshipProperty) and
+            not model_property.collection_class
+        ):
+            result.append((field_name, RELATION_FIELD, None))
+
+    # Sorting keeps order of fields, as it was by dir() of model
+    return tuple(sorted(result, key=lambda model_field: model_field[0]))
+
+
+@cache
+def get_model_fields(model: type[Base]) -> ModelFields:
+    """Fields of every model are introspected only once per process"""
+    return _introspect_model_fields(model)
 
 
 class SqlAlchemyToMarshmallow(type(Base)):
@@ -76,30 +521,19 @@ class SqlAlchemyToMarshmallow(type(Base)):
     def __new__(cls, name: str, bases: Iterable, fields: dict) -> type:
         origin_model: Base = bases[0]
 
-        origin_model_field_names = [
-            field_name for field_name in dir(origin_model)
-            if not any((
-                field_name.startswith('_'),
-                is_special_alchemy_field(field_name),
-                is_property_secondary_relation(origin_model, field_name),
-            ))
-        ]
-
         result_fields = {}
-        for field_name in origin_model_field_names:
+        for field_name, field_kind, python_field_type in get_model_fields(
+            origin_model,
+        ):
             # add simple fields: int, str, date, datetime, etc.
-            if is_simple_alchemy_field(origin_model, field_name):
-                python_field_type = get_python_field_type_from_alchemy_field(
-                    origin_model, field_name,
+            if field_kind == ENUM_FIELD:
+                result_fields[field_name] = MarshmallowEnum(
+                    python_field_type, required=False,
+                )
+            elif field_kind == SIMPLE_FIELD:
+                result_fields[field_name] = (
+                    types_map[python_field_type](required=False)
                 )
-                if is_enum_alchemy_field(origin_model, field_name):
-                    result_fields[field_name] = MarshmallowEnum(
-                        python_field_type, required=False,
-                    )
-                else:
-                    result_fields[field_name] = (
-                        types_map[python_field_type](required=False)
-                    )
             # add nested fields
             elif fields.get(field_name):
                 result_fields[field_name] = Nested(
@@ -118,8 +552,8 @@ class BaseDataclass:
 class MarshmallowToDataclass(type(CustomSchema)):
     def __new__(cls, name: str, bases: Iterable, fields: dict) -> type:
         origin_schema_class = bases[0]
-        origin_schema = origin_schema_class()
-        origin_model_fields = origin_schema.fields
+        # Declared fields are taken from class, without creation of schema
+        origin_model_fields = origin_schema_class._declared_fields
 
         result_fields = []
         for field_name, field_type in origin_model_fields.items():
@@ -145,10 +579,727 @@ class MarshmallowToDataclass(type(CustomSchema)):
 
 
 class DataBase:
+    """Engine is created on first access to it, so creation of DataBase
+    on import doesn't load driver of database and doesn't read settings"""
+
     def __init__(self) -> None:
+        self.compiled_cache_hits = 0
+        self.compiled_cache_misses = 0
+
+    @cached_property
+    def engine(self) -> AsyncEngine:
         settings = Settings()
-        self.engine: AsyncEngine = create_async_engine(
-            settings.postgres_url,
-            echo=True,
+        url = make_url(settings.postgres_url)
+        if (
+            url.get_driver_name() == 'asyncpg' and
+            'prepared_statement_cache_size' not in url.query
+        ):
+            url = url.update_query_dict({
+                'prepared_statement_cache_size': str(
+                    settings.prepared_statement_cache_size,
+                ),
+            })
+
+        engine = create_async_engine(
+            url,
+            echo=settings.database_echo,
+            query_cache_size=settings.compiled_cache_size,
         )
-        self.create_session: Callable = async_sessionmaker(self.engine)
+        event.listen(
+            engine.sync_engine, 'after_cursor_execute',
+            self._count_compiled_cache_hit,
+        )
+        return engine
+
+    def _count_compiled_cache_hit(
+        self,
+        _connection: Any,
+        _cursor: Any,
+        _statement: str,
+        _parameters: Any,
+        context: Any,
+        _executemany: bool,
+    ) -> None:
+        """Listener of after_cursor_execute event of engine"""
+        if context.cache_hit == CacheStats.CACHE_HIT:
+            self.compiled_cache_hits += 1
+        elif context.cache_hit == CacheStats.CACHE_MISS:
+            self.compiled_cache_misses += 1
+
+    def get_compiled_cache_stats(self) -> list[tuple[str, str, float]]:
+        executions_count = (
+            self.compiled_cache_hits + self.compiled_cache_misses
+        )
+        return [
+            ('martin_eden_db_compiled_cache_hits_total',
+             'Statements taken from compiled cache of sqlalchemy',
+             self.compiled_cache_hits),
+            ('martin_eden_db_compiled_cache_misses_total',
+             'Statements compiled again', self.compiled_cache_misses),
+            ('martin_eden_db_compiled_cache_hit_rate',
+             'Part of statements taken from compiled cache',
+             self.compiled_cache_hits / executions_count
+             if executions_count else 0),
+        ]
+
+    async def dispose(self) -> None:
+        """Closes connections of pool, if engine was created"""
+        if 'engine' in self.__dict__:
+            await self.engine.dispose()
+
+    @cached_property
+    def create_session(self) -> Callable:
+        return async_sessionmaker(
+            self.engine, sync_session_class=FrameworkSession,
+        )
+
+    def get_pool_stats(self) -> list[tuple[str, str, float]]:
+        """Statistics of connection pool in format of metrics collector.
+        Not every pool has statistics, NullPool for example, therefore
+        only existing values are returned"""
+        if 'engine' not in self.__dict__:
+            return []
+
+        pool = self.engine.pool
+        stats = []
+        for method_name, metric_name, help_text in (
+            ('size', 'size', 'Size of database connection pool'),
+            ('checkedout', 'checked_out', 'Connections used now'),
+            ('checkedin', 'checked_in', 'Idle connections in pool'),
+            ('overflow', 'overflow', 'Connections over size of pool'),
+        ):
+            method = getattr(pool, method_name, None)
+            if method is not None:
+                stats.append(
+                    (f'martin_eden_db_pool_{metric_name}', help_text, method())
+                )
+        return stats
+
+
+# Methods of bulk insert
+EXECUTEMANY = 'executemany'
+COPY = 'copy'
+
+
+def _items_to_rows(
+    model: type[Base], items: Iterable,
+) -> tuple[list[tuple[str, str]], list[dict]]:
+    """Returns pairs of attribute and column names of model and rows
+    with values of attributes. Values that are None are not added
+    to rows, so defaults of database, for example autoincrement of
+    primary key, are used for them"""
+    columns = [
+        (column_property.key, column_property.columns[0].name)
+        for column_property in inspect(model).column_attrs
+    ]
+    rows = []
+    for item in items:
+        is_dict = isinstance(item, dict)
+        row = {}
+        for attribute_name, _ in columns:
+            value = (
+                item.get(attribute_name) if is_dict
+                else getattr(item, attribute_name, None)
+            )
+            if value is not None:
+                row[attribute_name] = value
+        rows.append(row)
+    return columns, rows
+
+
+async def bulk_insert(
+    session: AsyncSession,
+    model: type[Base],
+    items: Iterable,
+    method: Optional[str] = None,
+) -> int:
+    """Inserts dataclasses or dicts to table of model with one statement
+    and returns count of inserted rows. By default, rows are written
+    with COPY protocol if driver is asyncpg, other drivers use
+    executemany. Data is written in transaction of session, it must
+    be committed by caller"""
+    columns, rows = _items_to_rows(model, items)
+    if not rows:
+        return 0
+
+    connection = await session.connection()
+    if method is None:
+        is_asyncpg = connection.dialect.driver == 'asyncpg'
+        method = COPY if is_asyncpg else EXECUTEMANY
+
+    if method == EXECUTEMANY:
+        await session.execute(insert(model), rows)
+        return len(rows)
+
+    # Only columns that have value at least in one row are copied
+    copied_columns = [
+        (attribute_name, column_name)
+        for attribute_name, column_name in columns
+        if any(attribute_name in row for row in rows)
+    ]
+    records = [
+        tuple(
+            _to_copy_value(row.get(attribute_name))
+            for attribute_name, _ in copied_columns
+        )
+        for row in rows
+    ]
+
+    raw_connection = await connection.get_raw_connection()
+    driver_connection = raw_connection.driver_connection
+    if not driver_connection.is_in_transaction():
+        # sqlalchemy begins transaction of asyncpg lazily, on first
+        # statement, but COPY must be done in transaction of session
+        await connection.execute(select(1))
+
+    table = model.__table__
+    # COPY is not seen by events of session, so table is marked manually
+    mark_written_tables(session, (table.name,))
+    await driver_connection.copy_records_to_table(
+        table.name,
+        records=records,
+        columns=[column_name for _, column_name in copied_columns],
+        schema_name=table.schema,
+    )
+    return len(records)
+
+
+def _to_copy_value(value: Any) -> Any:
+    # Sqlalchemy saves enums by their names
+    if isinstance(value, enum.Enum):
+        return value.name
+    return value
+
+
+# Key of session.info, where names of written tables are collected
+WRITTEN_TABLES_KEY = 'martin_eden_written_tables'
+
+
+def _freeze_param(value: Any) -> Any:
+    # Parameters of "in" filters are lists, but key must be hashable
+    if isinstance(value, list):
+        return tuple(value)
+    return value
+
+
+def get_statement_tables(statement: Executable) -> frozenset[str]:
+    return frozenset(table.name for table in find_tables(
+        statement, include_joins=True, include_aliases=True,
+    ) if hasattr(table, 'name'))
+
+
+class QueryCache:
+    """Cache of results of select statements, it is used only by explicit
+    call of execute. Key is compiled sql with its parameters. Results are
+    kept as FrozenResult, that is rows of the result. Every hit merges
+    the rows to session of caller without loading, so ORM objects are not
+    shared between sessions, and there is no request to database.
+
+    Entries are removed by names of their tables, when session created
+    by DataBase.create_session commits writes to these tables. Also size
+    of cache is limited, the least recently used entries are removed"""
+
+    def __init__(self, max_size: int = 1024, ttl: float = 60) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        # Key -> (time of expiration, names of tables, result)
+        self.entries: OrderedDict[
+            tuple, tuple[float, frozenset[str], FrozenResult]
+        ] = OrderedDict()
+        self.table_keys: dict[str, set[tuple]] = {}
+        # Results, that were read before invalidation of their tables,
+        # but are saved after it, are not saved
+        self.invalidations_count = 0
+        self.table_invalidated_at: dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, max_size: int, ttl: float) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clear()
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.table_keys.clear()
+
+    @staticmethod
+    def make_key(statement: Executable, dialect: Any) -> tuple:
+        """Key is cache key of SQLAlchemy with values of parameters, so
+        statement is not compiled for every lookup. Statement, that
+        SQLAlchemy doesn't cache, is compiled"""
+        cache_key = statement._generate_cache_key()
+        if cache_key is None:
+            compiled = statement.compile(dialect=dialect)
+            return str(compiled), tuple(
+                (name, _freeze_param(value))
+                for name, value in sorted(compiled.params.items())
+            )
+        return dialect.name, cache_key.key, tuple(
+            _freeze_param(parameter.effective_value)
+            for parameter in cache_key.bindparams
+        )
+
+    def get(self, key: tuple) -> Optional[FrozenResult]:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, _, frozen_result = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return frozen_result
+
+    def set(
+        self,
+        key: tuple,
+        tables: frozenset[str],
+        frozen_result: FrozenResult,
+        ttl: Optional[float] = None,
+        invalidations_count: Optional[int] = None,
+    ) -> None:
+        """Invalidations count is value of the counter before reading of
+        result, if tables are invalidated after it, result is stale"""
+        if invalidations_count is not None and any(
+            self.table_invalidated_at.get(table, 0) > invalidations_count
+            for table in tables
+        ):
+            return
+
+        self._remove(key)
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self.entries[key] = (expires_at, tables, frozen_result)
+        for table in tables:
+            self.table_keys.setdefault(table, set()).add(key)
+
+        while len(self.entries) > self.max_size:
+            oldest_key = next(iter(self.entries))
+            self._remove(oldest_key)
+
+    def _remove(self, key: tuple) -> None:
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for table in entry[1]:
+            table_keys = self.table_keys.get(table)
+            if table_keys is not None:
+                table_keys.discard(key)
+                if not table_keys:
+                    del self.table_keys[table]
+
+    def invalidate_tables(self, tables: Iterable[str]) -> None:
+        self.invalidations_count += 1
+        for table in tables:
+            self.table_invalidated_at[table] = self.invalidations_count
+            for key in tuple(self.table_keys.get(table, ())):
+                self._remove(key)
+
+    async def execute(
+        self,
+        session: AsyncSession,
+        statement: Executable,
+        ttl: Optional[float] = None,
+    ) -> Result:
+        """Returns result of statement from cache or from database.
+        Cached result is copied once, so later changes of objects in
+        session, which read it, don't change cache"""
+        key = self.make_key(statement, session.get_bind().dialect)
+        frozen_result = self.get(key)
+        if frozen_result is None:
+            invalidations_count = self.invalidations_count
+            result = await session.execute(statement)
+            frozen_result = copy.deepcopy(result.freeze())
+            self.set(
+                key, get_statement_tables(statement), frozen_result, ttl,
+                invalidations_count,
+            )
+        return merge_frozen_result(
+            session.sync_session, statement, frozen_result, load=False,
+        )()
+
+    def get_stats(self) -> list[tuple[str, str, float]]:
+        return [
+            ('martin_eden_query_cache_hits_total', 'Hits of query cache',
+             self.hits),
+            ('martin_eden_query_cache_misses_total', 'Misses of query cache',
+             self.misses),
+            ('martin_eden_query_cache_size', 'Count of cached results',
+             len(self.entries)),
+        ]
+
+
+query_cache = QueryCache()
+
+
+class FrameworkSession(Session):
+    """Session collects names of tables, that are written in its
+    transaction, and invalidates them in query cache after commit"""
+
+
+def mark_written_tables(
+    session: Union[AsyncSession, Session], tables: Iterable[str],
+) -> None:
+    session.info.setdefault(WRITTEN_TABLES_KEY, set()).update(tables)
+
+
+@event.listens_for(FrameworkSession, 'after_flush')
+def _collect_flushed_tables(
+    session: Session, _flush_context: UOWTransaction,
+) -> None:
+    mark_written_tables(session, (
+        table.name
+        for instance in (*session.new, *session.dirty, *session.deleted)
+        for table in inspect(instance).mapper.tables
+    ))
+
+
+@event.listens_for(FrameworkSession, 'do_orm_execute')
+def _collect_executed_tables(orm_execute_state: ORMExecuteState) -> None:
+    if (
+        orm_execute_state.is_insert or
+        orm_execute_state.is_update or
+        orm_execute_state.is_delete
+    ):
+        mark_written_tables(
+            orm_execute_state.session,
+            get_statement_tables(orm_execute_state.statement),
+        )
+
+
+@event.listens_for(FrameworkSession, 'after_commit')
+def _invalidate_written_tables(session: Session) -> None:
+    tables = session.info.pop(WRITTEN_TABLES_KEY, None)
+    if tables:
+        query_cache.invalidate_tables(tables)
+
+
+@event.listens_for(FrameworkSession, 'after_rollback')
+def _forget_written_tables(session: Session) -> None:
+    session.info.pop(WRITTEN_TABLES_KEY, None)
+
+
+# Channel of postgres NOTIFY with changes of rows
+CHANGE_FEED_CHANNEL = 'martin_eden_changes'
+CHANGE_FEED_FUNCTION = 'martin_eden_notify_change'
+INSERT = 'INSERT'
+UPDATE = 'UPDATE'
+DELETE = 'DELETE'
+
+CHANGE_FEED_FUNCTION_SQL = f'''\
+CREATE OR REPLACE FUNCTION {CHANGE_FEED_FUNCTION}() RETURNS trigger AS $$
+DECLARE
+    row_data jsonb;
+    pk jsonb := '[]'::jsonb;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        row_data := to_jsonb(OLD);
+    ELSE
+        row_data := to_jsonb(NEW);
+    END IF;
+    FOR i IN 1 .. TG_NARGS - 1 LOOP
+        pk := pk || jsonb_build_array(row_data -> TG_ARGV[i]);
+    END LOOP;
+    PERFORM pg_notify(TG_ARGV[0], jsonb_build_object(
+        'table', TG_TABLE_NAME, 'op', TG_OP, 'pk', pk
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql'''
+
+
+def get_change_feed_sql(
+    model: type[Base], channel: str = CHANGE_FEED_CHANNEL,
+) -> list[str]:
+    """SQL of trigger, that sends primary key of every written row of
+    table of model to the channel. Payload of NOTIFY is limited by 8000
+    bytes, so only primary key is sent, not the whole row"""
+    table = model.__table__
+    arguments = ', '.join(
+        f"'{name}'" for name in (channel, *table.primary_key.columns.keys())
+    )
+    trigger_name = f'{table.name}_{CHANGE_FEED_FUNCTION}'
+    return [
+        CHANGE_FEED_FUNCTION_SQL,
+        f'DROP TRIGGER IF EXISTS {trigger_name} ON {table.name}',
+        f'CREATE TRIGGER {trigger_name} '
+        f'AFTER INSERT OR UPDATE OR DELETE ON {table.name} '
+        f'FOR EACH ROW EXECUTE FUNCTION '
+        f'{CHANGE_FEED_FUNCTION}({arguments})',
+    ]
+
+
+def create_change_feed_trigger(
+    model: type[Base], channel: str = CHANGE_FEED_CHANNEL,
+) -> None:
+    """Trigger is created with table by metadata.create_all, only in
+    postgres. For existing table, run SQL of get_change_feed_sql in
+    migration"""
+    for sql in get_change_feed_sql(model, channel):
+        event.listen(
+            model.__table__, 'after_create',
+            DDL(sql).execute_if(dialect='postgresql'),
+        )
+
+
+def _get_models_by_tables() -> dict[str, type[Base]]:
+    return {
+        mapper.local_table.name: mapper.class_
+        for mapper in Base.registry.mappers
+        if mapper.local_table is not None
+    }
+
+
+@dataclasses.dataclass(frozen=True)
+class ChangeEvent:
+    table: str
+    operation: str
+    # None means, that many rows of table were changed, and they
+    # were coalesced to one event
+    primary_key: Any = None
+
+    @property
+    def model(self) -> Optional[type[Base]]:
+        return _get_models_by_tables().get(self.table)
+
+
+def decode_change_notification(payload: str) -> Optional[ChangeEvent]:
+    try:
+        data = json.loads(payload)
+        table, operation = data['table'], data['op']
+    except (ValueError, TypeError, KeyError):
+        logger.warning('Wrong payload of change notification: %s', payload)
+        return None
+    primary_key = data.get('pk')
+    if isinstance(primary_key, list):
+        primary_key = (
+            primary_key[0] if len(primary_key) == 1 else tuple(primary_key)
+        )
+    return ChangeEvent(table, operation, primary_key)
+
+
+class ChangeFeed:
+    """Listens to changes of rows, that are sent by triggers from
+    create_change_feed_trigger, with one dedicated connection of asyncpg
+    per worker. It is not connection of pool, LISTEN needs connection,
+    that is never returned to pool.
+
+    Events are coalesced: the same row changed many times is one event,
+    and when there are more than max_pending rows, events of table are
+    replaced by one event of the whole table. Subscribers get list of
+    events, when there were no new events during debounce seconds, but
+    not later than max_delay seconds after the first event"""
+
+    def __init__(
+        self,
+        channel: str = CHANGE_FEED_CHANNEL,
+        debounce: float = 0.05,
+        max_delay: float = 0.5,
+        max_pending: int = 1000,
+    ) -> None:
+        self.configure(channel, debounce, max_delay, max_pending)
+        self.subscribers: list[tuple[Callable, Optional[frozenset]]] = []
+        self.pending: dict[tuple[str, Any], ChangeEvent] = {}
+        self.notifications_count = 0
+        self.batches_count = 0
+        self.reconnections_count = 0
+        self._first_event_time: Optional[float] = None
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def configure(
+        self,
+        channel: str,
+        debounce: float,
+        max_delay: float,
+        max_pending: int = 1000,
+    ) -> None:
+        self.channel = channel
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+
+    def subscribe(
+        self, callback: Callable, tables: Optional[Iterable[str]] = None,
+    ) -> None:
+        """Callback gets list of events, if it is coroutine function,
+        it is run in task. If tables are passed, callback gets only
+        events of the tables"""
+        self.subscribers.append(
+            (callback, frozenset(tables) if tables is not None else None),
+        )
+
+    def unsubscribe(self, callback: Callable) -> None:
+        self.subscribers = [
+            subscriber for subscriber in self.subscribers
+            if subscriber[0] is not callback
+        ]
+
+    def add_event(self, change_event: ChangeEvent) -> None:
+        table_key = (change_event.table, None)
+        if table_key in self.pending:
+            # The whole table is already changed
+            self.pending[table_key] = ChangeEvent(
+                change_event.table, change_event.operation,
+            )
+        else:
+            key = (change_event.table, change_event.primary_key)
+            if key not in self.pending and (
+                len(self.pending) >= self.max_pending
+            ):
+                self._coalesce_table(change_event)
+            else:
+                self.pending[key] = change_event
+        self._schedule_flush()
+
+    def _coalesce_table(self, change_event: ChangeEvent) -> None:
+        for key in list(self.pending):
+            if key[0] == change_event.table:
+                del self.pending[key]
+        self.pending[(change_event.table, None)] = ChangeEvent(
+            change_event.table, change_event.operation,
+        )
+
+    def _schedule_flush(self) -> None:
+        event_loop = asyncio.get_running_loop()
+        now = event_loop.time()
+        if self._first_event_time is None:
+            self._first_event_time = now
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        self._flush_handle = event_loop.call_at(
+            min(now + self.debounce, self._first_event_time + self.max_delay),
+            self.flush,
+        )
+
+    def flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self._first_event_time = None
+        if not self.pending:
+            return
+        events = list(self.pending.values())
+        self.pending.clear()
+        self.batches_count += 1
+
+        for callback, tables in tuple(self.subscribers):
+            subscriber_events = events if tables is None else [
+                change_event for change_event in events
+                if change_event.table in tables
+            ]
+            if not subscriber_events:
+                continue
+            try:
+                result = callback(subscriber_events)
+                if asyncio.iscoroutine(result):
+                    asyncio.get_running_loop().create_task(result)
+            except Exception:
+                logger.exception('Error in subscriber of change feed')
+
+    def _on_notification(
+        self, _connection: Any, _pid: int, _channel: str, payload: str,
+    ) -> None:
+        """Listener of asyncpg connection"""
+        self.notifications_count += 1
+        change_event = decode_change_notification(payload)
+        if change_event is not None:
+            self.add_event(change_event)
+
+    def start(self, url: str, reconnect_delay: float = 1) -> None:
+        """Must be called from running event loop"""
+        self.stop()
+        self._task = asyncio.get_running_loop().create_task(
+            self._listen(url, reconnect_delay),
+        )
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _listen(self, url: str, reconnect_delay: float) -> None:
+        """Errors of connection lead to reconnect, other errors stop
+        the change feed, so they are logged"""
+        try:
+            await self._listen_with_reconnects(url, reconnect_delay)
+        except Exception:
+            logger.exception('Change feed has stopped')
+            raise
+
+    async def _listen_with_reconnects(
+        self, url: str, reconnect_delay: float,
+    ) -> None:
+        # asyncpg is driver of postgres, it is imported only if change
+        # feed is started, so the framework works without it
+        import asyncpg
+
+        # Dropped connection raises InterfaceError, for example
+        # ConnectionDoesNotExistError
+        connection_errors = (
+            OSError, asyncpg.PostgresError, asyncpg.InterfaceError,
+        )
+        dsn = make_url(url).set(drivername='postgresql', query={})
+        dsn = dsn.render_as_string(hide_password=False)
+        connected_before = False
+        while True:
+            try:
+                connection = await asyncpg.connect(dsn)
+            except connection_errors as exc:
+                logger.warning('Change feed cannot connect: %s', exc)
+                await asyncio.sleep(reconnect_delay)
+                continue
+
+            if connected_before:
+                # Notifications are lost while there was no connection
+                self.reconnections_count += 1
+                for table in Base.metadata.tables.values():
+                    self.add_event(ChangeEvent(table.name, UPDATE))
+            connected_before = True
+
+            terminated = asyncio.Event()
+            connection.add_termination_listener(
+                lambda _connection, terminated=terminated: terminated.set(),
+            )
+            try:
+                await connection.add_listener(
+                    self.channel, self._on_notification,
+                )
+                await terminated.wait()
+                logger.warning('Connection of change feed is lost')
+            except connection_errors as exc:
+                logger.warning('Change feed has failed: %s', exc)
+            finally:
+                if not connection.is_closed():
+                    connection.terminate()
+            await asyncio.sleep(reconnect_delay)
+
+    def get_stats(self) -> list[tuple[str, str, float]]:
+        return [
+            ('martin_eden_change_feed_notifications_total',
+             'Notifications received by change feed',
+             self.notifications_count),
+            ('martin_eden_change_feed_batches_total',
+             'Batches of coalesced events sent to subscribers',
+             self.batches_count),
+            ('martin_eden_change_feed_reconnections_total',
+             'Reconnections of change feed to database',
+             self.reconnections_count),
+        ]
+
+
+def invalidate_query_cache(change_events: list[ChangeEvent]) -> None:
+    """Writes of other workers and other services reach query cache
+    of the worker only through change feed"""
+    query_cache.invalidate_tables({
+        change_event.table for change_event in change_events
+    })
+
+
+change_feed = ChangeFeed()
+change_feed.subscribe(invalidate_query_cache)
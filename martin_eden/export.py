@@ -0,0 +1,109 @@
+import csv
+import io
+import json
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, Optional, Union
+
+from marshmallow import Schema
+
+JSON = 'json'
+NDJSON = 'ndjson'
+CSV = 'csv'
+EXPORT_FORMATS = (JSON, NDJSON, CSV)
+# The query param is not a filter, it is removed before making of filters
+FORMAT_QUERY_PARAM = 'format'
+
+CONTENT_TYPES = {
+    JSON: 'application/json',
+    NDJSON: 'application/x-ndjson',
+    CSV: 'text/csv',
+}
+ACCEPT_TO_FORMAT = {
+    'application/x-ndjson': NDJSON,
+    'application/ndjson': NDJSON,
+    'text/csv': CSV,
+}
+
+# Rows are collected to chunks of such size before sending to socket
+EXPORT_CHUNK_SIZE = 65536
+
+Rows = Union[Iterable, AsyncIterable]
+
+
+def negotiate_export_format(format_param: Optional[str], accept: str) -> str:
+    """Format from "format" query parameter has priority over
+    Accept header. If nothing matches, json is used"""
+    if format_param in EXPORT_FORMATS:
+        return format_param
+
+    for media_range in accept.split(','):
+        media_type = media_range.split(';')[0].strip().lower()
+        if media_type in ACCEPT_TO_FORMAT:
+            return ACCEPT_TO_FORMAT[media_type]
+    return JSON
+
+
+async def iter_rows(rows: Rows) -> AsyncIterator:
+    if isinstance(rows, AsyncIterable):
+        async for row in rows:
+            yield row
+    else:
+        for row in rows:
+            yield row
+
+
+def dump_row(row: Any, schema: Optional[Schema]) -> Any:
+    """Dicts are already dumped, but they are dumped again,
+    if schema has only part of fields"""
+    if schema is not None and (
+        not isinstance(row, dict) or schema.only is not None
+    ):
+        return schema.dump(row, many=False)
+    return row
+
+
+def _to_csv_value(value: Any) -> Any:
+    if value is None:
+        return ''
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+async def iter_export_chunks(
+    rows: Rows, export_format: str, schema: Optional[Schema] = None,
+) -> AsyncIterator[str]:
+    """Rows are serialized one by one and sent by chunks, so memory
+    doesn't depend on count of rows. The first row is sent at once,
+    client doesn't wait until the whole query is done.
+
+    Every row is dumped with marshmallow schema of route, csv columns
+    are fields of the schema, or keys of first row without schema"""
+    buffer = io.StringIO()
+    csv_writer = None
+    columns = None
+    is_first_row = True
+
+    async for row in iter_rows(rows):
+        dumped_row = dump_row(row, schema)
+        if export_format == NDJSON:
+            buffer.write(json.dumps(dumped_row))
+            buffer.write('\n')
+        else:
+            if csv_writer is None:
+                columns = list(schema.fields) if schema else list(dumped_row)
+                csv_writer = csv.writer(buffer)
+                csv_writer.writerow(columns)
+            csv_writer.writerow([
+                _to_csv_value(dumped_row.get(column)) for column in columns
+            ])
+
+        if is_first_row or buffer.tell() >= EXPORT_CHUNK_SIZE:
+            is_first_row = False
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if export_format == CSV and csv_writer is None and schema is not None:
+        csv.writer(buffer).writerow(list(schema.fields))
+    if buffer.tell():
+        yield buffer.getvalue()
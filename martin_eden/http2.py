@@ -0,0 +1,362 @@
+# Http/2 over cleartext tcp (h2c), with prior knowledge or upgrade from
+# http/1.1. Frames, HPACK and flow control are made by h2 library, it is
+# optional dependency, the module is imported only when http2 is enabled
+# and client starts http/2 connection.
+#
+# Every stream is converted to http/1 message and handled by the same
+# HttpMessageHandler as other requests, streams are handled concurrently
+# in their own tasks
+import asyncio
+import contextlib
+import logging
+import socket
+import time
+from asyncio import AbstractEventLoop
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+from h2.config import H2Configuration
+from h2.connection import H2Connection
+from h2.errors import ErrorCodes
+from h2.events import (
+    ConnectionTerminated,
+    DataReceived,
+    RemoteSettingsChanged,
+    RequestReceived,
+    StreamEnded,
+    StreamReset,
+    WindowUpdated,
+)
+from h2.exceptions import ProtocolError, StreamClosedError
+from h2.settings import SettingCodes
+
+from martin_eden.http_utils import (
+    H2_PREFACE,
+    find_headers_end,
+    get_h2c_upgrade_settings,
+)
+from martin_eden.push import WebSocketConnection
+from martin_eden.static import FileResponse
+
+logger = logging.getLogger(__name__)
+
+H2_RECV_SIZE = 65536
+# Body of stream is collected in memory before handling, bigger
+# streams are reset
+H2_MAX_BODY_SIZE = 16777216
+# Headers of http/1 connection, they are not allowed in http/2
+CONNECTION_HEADERS = frozenset({
+    'connection', 'keep-alive', 'proxy-connection', 'transfer-encoding',
+    'upgrade',
+})
+SWITCHING_PROTOCOLS = (
+    b'HTTP/1.1 101 Switching Protocols\r\n'
+    b'Connection: Upgrade\r\n'
+    b'Upgrade: h2c\r\n'
+    b'\r\n'
+)
+
+Headers = list[tuple[str, str]]
+# Function gets http/1 message and address of client, and returns
+# handler and its response
+RunHandler = Callable[[bytes, Optional[str]], Awaitable[tuple[Any, Any]]]
+# Function gets handler, start time of request and count of sent bytes
+RecordRequest = Callable[[Any, float, int], None]
+
+
+def h2_request_to_message(headers: Headers, body: bytes) -> bytes:
+    """Http/1 message from headers and body of stream"""
+    pseudo_headers = {}
+    lines = []
+    cookies = []
+    for name, value in headers:
+        if name.startswith(':'):
+            pseudo_headers[name] = value
+        elif name == 'cookie':
+            # Cookies can be split to many headers in http/2
+            cookies.append(value)
+        else:
+            lines.append(f'{name}: {value}\r\n')
+    if cookies:
+        lines.append(f'cookie: {"; ".join(cookies)}\r\n')
+    if ':authority' in pseudo_headers:
+        lines.insert(0, f'host: {pseudo_headers[":authority"]}\r\n')
+
+    first_line = (
+        f'{pseudo_headers.get(":method", "GET")} '
+        f'{pseudo_headers.get(":path", "/")} HTTP/2\r\n'
+    )
+    return (first_line + ''.join(lines) + '\r\n').encode('utf8') + body
+
+
+def parse_http1_response(response: bytes) -> tuple[Headers, bytes]:
+    """Http/2 headers and body from response of HttpMessageHandler"""
+    headers_end, line_breaks_length = find_headers_end(response)
+    if headers_end == -1:
+        headers_end, line_breaks_length = len(response), 0
+    status_line, *header_lines = (
+        response[:headers_end].decode('utf8').splitlines()
+    )
+    headers = [(':status', status_line.split(' ')[1])]
+    for line in header_lines:
+        name, _, value = line.partition(':')
+        name = name.strip().lower()
+        if name and name not in CONNECTION_HEADERS:
+            headers.append((name, value.strip()))
+    return headers, response[headers_end + line_breaks_length:]
+
+
+class H2cConnection:
+    def __init__(
+        self,
+        event_loop: AbstractEventLoop,
+        client_socket: socket.socket,
+        client_address: Optional[str],
+        run_handler: RunHandler,
+        record_request: Optional[RecordRequest] = None,
+        max_concurrent_streams: int = 100,
+    ) -> None:
+        self.event_loop = event_loop
+        self.client_socket = client_socket
+        self.client_address = client_address
+        self.run_handler = run_handler
+        self.record_request = record_request
+        self.max_concurrent_streams = max_concurrent_streams
+
+        self.connection = H2Connection(config=H2Configuration(
+            client_side=False, header_encoding='utf-8',
+        ))
+        # Headers and body of streams, that are not received completely
+        self.streams: dict[int, tuple[Headers, bytearray]] = {}
+        self.tasks: dict[int, asyncio.Task] = {}
+        self.bytes_sent = 0
+        self.closed = False
+        # Frames of all streams are written by one writer at a time
+        self._write_lock = asyncio.Lock()
+        self._window_updated = asyncio.Event()
+        # Handlers of events of h2, other events are ignored
+        self._event_handlers: dict[type, Callable[[Any], None]] = {
+            RequestReceived: self._on_request_received,
+            DataReceived: self._on_data_received,
+            StreamEnded: self._on_stream_ended,
+            StreamReset: self._on_stream_reset,
+            WindowUpdated: self._on_window_updated,
+            RemoteSettingsChanged: self._on_window_updated,
+        }
+
+    async def run(self, message: bytes) -> int:
+        """Message is the first data from client, it is http/2 preface
+        or http/1.1 request with upgrade. Returns count of sent bytes"""
+        upgrade_settings = None
+        if not message.startswith(H2_PREFACE):
+            upgrade_settings = get_h2c_upgrade_settings(message)
+
+        if upgrade_settings is not None:
+            await self.event_loop.sock_sendall(
+                self.client_socket, SWITCHING_PROTOCOLS,
+            )
+            self.bytes_sent += len(SWITCHING_PROTOCOLS)
+            self.connection.initiate_upgrade_connection(upgrade_settings)
+            # Request with upgrade is stream 1, preface comes after it
+            self._start_stream(1, message)
+            data = b''
+        else:
+            self.connection.initiate_connection()
+            data = message
+        self.connection.update_settings({
+            SettingCodes.MAX_CONCURRENT_STREAMS: self.max_concurrent_streams,
+        })
+        await self._flush()
+
+        try:
+            while True:
+                if data:
+                    events = self.connection.receive_data(data)
+                    terminated = self._handle_events(events)
+                    await self._flush()
+                    if terminated:
+                        break
+                data = await self.event_loop.sock_recv(
+                    self.client_socket, H2_RECV_SIZE,
+                )
+                if not data:
+                    break
+        except ProtocolError as exc:
+            logger.debug('Http/2 protocol error: %s', exc)
+            await self._flush()
+        except OSError as exc:
+            logger.debug('Http/2 connection is closed: %s', exc)
+        finally:
+            await self._close()
+        return self.bytes_sent
+
+    async def go_away(self) -> None:
+        """Sends GOAWAY on shutdown, streams, that are handled now, are
+        finished, then connection is closed"""
+        self.connection.close_connection()
+        await self._flush()
+        tasks = list(self.tasks.values())
+        await asyncio.gather(*tasks, return_exceptions=True)
+        with contextlib.suppress(OSError):
+            self.client_socket.shutdown(socket.SHUT_RDWR)
+
+    async def _close(self) -> None:
+        self.closed = True
+        self._window_updated.set()
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _handle_events(self, events: list) -> bool:
+        """Returns True, if client has terminated connection"""
+        for event in events:
+            if isinstance(event, ConnectionTerminated):
+                return True
+            handle_event = self._event_handlers.get(type(event))
+            if handle_event is not None:
+                handle_event(event)
+        return False
+
+    def _on_request_received(self, event: RequestReceived) -> None:
+        self.streams[event.stream_id] = (event.headers, bytearray())
+
+    def _on_data_received(self, event: DataReceived) -> None:
+        self.connection.acknowledge_received_data(
+            event.flow_controlled_length, event.stream_id,
+        )
+        stream = self.streams.get(event.stream_id)
+        if stream is None:
+            return
+        stream[1].extend(event.data)
+        if len(stream[1]) > H2_MAX_BODY_SIZE:
+            del self.streams[event.stream_id]
+            self.connection.reset_stream(
+                event.stream_id, ErrorCodes.REFUSED_STREAM,
+            )
+
+    def _on_stream_ended(self, event: StreamEnded) -> None:
+        stream = self.streams.pop(event.stream_id, None)
+        if stream is not None:
+            self._start_stream(
+                event.stream_id, h2_request_to_message(*stream),
+            )
+
+    def _on_stream_reset(self, event: StreamReset) -> None:
+        self.streams.pop(event.stream_id, None)
+        task = self.tasks.get(event.stream_id)
+        if task is not None:
+            task.cancel()
+
+    def _on_window_updated(self, _event: Any) -> None:
+        self._window_updated.set()
+
+    def _start_stream(self, stream_id: int, message: bytes) -> None:
+        task = asyncio.create_task(self._handle_stream(stream_id, message))
+        self.tasks[stream_id] = task
+        task.add_done_callback(lambda _: self.tasks.pop(stream_id, None))
+
+    async def _handle_stream(self, stream_id: int, message: bytes) -> None:
+        start_time = time.perf_counter()
+        try:
+            handler, response = await self.run_handler(
+                message, self.client_address,
+            )
+        except Exception:
+            # Other streams of connection are not broken by the error
+            logger.exception('Error of http/2 stream %s', stream_id)
+            self.connection.reset_stream(stream_id, ErrorCodes.INTERNAL_ERROR)
+            await self._flush()
+            return
+        if isinstance(response, WebSocketConnection):
+            response = handler.create_status_response(
+                400, 'websocket is not supported over http/2',
+            )
+
+        bytes_sent = 0
+        try:
+            if isinstance(response, bytes):
+                headers, body = parse_http1_response(response)
+                # Response to HEAD has content-length of file already
+                if not any(name == 'content-length' for name, _ in headers):
+                    headers.append(('content-length', str(len(body))))
+                bytes_sent = await self._send_response(
+                    stream_id, headers, body,
+                )
+            elif isinstance(response, FileResponse):
+                # Frames of stream are made from chunks of file
+                bytes_sent = await self._send_stream(
+                    stream_id, response.iter_chunks(),
+                )
+            else:
+                bytes_sent = await self._send_stream(stream_id, response)
+        except (StreamClosedError, ConnectionError) as exc:
+            logger.debug('Http/2 stream %s is closed: %s', stream_id, exc)
+
+        if self.record_request is not None:
+            self.record_request(handler, start_time, bytes_sent)
+
+    async def _send_response(
+        self, stream_id: int, headers: Headers, body: bytes,
+    ) -> int:
+        self.connection.send_headers(stream_id, headers, end_stream=not body)
+        await self._flush()
+        if body:
+            await self._send_data(stream_id, body, end_stream=True)
+        return len(body)
+
+    async def _send_stream(
+        self, stream_id: int, stream: AsyncIterator[bytes],
+    ) -> int:
+        """The first chunk of streaming response has headers"""
+        bytes_sent = 0
+        headers_sent = False
+        try:
+            async for chunk in stream:
+                data = chunk
+                if not headers_sent:
+                    headers, data = parse_http1_response(chunk)
+                    self.connection.send_headers(stream_id, headers)
+                    await self._flush()
+                    headers_sent = True
+                if data:
+                    await self._send_data(stream_id, data)
+                    bytes_sent += len(data)
+        finally:
+            await stream.aclose()
+        if headers_sent:
+            self.connection.end_stream(stream_id)
+            await self._flush()
+        return bytes_sent
+
+    async def _send_data(
+        self, stream_id: int, data: bytes, end_stream: bool = False,
+    ) -> None:
+        """Data is sent by frames, that fit to flow control window of
+        stream. When window is empty, stream waits for WINDOW_UPDATE"""
+        view = memoryview(data)
+        while view:
+            window = self.connection.local_flow_control_window(stream_id)
+            if window <= 0:
+                self._window_updated.clear()
+                await self._window_updated.wait()
+                if self.closed:
+                    raise ConnectionResetError('http/2 connection is closed')
+                continue
+            size = min(
+                window, self.connection.max_outbound_frame_size, len(view),
+            )
+            self.connection.send_data(
+                stream_id, view[:size].tobytes(),
+                end_stream=end_stream and size == len(view),
+            )
+            view = view[size:]
+            await self._flush()
+
+    async def _flush(self) -> None:
+        """Bytes are taken from h2 under lock, so frames of
+        concurrent streams are written in order of their making"""
+        async with self._write_lock:
+            data = self.connection.data_to_send()
+            if data:
+                await self.event_loop.sock_sendall(self.client_socket, data)
+                self.bytes_sent += len(data)
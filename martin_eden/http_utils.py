@@ -2,14 +2,21 @@
 # GET /some/path HTTP/1.1
 # Host: localhost:8001
 # Connection: keep-alive
-from typing import Optional
+import json
+from functools import cached_property
+from typing import Any, AsyncIterable, Iterator, Optional, Union
 from urllib.parse import unquote
 
+HEADERS_END_MARKERS = (b'\r\n\r\n', b'\n\n', b'\r\r')
+# Client with prior knowledge of http/2 starts connection with it
+H2_PREFACE = b'PRI * HTTP/2.0\r\n\r\nSM\r\n\r\n'
+
 
 class HttpMethod:
     OPTIONS = 'OPTIONS'
     POST = 'POST'
     GET = 'GET'
+    HEAD = 'HEAD'
 
 
 class HttpHeadersParser:
@@ -23,7 +30,15 @@ class HttpHeadersParser:
         self.method_name: str = self._get_method_name()
         self.path: str = self._get_path()
         self.query_params = self._get_query_params()
-        self.body: str = self._get_body()
+
+    @cached_property
+    def headers(self) -> dict[str, str]:
+        """Headers and body are parsed on first access"""
+        return self._get_headers()
+
+    @cached_property
+    def body(self) -> str:
+        return self._get_body()
 
     def _detect_line_break_char(self) -> None:
         self.line_break_char: str = '\r'
@@ -67,6 +82,17 @@ class HttpHeadersParser:
             query_params[key] = value
         return query_params
 
+    def _get_headers(self) -> dict:
+        """Names of headers are in lower case, headers
+        are lines between first line and empty line"""
+        headers = {}
+        for line in self.lines_of_header[1:]:
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        return headers
+
     def _get_body(self) -> str:
         """Body of http message starts after two line break characters"""
         position_of_headers_end = (
@@ -83,8 +109,162 @@ class HttpHeadersParser:
             return self.http_message[position_of_body_starts:]
 
 
+class Request:
+    """Request for controllers, that have "request" argument. Headers,
+    cookies and body are parsed on first access to them, so routes
+    without the argument don't pay for it"""
+    __slots__ = ('_parser', 'client_address', '_cookies')
+
+    def __init__(
+        self, parser: HttpHeadersParser, client_address: Optional[str] = None,
+    ) -> None:
+        self._parser = parser
+        self.client_address = client_address
+        self._cookies: Optional[dict[str, str]] = None
+
+    @property
+    def method(self) -> str:
+        return self._parser.method_name
+
+    @property
+    def path(self) -> str:
+        return self._parser.path
+
+    @property
+    def query_params(self) -> dict:
+        return self._parser.query_params
+
+    @property
+    def headers(self) -> dict[str, str]:
+        """Names of headers are in lower case"""
+        return self._parser.headers
+
+    @property
+    def cookies(self) -> dict[str, str]:
+        if self._cookies is None:
+            self._cookies = {}
+            for cookie in self.headers.get('cookie', '').split(';'):
+                name, _, value = cookie.partition('=')
+                if name.strip():
+                    self._cookies[name.strip()] = unquote(value.strip())
+        return self._cookies
+
+    @property
+    def body(self) -> str:
+        return self._parser.body
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+
+ResponseBody = Union[bytes, str, AsyncIterable[Union[bytes, str]]]
+
+
+class Response:
+    """Controller returns it to set status and headers of response.
+    Body that is async iterable is streamed by chunks, its end is
+    closing of connection"""
+    __slots__ = ('body', 'status', 'headers', 'content_type')
+
+    def __init__(
+        self,
+        body: ResponseBody = b'',
+        status: int = 200,
+        headers: Optional[dict[str, str]] = None,
+        content_type: Optional[str] = 'application/json',
+    ) -> None:
+        self.body = body
+        self.status = status
+        self.headers = headers
+        self.content_type = content_type
+
+    def render_headers(self) -> bytes:
+        return create_response_headers(
+            self.status, self.content_type, extra_headers=self.headers,
+        ).encode('utf8')
+
+
+def find_headers_end(message: bytes) -> tuple[int, int]:
+    """Returns position where headers end and length of line breaks
+    that separate headers from body. If headers are not received
+    completely, position is -1"""
+    for marker in HEADERS_END_MARKERS:
+        position = message.find(marker)
+        if position != -1:
+            return position, len(marker)
+    return -1, 0
+
+
+def get_header(headers: bytes, header_name: bytes) -> Optional[bytes]:
+    """Value of header from raw headers, name is in lower case"""
+    for line in headers.splitlines():
+        name, _, value = line.partition(b':')
+        if name.strip().lower() == header_name:
+            return value.strip()
+    return None
+
+
+def get_content_length(headers: bytes) -> Optional[int]:
+    """Invalid or negative Content-Length is the same as no header,
+    then message ends with short chunk"""
+    value = get_header(headers, b'content-length')
+    if value is None or not value.isdigit():
+        return None
+    return int(value)
+
+
+def get_h2c_upgrade_settings(message: bytes) -> Optional[bytes]:
+    """Returns HTTP2-Settings header of http/1.1 request, that asks
+    upgrade to h2c, or None for other requests"""
+    headers_end, _ = find_headers_end(message)
+    headers = message if headers_end == -1 else message[:headers_end]
+    upgrade = get_header(headers, b'upgrade')
+    if upgrade is None or upgrade.lower() != b'h2c':
+        return None
+    return get_header(headers, b'http2-settings')
+
+
+def is_h2c_message(message: bytes) -> bool:
+    return message.startswith(H2_PREFACE) or (
+        get_h2c_upgrade_settings(message) is not None
+    )
+
+
+def iter_json_items(body: str) -> Iterator[tuple[Any, Optional[str]]]:
+    """Body is json array or NDJSON - one json document in every line.
+    Generator yields pairs of item and error of its decoding, NDJSON is
+    decoded line by line, so one broken line doesn't break other items"""
+    body = body.strip()
+    if body.startswith('['):
+        try:
+            items = json.loads(body)
+        except json.JSONDecodeError as exc:
+            yield None, str(exc)
+            return
+        for item in items:
+            yield item, None
+        return
+
+    line_start = 0
+    while line_start < len(body):
+        line_end = body.find('\n', line_start)
+        if line_end == -1:
+            line_end = len(body)
+        line = body[line_start:line_end].strip()
+        line_start = line_end + 1
+        if not line:
+            continue
+        try:
+            yield json.loads(line), None
+        except json.JSONDecodeError as exc:
+            yield None, str(exc)
+
+
 def create_response_headers(
-    status: int, content_type: Optional[str] = None, for_options: bool = False,
+    status: int,
+    content_type: Optional[str] = None,
+    for_options: bool = False,
+    extra_headers: Optional[dict[str, str]] = None,
 ) -> str:
     """Status is number, 200 or 404
     content_type examples is:
@@ -94,6 +274,11 @@ def create_response_headers(
     allow_methods = 'Allow: OPTIONS, GET, POST\n'
     if content_type:
         content_type = f'Content-Type: {content_type};charset=UTF-8\n'
+    extra_lines = ''
+    if extra_headers:
+        extra_lines = ''.join(
+            f'{name}: {value}\n' for name, value in extra_headers.items()
+        )
 
     return (
         f'HTTP/1.0 {status}\n'
@@ -104,5 +289,6 @@ def create_response_headers(
         'Access-Control-Max-Age: 86400\n'
         f'{allow_methods if for_options else ""}'
         f'{content_type if content_type else ""}'
+        f'{extra_lines}'
         f'\n'
     )
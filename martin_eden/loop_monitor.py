@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Iterable, Optional
+
+from martin_eden.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class LoopLagMonitor:
+    """Task of the monitor sleeps for interval and measures how much
+    later it wakes up. The lag is time, when event loop was busy with
+    other callbacks and couldn't switch to the task, for healthy loop
+    it is close to zero. It costs one timer per interval.
+
+    If block_threshold is set, watchdog thread checks the same timer.
+    When the timer is late more than threshold, event loop is blocked
+    right now, and watchdog logs stack of thread of event loop, that
+    is stack of code that blocks it. Stack is logged once per block"""
+
+    def __init__(self) -> None:
+        self.interval = 0.5
+        self.block_threshold = 0.0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.blocks_count = 0
+        # perf_counter time, when the task must wake up
+        self.expected_wakeup: Optional[float] = None
+        self._reported_wakeup: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._watchdog_stop = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+
+        self.lag_histogram = metrics.get_histogram(
+            'martin_eden_event_loop_lag_seconds',
+            'Delay of timer of event loop, it shows how long '
+            'event loop was blocked',
+        )
+        metrics.register_collector(self.get_stats)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self, interval: float = 0.5, block_threshold: float = 0) -> None:
+        """Must be called from running event loop"""
+        self.stop()
+        self.interval = interval
+        self.block_threshold = block_threshold
+        self._loop_thread_id = threading.get_ident()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+        if block_threshold:
+            self._watchdog_stop.clear()
+            self._watchdog = threading.Thread(
+                target=self._watch, name='loop-watchdog', daemon=True,
+            )
+            self._watchdog.start()
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog_stop.set()
+            self._watchdog.join()
+            self._watchdog = None
+        self.expected_wakeup = None
+
+    async def _run(self) -> None:
+        while True:
+            self.expected_wakeup = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(time.perf_counter() - self.expected_wakeup, 0.0)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self.lag_histogram.observe(lag)
+
+    def _watch(self) -> None:
+        check_interval = self.block_threshold / 2
+        while not self._watchdog_stop.wait(check_interval):
+            expected_wakeup = self.expected_wakeup
+            if (
+                expected_wakeup is None or
+                expected_wakeup == self._reported_wakeup
+            ):
+                continue
+            lag = time.perf_counter() - expected_wakeup
+            if lag > self.block_threshold:
+                self._reported_wakeup = expected_wakeup
+                self._report_block(lag)
+
+    def _report_block(self, lag: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return
+        self.blocks_count += 1
+        logger.warning(
+            'Event loop is blocked for %.3f seconds, stack of the loop:\n%s',
+            lag, ''.join(traceback.format_stack(frame)),
+        )
+
+    def get_stats(self) -> Iterable[tuple[str, str, float]]:
+        return (
+            (
+                'martin_eden_event_loop_lag_last_seconds',
+                'Last measured delay of timer of event loop',
+                self.last_lag,
+            ),
+            (
+                'martin_eden_event_loop_lag_max_seconds',
+                'Max measured delay of timer of event loop',
+                self.max_lag,
+            ),
+            (
+                'martin_eden_event_loop_blocks_total',
+                'Count of blocks of event loop caught by watchdog',
+                self.blocks_count,
+            ),
+        )
+
+
+loop_monitor = LoopLagMonitor()
@@ -0,0 +1,242 @@
+# Metrics of requests handling in prometheus text format.
+#
+# All metrics are changed only from thread of event loop, therefore they
+# are plain python numbers and lists without any locks. Histograms and
+# counters of route are created once, on first request to the route,
+# next requests only increment already existed numbers
+import time
+from bisect import bisect_left
+from typing import Callable, Iterable, Optional
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4'
+COUNTER_SUFFIX = '_total'
+
+# Phases of request handling, they are indexes in RequestTimer.durations
+ROUTING = 0
+PARSING = 1
+CONTROLLER = 2
+SERIALIZATION = 3
+SOCKET_WRITE = 4
+PHASE_NAMES = (
+    'routing', 'parsing', 'controller', 'serialization', 'socket_write',
+)
+
+UNMATCHED_ROUTE = '<unmatched>'
+
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+# Collector returns iterable of metrics: (name, help, value). Name of
+# counter, that only grows, ends with _total, other metrics are gauges
+Collector = Callable[[], Iterable[tuple[str, str, float]]]
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        # Last element is for values that greater than all buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self) -> list[int]:
+        result = []
+        total = 0
+        for count in self.counts:
+            total += count
+            result.append(total)
+        return result
+
+
+class RequestTimer:
+    """Measures duration of every phase of one request. Every call
+    of lap adds time from previous lap to the phase"""
+    __slots__ = ('last', 'durations')
+
+    def __init__(self) -> None:
+        self.last = time.perf_counter()
+        self.durations = [0.0] * len(PHASE_NAMES)
+
+    def lap(self, phase: int) -> None:
+        now = time.perf_counter()
+        self.durations[phase] += now - self.last
+        self.last = now
+
+
+class RouteMetrics:
+    __slots__ = ('statuses', 'duration', 'phases')
+
+    def __init__(self) -> None:
+        self.statuses: dict[int, int] = {}
+        self.duration = Histogram()
+        self.phases = tuple(Histogram() for _ in PHASE_NAMES)
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self.routes: dict[tuple[str, str], RouteMetrics] = {}
+        self.in_flight = 0
+        self.collectors: list[Collector] = []
+        # Histograms that are not related to routes: name -> (help, labels
+        # of histogram -> histogram)
+        self.histograms: dict[
+            str, tuple[str, dict[tuple, Histogram]]
+        ] = {}
+
+    def register_collector(self, collector: Collector) -> None:
+        """Collectors are called only during rendering of metrics,
+        it is good place for values that are expensive to track
+        on every request, for example statistics of database pool"""
+        self.collectors.append(collector)
+
+    def get_histogram(
+        self, name: str, help_text: str, **labels: str,
+    ) -> Histogram:
+        """Histogram is created on the first call, next calls with the
+        same name and labels return the same histogram. It is better to
+        get histogram once and keep it, than to call this on every request"""
+        _, labeled_histograms = self.histograms.setdefault(
+            name, (help_text, {}),
+        )
+        key = tuple(labels.items())
+        histogram = labeled_histograms.get(key)
+        if histogram is None:
+            histogram = labeled_histograms[key] = Histogram()
+        return histogram
+
+    def get_route_metrics(self, route: str, method: str) -> RouteMetrics:
+        key = (route, method)
+        route_metrics = self.routes.get(key)
+        if route_metrics is None:
+            route_metrics = self.routes[key] = RouteMetrics()
+        return route_metrics
+
+    def record_request(
+        self,
+        route: Optional[str],
+        method: str,
+        status: int,
+        duration: float,
+        timer: RequestTimer,
+    ) -> None:
+        route_metrics = self.get_route_metrics(
+            route or UNMATCHED_ROUTE, method,
+        )
+        statuses = route_metrics.statuses
+        statuses[status] = statuses.get(status, 0) + 1
+        route_metrics.duration.observe(duration)
+        for histogram, phase_duration in zip(
+            route_metrics.phases, timer.durations,
+        ):
+            histogram.observe(phase_duration)
+
+    def render_prometheus(self) -> str:
+        lines = [
+            '# HELP martin_eden_requests_total Count of handled requests',
+            '# TYPE martin_eden_requests_total counter',
+        ]
+        for (route, method), route_metrics in self.routes.items():
+            for status, count in route_metrics.statuses.items():
+                labels = _format_labels(
+                    route=route, method=method, status=status,
+                )
+                lines.append(f'martin_eden_requests_total{{{labels}}} {count}')
+
+        lines.extend((
+            '# HELP martin_eden_request_duration_seconds '
+            'Duration of request handling',
+            '# TYPE martin_eden_request_duration_seconds histogram',
+        ))
+        for (route, method), route_metrics in self.routes.items():
+            _render_histogram(
+                lines, 'martin_eden_request_duration_seconds',
+                route_metrics.duration, route=route, method=method,
+            )
+
+        lines.extend((
+            '# HELP martin_eden_request_phase_seconds '
+            'Duration of every phase of request handling',
+            '# TYPE martin_eden_request_phase_seconds histogram',
+        ))
+        for (route, method), route_metrics in self.routes.items():
+            for phase_name, histogram in zip(
+                PHASE_NAMES, route_metrics.phases,
+            ):
+                _render_histogram(
+                    lines, 'martin_eden_request_phase_seconds', histogram,
+                    route=route, method=method, phase=phase_name,
+                )
+
+        lines.extend((
+            '# HELP martin_eden_requests_in_flight '
+            'Count of requests that are handled now',
+            '# TYPE martin_eden_requests_in_flight gauge',
+            f'martin_eden_requests_in_flight {self.in_flight}',
+        ))
+
+        for name, (help_text, labeled_histograms) in self.histograms.items():
+            lines.extend((
+                f'# HELP {name} {help_text}',
+                f'# TYPE {name} histogram',
+            ))
+            for labels, histogram in labeled_histograms.items():
+                _render_histogram(lines, name, histogram, **dict(labels))
+
+        for collector in self.collectors:
+            for name, help_text, value in collector():
+                metric_type = (
+                    'counter' if name.endswith(COUNTER_SUFFIX) else 'gauge'
+                )
+                lines.extend((
+                    f'# HELP {name} {help_text}',
+                    f'# TYPE {name} {metric_type}',
+                    f'{name} {value}',
+                ))
+
+        return '\n'.join(lines) + '\n'
+
+
+def _escape_label_value(value: str) -> str:
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace('"', '\\"')
+        .replace('\n', '\\n')
+    )
+
+
+def _format_labels(**labels: str) -> str:
+    return ','.join(
+        f'{name}="{_escape_label_value(value)}"'
+        for name, value in labels.items()
+    )
+
+
+def _render_histogram(
+    lines: list[str], name: str, histogram: Histogram, **labels: str,
+) -> None:
+    labels_str = _format_labels(**labels)
+    bucket_labels_str = f'{labels_str},' if labels_str else ''
+    cumulative_counts = histogram.cumulative_counts()
+    for bucket, count in zip(histogram.buckets, cumulative_counts):
+        lines.append(
+            f'{name}_bucket{{{bucket_labels_str}le="{bucket}"}} {count}'
+        )
+    lines.append(
+        f'{name}_bucket{{{bucket_labels_str}le="+Inf"}} '
+        f'{cumulative_counts[-1]}'
+    )
+    lines.append(f'{name}_sum{{{labels_str}}} {histogram.sum}')
+    lines.append(f'{name}_count{{{labels_str}}} {histogram.count}')
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,121 @@
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Iterable, Optional
+
+from martin_eden.http_utils import Request
+
+if TYPE_CHECKING:
+    from martin_eden.core import HttpMessageHandler
+
+# Middlewares of all routes, they are run before middlewares of route
+global_middlewares: list['Middleware'] = []
+
+
+class Middleware:
+    """Base class of middleware, subclass overrides only hooks it needs,
+    other hooks are not called at all.
+
+    before_request can return response, then controller and next
+    middlewares are not called. after_response gets response and returns
+    it or new one. on_error gets exception of controller or of other
+    hooks, it can return response instead of error, or None to pass the
+    error to next on_error hook.
+
+    Hooks get handler and Request, the same one that controller with
+    "request" argument gets. Response is what HttpMessageHandler
+    returns: bytes, async iterator of chunks of stream, websocket
+    connection or file response"""
+
+    async def before_request(
+        self, _handler: 'HttpMessageHandler', _request: Request,
+    ) -> Optional[Any]:
+        return None
+
+    async def after_response(
+        self,
+        _handler: 'HttpMessageHandler',
+        _request: Request,
+        response: Any,
+    ) -> Any:
+        return response
+
+    async def on_error(
+        self,
+        _handler: 'HttpMessageHandler',
+        _request: Request,
+        _error: Exception,
+    ) -> Optional[Any]:
+        return None
+
+
+def _is_overridden(middleware: Middleware, hook_name: str) -> bool:
+    return getattr(type(middleware), hook_name) is not (
+        getattr(Middleware, hook_name)
+    )
+
+
+class MiddlewareChain:
+    """Middlewares of route compiled to flat tuples of hooks.
+
+    Order is like layers of onion: before_request hooks are called in
+    order of middlewares, global ones first, then middlewares of route.
+    after_response and on_error hooks are called in reverse order. If
+    before_request returns response, only after_response hooks of the
+    middleware and of middlewares before it are called"""
+
+    def __init__(self, middlewares: Iterable[Middleware]) -> None:
+        self.middlewares = tuple(middlewares)
+        # Hooks are pairs of position of middleware and bound method
+        self.before_hooks = tuple(
+            (position, middleware.before_request)
+            for position, middleware in enumerate(self.middlewares)
+            if _is_overridden(middleware, 'before_request')
+        )
+        self.after_hooks = tuple(
+            (position, middleware.after_response)
+            for position, middleware in reversed(
+                tuple(enumerate(self.middlewares)),
+            )
+            if _is_overridden(middleware, 'after_response')
+        )
+        self.error_hooks = tuple(
+            middleware.on_error for middleware in reversed(self.middlewares)
+            if _is_overridden(middleware, 'on_error')
+        )
+
+    async def run(
+        self,
+        handler: 'HttpMessageHandler',
+        request: Request,
+        dispatch: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        try:
+            last_position = len(self.middlewares)
+            for position, hook in self.before_hooks:
+                response = await hook(handler, request)
+                if response is not None:
+                    last_position = position
+                    break
+            else:
+                response = await dispatch()
+
+            for position, hook in self.after_hooks:
+                if position <= last_position:
+                    response = await hook(handler, request, response)
+        except Exception as error:
+            for hook in self.error_hooks:
+                response = await hook(handler, request, error)
+                if response is not None:
+                    return response
+            raise
+        else:
+            return response
+
+
+def compile_middleware_chain(
+    route_middlewares: Iterable[Middleware] = (),
+) -> Optional[MiddlewareChain]:
+    """Returns None for route without middlewares, so such route
+    is handled without any overhead"""
+    middlewares = [*global_middlewares, *route_middlewares]
+    if not middlewares:
+        return None
+    return MiddlewareChain(middlewares)
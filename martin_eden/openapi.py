@@ -3,6 +3,13 @@ from pathlib import Path
 from typing import TYPE_CHECKING
 
 from martin_eden.base import CustomJsonSchema, CustomSchema
+from martin_eden.export import (
+    CONTENT_TYPES,
+    CSV,
+    EXPORT_FORMATS,
+    FORMAT_QUERY_PARAM,
+    NDJSON,
+)
 from martin_eden.utils import (
     dict_set,
     get_name_of_model,
@@ -18,6 +25,8 @@ if TYPE_CHECKING:
 map_filter_name_to_type = {
     'in': 'string',
     'like': 'string',
+    'search': 'string',
+    'trigram': 'string',
     'exactly': 'int',
 }
 
@@ -31,15 +40,43 @@ class OpenApiBuilder:
         if cls._instance is None:
             cls._instance = super().__new__(cls)
             cls.defined_marshmallow_schemas = set()
-            with open(Path(__file__).parent / 'example.json') as file:
-                cls.openapi_object = json.load(file)
+            cls.not_added_paths = []
+            cls._openapi_object = None
+            cls._schemas_are_written = True
+            cls._openapi_json = None
         return cls._instance
 
+    @property
+    def openapi_object(self) -> dict:
+        """Base of documentation is read from file and registered paths
+        are added to it only on first access, therefore registration of
+        routes on import of controllers costs almost nothing"""
+        if self._openapi_object is None:
+            with open(Path(__file__).parent / 'example.json') as file:
+                self._openapi_object = json.load(file)
+        if self.not_added_paths:
+            self._openapi_json = None
+        while self.not_added_paths:
+            self._add_openapi_path(*self.not_added_paths.pop(0))
+        return self._openapi_object
+
+    def get_openapi_json(self) -> str:
+        """Returns complete documentation with json schemas. It is
+        generated on first call and then is cached until new path
+        will be registered"""
+        openapi_object = self.openapi_object
+        if not self._schemas_are_written:
+            self.write_marshmallow_schemas_to_openapi_doc()
+        if self._openapi_json is None:
+            self._openapi_json = json.dumps(openapi_object)
+        return self._openapi_json
+
     def register_marshmallow_schema(self, schema: CustomSchema) -> None:
         """Register schemas for openapi doc - using concrete
         instance of marshmallow schema. Not class of marshmallow
         schema, but instance, because it is more flexible"""
         self.defined_marshmallow_schemas.add(schema)
+        self._schemas_are_written = False
 
     def change_definitions_references(self, dct: dict) -> None:
         """JSON Schemas defined with marshmallow_jsonschema library,
@@ -65,6 +102,8 @@ class OpenApiBuilder:
             marshmallow_json_schemas,
         )
         self.openapi_object['components']['schemas'] = result_json_schemas
+        self._schemas_are_written = True
+        self._openapi_json = None
 
     @staticmethod
     def clean_schemas_from_additional_properties(schemas: dict) -> dict:
@@ -114,7 +153,7 @@ class OpenApiBuilder:
             )
 
     def set_request_for_openapi_method(
-        self, openapi_method: dict, schema: CustomSchema,
+        self, openapi_method: dict, schema: CustomSchema, bulk: bool = False,
     ) -> None:
         if isinstance(schema, CustomSchema):
             request_schema = dict_set(
@@ -124,7 +163,49 @@ class OpenApiBuilder:
             schema_path = self.SCHEMA_PATH_TEMPLATE.format(
                 schema.json_schema_name,
             )
-            request_schema['$ref'] = schema_path
+            if bulk:
+                request_schema['type'] = 'array'
+                request_schema['items'] = {'$ref': schema_path}
+            else:
+                request_schema['$ref'] = schema_path
+
+    def set_export_formats_for_openapi_method(
+        self, openapi_method: dict, schema: CustomSchema,
+    ) -> None:
+        """Get method with response schema can return rows as NDJSON or
+        CSV, format is chosen by Accept header or "format" query param"""
+        content = openapi_method['responses']['200']['content']
+        row_schema = {
+            '$ref': self.SCHEMA_PATH_TEMPLATE.format(schema.json_schema_name),
+        }
+        content[CONTENT_TYPES[NDJSON]] = {'schema': row_schema}
+        content[CONTENT_TYPES[CSV]] = {'schema': {'type': 'string'}}
+
+        parameters = openapi_method.setdefault('parameters', [])
+        parameters.append({
+            'name': FORMAT_QUERY_PARAM,
+            'in': 'query',
+            'schema': {'type': 'string', 'enum': list(EXPORT_FORMATS)},
+        })
+
+    def set_fields_param_for_openapi_method(
+        self, openapi_method: dict, schema: CustomSchema,
+    ) -> None:
+        """Response can have only part of fields of schema,
+        names of fields are separated by comma"""
+        from martin_eden.database import FIELDS_QUERY_PARAM
+
+        parameters = openapi_method.setdefault('parameters', [])
+        parameters.append({
+            'name': FIELDS_QUERY_PARAM,
+            'in': 'query',
+            'schema': {
+                'type': 'array',
+                'items': {'type': 'string', 'enum': list(schema.fields)},
+            },
+            'style': 'form',
+            'explode': False,
+        })
 
     def set_query_params(
         self, openapi_method: dict, query_params: dict,
@@ -156,7 +237,9 @@ class OpenApiBuilder:
 
     @staticmethod
     def get_filter_names_for_param_type(param_type) -> list[str]:
-        return ['like'] if param_type is str else ['in', 'exactly']
+        if param_type is str:
+            return ['like', 'search', 'trigram']
+        return ['in', 'exactly']
 
     def add_openapi_path(
         self,
@@ -165,14 +248,31 @@ class OpenApiBuilder:
         request_schema: CustomSchema = None,
         response_schema: CustomSchema = None,
         query_params: dict = None,
+        bulk: bool = False,
     ) -> None:
+        """Path is only remembered here, it will be added to
+        documentation on first access to openapi_object"""
         # in the framework /schema/ is used for openapi, therefore no need
         # create openapi description of method that create openapi schema
         if path == '/schema/':
             return
 
+        self.not_added_paths.append((
+            path, method, request_schema, response_schema, query_params,
+            bulk,
+        ))
+
+    def _add_openapi_path(
+        self,
+        path: str,
+        method: str,
+        request_schema: CustomSchema = None,
+        response_schema: CustomSchema = None,
+        query_params: dict = None,
+        bulk: bool = False,
+    ) -> None:
         openapi_new_method = dict_set(
-            self.openapi_object, f'paths.{path}.{method}', {},
+            self._openapi_object, f'paths.{path}.{method}', {},
         )
         openapi_new_method['operationId'] = (
             get_operation_id_for_openapi(path, method)
@@ -184,10 +284,18 @@ class OpenApiBuilder:
                 openapi_new_method, response_schema,
             )
 
+        if response_schema and method.lower() == 'get':
+            self.set_export_formats_for_openapi_method(
+                openapi_new_method, response_schema,
+            )
+            self.set_fields_param_for_openapi_method(
+                openapi_new_method, response_schema,
+            )
+
         if request_schema:
             self.register_marshmallow_schema(request_schema)
             self.set_request_for_openapi_method(
-                openapi_new_method, request_schema,
+                openapi_new_method, request_schema, bulk,
             )
 
         if query_params:
@@ -0,0 +1,236 @@
+import abc
+import asyncio
+import dataclasses
+import json
+from typing import Any, Callable, Optional, Union
+
+from marshmallow import Schema
+from sqlalchemy import Select, func, select
+from sqlalchemy.engine import Dialect
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from martin_eden.database import query_cache
+
+EXACT = 'exact'
+CAPPED = 'capped'
+ESTIMATE = 'estimate'
+CACHED = 'cached'
+# Query params of paginated route, they are not filters
+LIMIT_QUERY_PARAM = 'limit'
+OFFSET_QUERY_PARAM = 'offset'
+
+
+@dataclasses.dataclass
+class CountResult:
+    total: int
+    is_exact: bool
+    strategy: str
+    # How total is shown to user, for example "1000+" or "~25000"
+    label: str
+
+
+def _without_paging(statement: Select) -> Select:
+    return statement.order_by(None).limit(None).offset(None)
+
+
+class CountStrategy(abc.ABC):
+    """Base class of strategies of counting of total rows of list.
+    Strategy gets statement of list without limit and offset"""
+    name = ''
+
+    @abc.abstractmethod
+    async def count(
+        self,
+        session: AsyncSession,
+        statement: Select,
+        params: Optional[dict] = None,
+    ) -> CountResult:
+        pass
+
+
+class ExactCount(CountStrategy):
+    name = EXACT
+
+    def make_count_statement(self, statement: Select) -> Select:
+        return select(func.count()).select_from(
+            _without_paging(statement).subquery(),
+        )
+
+    def make_result(self, total: int) -> CountResult:
+        return CountResult(total, True, self.name, str(total))
+
+    async def count(
+        self,
+        session: AsyncSession,
+        statement: Select,
+        params: Optional[dict] = None,
+    ) -> CountResult:
+        result = await session.execute(
+            self.make_count_statement(statement), params,
+        )
+        return self.make_result(result.scalar_one())
+
+
+class CappedCount(ExactCount):
+    """Counts not more than cap + 1 rows. If there are more rows than
+    cap, total is cap and label is "cap+". Database stops scan after
+    cap + 1 rows, so it is cheap even for filters with %like%"""
+    name = CAPPED
+
+    def __init__(self, cap: int = 1000) -> None:
+        self.cap = cap
+
+    def make_count_statement(self, statement: Select) -> Select:
+        return select(func.count()).select_from(
+            _without_paging(statement).limit(self.cap + 1).subquery(),
+        )
+
+    def make_result(self, total: int) -> CountResult:
+        if total > self.cap:
+            return CountResult(self.cap, False, self.name, f'{self.cap}+')
+        return CountResult(total, True, self.name, str(total))
+
+
+class EstimateCount(CountStrategy):
+    """Total is estimate of rows by planner of postgres from EXPLAIN,
+    the query is not executed. If estimate is less than exact_below,
+    exact count is made, it is cheap for small results. Other databases
+    don't have such estimate, they always get exact count"""
+    name = ESTIMATE
+
+    def __init__(self, exact_below: int = 0) -> None:
+        self.exact_below = exact_below
+
+    async def count(
+        self,
+        session: AsyncSession,
+        statement: Select,
+        params: Optional[dict] = None,
+    ) -> CountResult:
+        connection = await session.connection()
+        if connection.dialect.name != 'postgresql':
+            return await ExactCount().count(session, statement, params)
+
+        statement = _without_paging(statement)
+        if params:
+            statement = statement.params(params)
+        result = await connection.exec_driver_sql(
+            *self.make_explain(statement, connection.dialect),
+        )
+        plan = result.scalar_one()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        total = int(plan[0]['Plan']['Plan Rows'])
+
+        if total < self.exact_below:
+            return await ExactCount().count(session, statement)
+        return CountResult(total, False, self.name, f'~{total}')
+
+    @staticmethod
+    def make_explain(
+        statement: Select, dialect: Dialect,
+    ) -> tuple[str, Union[tuple, dict]]:
+        """Sql of EXPLAIN and its parameters. Values of filters are
+        bound, they are not pasted to sql"""
+        compiled = statement.compile(
+            dialect=dialect, compile_kwargs={'render_postcompile': True},
+        )
+        params = compiled.params
+        if compiled.positiontup is not None:
+            params = tuple(params[name] for name in compiled.positiontup)
+        return f'EXPLAIN (FORMAT JSON) {compiled}', params
+
+
+class CachedCount(CountStrategy):
+    """Result of exact or capped count is saved to query cache for ttl
+    seconds. It is also removed from cache, when its table is written"""
+    name = CACHED
+
+    def __init__(
+        self, strategy: Optional[ExactCount] = None, ttl: float = 60,
+    ) -> None:
+        self.strategy = strategy or ExactCount()
+        self.ttl = ttl
+
+    async def count(
+        self,
+        session: AsyncSession,
+        statement: Select,
+        params: Optional[dict] = None,
+    ) -> CountResult:
+        count_statement = self.strategy.make_count_statement(statement)
+        if params:
+            count_statement = count_statement.params(params)
+        result = await query_cache.execute(
+            session, count_statement, ttl=self.ttl,
+        )
+        count_result = self.strategy.make_result(result.scalar_one())
+        count_result.strategy = f'{self.name}_{count_result.strategy}'
+        return count_result
+
+
+@dataclasses.dataclass
+class Page:
+    items: list
+    count: Optional[CountResult]
+    limit: int
+    offset: int
+
+    def to_dict(self, schema: Optional[Schema] = None) -> dict[str, Any]:
+        items = self.items
+        if schema is not None:
+            items = schema.dump(items, many=True)
+        result = {'items': items, 'limit': self.limit, 'offset': self.offset}
+        if self.count is not None:
+            result.update({
+                'total': self.count.total,
+                'total_is_exact': self.count.is_exact,
+                'total_label': self.count.label,
+                'count_strategy': self.count.strategy,
+            })
+        return result
+
+
+def _read_int(value: Optional[str], default: int) -> int:
+    try:
+        return int(value) if value else default
+    except ValueError:
+        return default
+
+
+def pop_page_params(query_params: dict, page_size: int) -> tuple[int, int]:
+    """Limit and offset from query params. Limit is not bigger than
+    page_size, wrong values are replaced by defaults"""
+    limit = _read_int(query_params.pop(LIMIT_QUERY_PARAM, None), page_size)
+    offset = _read_int(query_params.pop(OFFSET_QUERY_PARAM, None), 0)
+    return min(max(limit, 1), page_size), max(offset, 0)
+
+
+async def paginate(
+    create_session: Callable,
+    statement: Select,
+    limit: int,
+    offset: int = 0,
+    count_strategy: Optional[CountStrategy] = None,
+    params: Optional[dict] = None,
+) -> Page:
+    """Items of page and total count are read concurrently, every query
+    in its own session, so they use different connections of pool.
+    Without count_strategy total is not counted"""
+    async def read_items() -> list:
+        async with create_session() as session:
+            result = await session.execute(
+                statement.limit(limit).offset(offset), params,
+            )
+            if len(result.keys()) == 1:
+                return list(result.scalars())
+            return list(result)
+
+    async def count() -> Optional[CountResult]:
+        if count_strategy is None:
+            return None
+        async with create_session() as session:
+            return await count_strategy.count(session, statement, params)
+
+    items, count_result = await asyncio.gather(read_items(), count())
+    return Page(items, count_result, limit, offset)
@@ -0,0 +1,199 @@
+import asyncio
+import dataclasses
+import json
+import time
+from collections import Counter
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Optional
+
+from marshmallow.fields import Bool, Float, Int
+
+from martin_eden.base import CustomSchema
+from martin_eden.metrics import UNMATCHED_ROUTE
+
+if TYPE_CHECKING:
+    # Modules of profiler are imported only when it is used,
+    # pstats is one of the slowest modules to import
+    import cProfile
+    import pstats
+
+GetRoute = Callable[[], Optional[str]]
+
+
+@dataclasses.dataclass
+class ProfilerConfig:
+    enabled: bool
+    every_n: int = 100
+    slow_threshold: float = 0
+
+
+ProfilerConfigSchema = CustomSchema.from_dict({
+    'enabled': Bool(required=True),
+    'every_n': Int(required=False),
+    'slow_threshold': Float(required=False),
+}, name='ProfilerConfigSchema')
+
+
+def _format_function(function_key: tuple) -> str:
+    file_name, line_number, function_name = function_key
+    return f'{file_name}:{line_number}({function_name})'
+
+
+class RequestProfiler:
+    """Profiler can be enabled and disabled at any moment of work. When it
+    is disabled, framework only checks "enabled" attribute, nothing more.
+
+    When it is enabled, every N-th request is profiled with cProfile and
+    its statistics are aggregated by route. Also, if slow_threshold is set,
+    stack of every request that is handled longer than threshold is
+    captured, it shows on what await the request is stuck.
+
+    Note that cProfile works for the whole thread, therefore other
+    requests that are handled in the same time on event loop also get
+    to the statistics. Only one request is profiled at the same time"""
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.every_n = 0
+        self.slow_threshold = 0.0
+        self.requests_count = 0
+        self._active_profile: Optional['cProfile.Profile'] = None
+        self.route_stats: dict[str, 'pstats.Stats'] = {}
+        self.slow_stacks: Counter = Counter()
+        self.slow_requests: dict[str, dict[str, float]] = {}
+
+    def enable(self, every_n: int = 100, slow_threshold: float = 0) -> None:
+        self.every_n = every_n
+        self.slow_threshold = slow_threshold
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def configure(self, config: ProfilerConfig) -> None:
+        if config.enabled:
+            self.enable(config.every_n, config.slow_threshold)
+        else:
+            self.disable()
+
+    def reset(self) -> None:
+        self.requests_count = 0
+        self.route_stats.clear()
+        self.slow_stacks.clear()
+        self.slow_requests.clear()
+
+    def _should_profile(self) -> bool:
+        return bool(
+            self.every_n and
+            self.requests_count % self.every_n == 0 and
+            self._active_profile is None
+        )
+
+    async def run(self, awaitable: Awaitable, get_route: GetRoute) -> Any:
+        """Awaits awaitable of request handling under profiling. Route is
+        got through callable, because it is known only after routing"""
+        self.requests_count += 1
+        profile = None
+        if self._should_profile():
+            import cProfile
+            profile = self._active_profile = cProfile.Profile()
+            profile.enable()
+
+        slow_handle = None
+        if self.slow_threshold:
+            slow_handle = asyncio.get_running_loop().call_later(
+                self.slow_threshold, self._capture_stack,
+                asyncio.current_task(), get_route,
+            )
+
+        start_time = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            if profile is not None:
+                profile.disable()
+                self._active_profile = None
+                self._add_profile(get_route(), profile)
+            if slow_handle is not None:
+                slow_handle.cancel()
+                self._add_request_duration(
+                    get_route(), time.perf_counter() - start_time,
+                )
+
+    def _add_profile(
+        self, route: Optional[str], profile: 'cProfile.Profile',
+    ) -> None:
+        import pstats
+
+        route = route or UNMATCHED_ROUTE
+        stats = self.route_stats.get(route)
+        if stats is None:
+            self.route_stats[route] = pstats.Stats(profile)
+        else:
+            stats.add(profile)
+
+    def _add_request_duration(
+        self, route: Optional[str], duration: float,
+    ) -> None:
+        if duration < self.slow_threshold:
+            return
+        route_slow_requests = self.slow_requests.setdefault(
+            route or UNMATCHED_ROUTE, {'count': 0, 'max_duration': 0.0},
+        )
+        route_slow_requests['count'] += 1
+        route_slow_requests['max_duration'] = max(
+            route_slow_requests['max_duration'], duration,
+        )
+
+    def _capture_stack(self, task: asyncio.Task, get_route: GetRoute) -> None:
+        if task.done():
+            return
+        stack = tuple(
+            f'{frame.f_code.co_filename}:{frame.f_lineno}'
+            f'({frame.f_code.co_name})'
+            for frame in task.get_stack()
+        )
+        self.slow_stacks[(get_route() or UNMATCHED_ROUTE, stack)] += 1
+
+    def get_top_functions(self, limit: int = 20) -> dict[str, list[dict]]:
+        """Returns the most expensive functions for every route,
+        sorted by cumulative time"""
+        result = {}
+        for route, stats in self.route_stats.items():
+            functions = sorted(
+                stats.stats.items(),
+                key=lambda item: item[1][3],
+                reverse=True,
+            )[:limit]
+            result[route] = [{
+                'function': _format_function(function_key),
+                'calls': calls,
+                'total_time': total_time,
+                'cumulative_time': cumulative_time,
+            } for function_key, (
+                _, calls, total_time, cumulative_time, _,
+            ) in functions]
+        return result
+
+    def get_report(self, limit: int = 20) -> dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'every_n': self.every_n,
+            'slow_threshold': self.slow_threshold,
+            'requests_count': self.requests_count,
+            'top_functions': self.get_top_functions(limit),
+            'slow_requests': self.slow_requests,
+            'slow_stacks': [{
+                'route': route,
+                'stack': list(stack),
+                'count': count,
+            } for (route, stack), count in (
+                self.slow_stacks.most_common(limit)
+            )],
+        }
+
+    def dump(self, path: str, limit: int = 20) -> None:
+        with open(path, 'w') as file:
+            json.dump(self.get_report(limit), file, indent=4)
+
+
+profiler = RequestProfiler()
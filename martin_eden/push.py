@@ -0,0 +1,473 @@
+# Push connections: server-sent events and websockets.
+#
+# Every connection has bounded queue of messages and one task, that
+# sends them to socket. Messages are put to queue without waiting, so
+# broadcast to thousands of connections doesn't wait for slow clients.
+# If queue of connection is full, client doesn't read messages, and the
+# connection is closed, instead of keeping messages in memory
+import abc
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import socket
+from asyncio import AbstractEventLoop
+from contextlib import contextmanager
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Callable,
+    Iterator,
+    Optional,
+    Union,
+)
+
+from martin_eden.http_utils import create_response_headers
+from martin_eden.metrics import metrics
+
+if TYPE_CHECKING:
+    from martin_eden.database import ChangeEvent
+
+logger = logging.getLogger(__name__)
+
+EVENT_STREAM = 'event_stream'
+WEBSOCKET = 'websocket'
+
+EVENT_STREAM_CONTENT_TYPE = 'text/event-stream'
+# Comment line of event stream, clients ignore it
+EVENT_STREAM_HEARTBEAT = b': heartbeat\n\n'
+
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+# Opcodes of websocket frames
+CONTINUATION = 0x0
+TEXT = 0x1
+BINARY = 0x2
+CLOSE = 0x8
+PING = 0x9
+PONG = 0xA
+WEBSOCKET_RECV_SIZE = 65536
+# Length of payload is in the second byte of frame, these values of it
+# mean, that length is in the next 2 or 8 bytes
+WEBSOCKET_LENGTH_16 = 126
+WEBSOCKET_LENGTH_64 = 127
+# Payload of this size and bigger has 8 bytes of length
+WEBSOCKET_MIN_LENGTH_64 = 65536
+# Prefix of broadcaster channels, that get changes of tables
+CHANGE_FEED_BROADCAST_PREFIX = 'changes:'
+
+# Item of queue, that means the end of connection
+_CLOSED = None
+
+
+def encode_websocket_frame(payload: bytes, opcode: int = TEXT) -> bytes:
+    """Frames of server are not masked and not fragmented"""
+    header = bytearray((0x80 | opcode,))
+    length = len(payload)
+    if length < WEBSOCKET_LENGTH_16:
+        header.append(length)
+    elif length < WEBSOCKET_MIN_LENGTH_64:
+        header.append(WEBSOCKET_LENGTH_16)
+        header += length.to_bytes(2, 'big')
+    else:
+        header.append(WEBSOCKET_LENGTH_64)
+        header += length.to_bytes(8, 'big')
+    return bytes(header) + payload
+
+
+def unmask_websocket_payload(payload: bytes, mask: bytes) -> bytes:
+    """Xor of the whole payload as one big number is much faster,
+    than xor of every byte in python"""
+    length = len(payload)
+    full_mask = (mask * (length // 4 + 1))[:length]
+    return (
+        int.from_bytes(payload, 'big') ^ int.from_bytes(full_mask, 'big')
+    ).to_bytes(length, 'big')
+
+
+def get_websocket_accept_key(key: str) -> str:
+    digest = hashlib.sha1(  # noqa: S324
+        (key + WEBSOCKET_GUID).encode('ascii'),
+    ).digest()
+    return base64.b64encode(digest).decode('ascii')
+
+
+class PushMessage:
+    """Message is encoded once for every kind of connection, so
+    broadcast to many connections doesn't encode it many times"""
+    __slots__ = ('data', 'event', '_encoded')
+
+    def __init__(self, data: str, event: Optional[str] = None) -> None:
+        self.data = data
+        self.event = event
+        self._encoded: dict[str, bytes] = {}
+
+    def encode(self, kind: str) -> bytes:
+        encoded = self._encoded.get(kind)
+        if encoded is None:
+            if kind == EVENT_STREAM:
+                lines = [f'event: {self.event}'] if self.event else []
+                lines.extend(
+                    f'data: {line}' for line in self.data.split('\n')
+                )
+                encoded = ('\n'.join(lines) + '\n\n').encode('utf8')
+            else:
+                encoded = encode_websocket_frame(self.data.encode('utf8'))
+            self._encoded[kind] = encoded
+        return encoded
+
+
+class PushConnection(abc.ABC):
+    """Base class of push connections. Controller of push route gets
+    the connection and sends messages with send method. Connection is
+    open while controller works, or until client closes it"""
+    kind = ''
+    # Settings of all connections, they are changed by configure_push
+    queue_size = 100
+    heartbeat_interval = 15.0
+    max_message_size = 1048576
+
+    open_count: dict[str, int] = {EVENT_STREAM: 0, WEBSOCKET: 0}
+    open_connections: set['PushConnection'] = set()
+
+    def __init__(self, query_params: Optional[dict] = None) -> None:
+        self.query_params = query_params or {}
+        self.queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        self.closed = False
+        self._closed_event = asyncio.Event()
+
+    def send(self, data: Union[str, PushMessage]) -> bool:
+        """Puts message to queue of connection without waiting. Returns
+        False, if connection is closed, or it is too slow and is closed"""
+        if self.closed:
+            return False
+        if not isinstance(data, PushMessage):
+            data = PushMessage(data)
+        try:
+            self.queue.put_nowait(data)
+        except asyncio.QueueFull:
+            logger.warning('Push connection is too slow, it is closed')
+            self.close()
+            return False
+        return True
+
+    def close(self, drop_pending: bool = True) -> None:
+        """Messages that are not sent yet are dropped, if connection is
+        closed because of client, or they are sent before the end, if
+        controller has finished"""
+        if self.closed:
+            return
+        self.closed = True
+        self._closed_event.set()
+        if drop_pending or self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+        self.queue.put_nowait(_CLOSED)
+
+    async def wait_closed(self) -> None:
+        await self._closed_event.wait()
+
+    @abc.abstractmethod
+    def get_heartbeat(self) -> bytes:
+        pass
+
+    async def iter_messages(self) -> AsyncIterator[bytes]:
+        """Encoded messages from queue, if there are no messages
+        during heartbeat interval, heartbeat is yielded"""
+        while True:
+            try:
+                message = await asyncio.wait_for(
+                    self.queue.get(), self.heartbeat_interval,
+                )
+            except asyncio.TimeoutError:
+                yield self.get_heartbeat()
+                continue
+            if message is _CLOSED:
+                return
+            if isinstance(message, bytes):
+                yield message
+            else:
+                yield message.encode(self.kind)
+
+    async def _run_controller(self, controller: Callable) -> None:
+        try:
+            await controller(self)
+        except Exception:
+            logger.exception('Error in controller of push connection')
+        finally:
+            self.close(drop_pending=False)
+
+    @contextmanager
+    def _count_open(self) -> Iterator[None]:
+        self.open_count[self.kind] += 1
+        self.open_connections.add(self)
+        try:
+            yield
+        finally:
+            self.open_count[self.kind] -= 1
+            self.open_connections.discard(self)
+
+    @classmethod
+    def close_all(cls) -> None:
+        """Connections are closed after messages in their queues,
+        it is used on shutdown of worker"""
+        for connection in tuple(cls.open_connections):
+            connection.close(drop_pending=False)
+
+
+class EventStreamConnection(PushConnection):
+    kind = EVENT_STREAM
+
+    def get_heartbeat(self) -> bytes:
+        return EVENT_STREAM_HEARTBEAT
+
+    async def stream(self, controller: Callable) -> AsyncIterator[bytes]:
+        """Response of event stream, it is sent by Backend as any other
+        streaming response. When client disconnects, the generator is
+        closed, and controller is cancelled"""
+        # Proxies and browsers must not cache events
+        yield create_response_headers(
+            200, content_type=EVENT_STREAM_CONTENT_TYPE,
+            extra_headers={'Cache-Control': 'no-cache'},
+        ).encode('utf8')
+
+        with self._count_open():
+            controller_task = asyncio.create_task(
+                self._run_controller(controller),
+            )
+            try:
+                async for message in self.iter_messages():
+                    yield message
+            finally:
+                self.close()
+                controller_task.cancel()
+
+
+class WebSocketConnection(PushConnection):
+    """Connection after upgrade of http request. Messages from client
+    are read by separate task, controller gets them with receive method.
+    Queue of received messages is bounded too, when it is full, socket
+    is not read, and tcp slows down the client"""
+    kind = WEBSOCKET
+
+    def __init__(
+        self,
+        controller: Callable,
+        key: str,
+        query_params: Optional[dict] = None,
+    ) -> None:
+        super().__init__(query_params)
+        self.controller = controller
+        self.key = key
+        self.received: asyncio.Queue = asyncio.Queue(self.queue_size)
+        self._buffer = bytearray()
+
+    def get_heartbeat(self) -> bytes:
+        return encode_websocket_frame(b'', PING)
+
+    def get_handshake_response(self) -> bytes:
+        return (
+            'HTTP/1.1 101 Switching Protocols\r\n'
+            'Upgrade: websocket\r\n'
+            'Connection: Upgrade\r\n'
+            f'Sec-WebSocket-Accept: {get_websocket_accept_key(self.key)}\r\n'
+            '\r\n'
+        ).encode('ascii')
+
+    def close(self, drop_pending: bool = True) -> None:
+        if self.closed:
+            return
+        super().close(drop_pending)
+        while not self.received.empty():
+            self.received.get_nowait()
+        self.received.put_nowait(_CLOSED)
+
+    async def receive(self) -> Optional[str]:
+        """Next text message from client, None if connection is closed"""
+        if self.closed and self.received.empty():
+            return None
+        return await self.received.get()
+
+    async def run(
+        self, event_loop: AbstractEventLoop, client_socket: socket.socket,
+    ) -> int:
+        """Works with socket until the connection is closed,
+        returns count of sent bytes"""
+        handshake = self.get_handshake_response()
+        await event_loop.sock_sendall(client_socket, handshake)
+        bytes_sent = len(handshake)
+
+        with self._count_open():
+            reader_task = asyncio.create_task(
+                self._read_messages(event_loop, client_socket),
+            )
+            controller_task = asyncio.create_task(
+                self._run_controller(self.controller),
+            )
+            try:
+                async for message in self.iter_messages():
+                    await event_loop.sock_sendall(client_socket, message)
+                    bytes_sent += len(message)
+                close_frame = encode_websocket_frame(b'', CLOSE)
+                await event_loop.sock_sendall(client_socket, close_frame)
+                bytes_sent += len(close_frame)
+            except OSError:
+                pass
+            finally:
+                self.close()
+                reader_task.cancel()
+                controller_task.cancel()
+        return bytes_sent
+
+    async def _read_exactly(
+        self,
+        event_loop: AbstractEventLoop,
+        client_socket: socket.socket,
+        size: int,
+    ) -> bytes:
+        while len(self._buffer) < size:
+            chunk = await event_loop.sock_recv(
+                client_socket, WEBSOCKET_RECV_SIZE,
+            )
+            if not chunk:
+                raise ConnectionResetError('websocket client disconnected')
+            self._buffer += chunk
+        result = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return result
+
+    def _check_message_size(self, size: int) -> None:
+        if size > self.max_message_size:
+            raise ValueError('websocket message is too big')
+
+    async def _read_frame(
+        self, event_loop: AbstractEventLoop, client_socket: socket.socket,
+    ) -> tuple[bool, int, bytes]:
+        """Returns fin flag, opcode and payload of frame"""
+        first_byte, second_byte = await self._read_exactly(
+            event_loop, client_socket, 2,
+        )
+        length = second_byte & 0x7F
+        if length == WEBSOCKET_LENGTH_16:
+            length = int.from_bytes(
+                await self._read_exactly(event_loop, client_socket, 2), 'big',
+            )
+        elif length == WEBSOCKET_LENGTH_64:
+            length = int.from_bytes(
+                await self._read_exactly(event_loop, client_socket, 8), 'big',
+            )
+        self._check_message_size(length)
+
+        mask = None
+        if second_byte & 0x80:
+            mask = await self._read_exactly(event_loop, client_socket, 4)
+        payload = await self._read_exactly(event_loop, client_socket, length)
+        if mask is not None:
+            payload = unmask_websocket_payload(payload, mask)
+        return bool(first_byte & 0x80), first_byte & 0x0F, payload
+
+    async def _read_messages(
+        self, event_loop: AbstractEventLoop, client_socket: socket.socket,
+    ) -> None:
+        fragments = []
+        try:
+            while not self.closed:
+                fin, opcode, payload = await self._read_frame(
+                    event_loop, client_socket,
+                )
+                if opcode == CLOSE:
+                    break
+                if opcode == PING:
+                    self.queue.put_nowait(
+                        encode_websocket_frame(payload, PONG),
+                    )
+                    continue
+                if opcode == PONG:
+                    continue
+
+                fragments.append(payload)
+                self._check_message_size(sum(map(len, fragments)))
+                if fin:
+                    message = b''.join(fragments)
+                    fragments = []
+                    await self.received.put(
+                        message.decode('utf8', errors='replace'),
+                    )
+        except (OSError, ValueError, asyncio.QueueFull) as exc:
+            logger.debug('Websocket connection is closed: %s', exc)
+        finally:
+            self.close()
+
+
+class Broadcaster:
+    """Connections subscribe to channels, message that is published to
+    channel is put to queues of all its connections"""
+
+    def __init__(self) -> None:
+        self.channels: dict[str, set[PushConnection]] = {}
+
+    @contextmanager
+    def subscribe(
+        self, channel: str, connection: PushConnection,
+    ) -> Iterator[None]:
+        subscribers = self.channels.setdefault(channel, set())
+        subscribers.add(connection)
+        try:
+            yield
+        finally:
+            subscribers.discard(connection)
+            if not subscribers:
+                self.channels.pop(channel, None)
+
+    def publish(
+        self, channel: str, data: str, event: Optional[str] = None,
+    ) -> int:
+        """Returns count of connections, that got the message"""
+        subscribers = self.channels.get(channel)
+        if not subscribers:
+            return 0
+        message = PushMessage(data, event)
+        return sum(
+            connection.send(message) for connection in tuple(subscribers)
+        )
+
+
+def configure_push(
+    queue_size: int, heartbeat_interval: float, max_message_size: int,
+) -> None:
+    PushConnection.queue_size = queue_size
+    PushConnection.heartbeat_interval = heartbeat_interval
+    PushConnection.max_message_size = max_message_size
+
+
+def get_push_stats() -> list[tuple[str, str, Any]]:
+    return [(
+        f'martin_eden_push_{kind}_connections',
+        f'Count of open {kind} connections',
+        count,
+    ) for kind, count in PushConnection.open_count.items()]
+
+
+def get_change_broadcast_channel(table: str) -> str:
+    return f'{CHANGE_FEED_BROADCAST_PREFIX}{table}'
+
+
+def broadcast_changes(change_events: list['ChangeEvent']) -> None:
+    """Subscriber of change feed. Push connections, that are subscribed
+    to channel of table from get_change_broadcast_channel, get json
+    array of changes of table"""
+    changes_of_tables: dict[str, list[dict]] = {}
+    for change_event in change_events:
+        channel = get_change_broadcast_channel(change_event.table)
+        if channel in broadcaster.channels:
+            changes_of_tables.setdefault(channel, []).append({
+                'op': change_event.operation,
+                'pk': change_event.primary_key,
+            })
+    for channel, changes in changes_of_tables.items():
+        broadcaster.publish(channel, json.dumps(changes), event='change')
+
+
+broadcaster = Broadcaster()
+metrics.register_collector(get_push_stats)
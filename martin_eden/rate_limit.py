@@ -0,0 +1,177 @@
+import abc
+import dataclasses
+import math
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from martin_eden.metrics import metrics
+
+# What requests share one bucket
+IP = 'ip'
+API_KEY = 'api_key'
+ROUTE = 'route'
+RATE_LIMIT_KEYS = (IP, API_KEY, ROUTE)
+
+
+@dataclasses.dataclass(frozen=True)
+class RateLimit:
+    """Bucket has burst tokens and gets rate tokens per second,
+    every request takes one token"""
+    rate: float
+    burst: int
+    key: str = IP
+
+    def __post_init__(self) -> None:
+        if self.key not in RATE_LIMIT_KEYS:
+            raise ValueError(f'Unknown key of rate limit: {self.key}')
+        if self.rate <= 0 or self.burst < 1:
+            raise ValueError('Rate and burst of rate limit must be positive')
+
+
+class RateLimitStore(abc.ABC):
+    """Storage of token buckets. Shared storage, for example redis,
+    implements the same method, so workers share buckets"""
+
+    @abc.abstractmethod
+    def acquire(self, key: str, rate_limit: RateLimit, now: float) -> float:
+        """Takes token from bucket of key. Returns 0 if request is
+        allowed, or seconds, after that token will be in bucket"""
+
+
+class InMemoryRateLimitStore(RateLimitStore):
+    """Bucket is tokens, time of their counting and time, when bucket is
+    full again, so every key takes constant memory. Full bucket is the
+    same as absent one, such buckets are removed every eviction_interval
+    seconds from the start of LRU order, until bucket, that is not full.
+    If there are more than max_keys, the least recently used is removed"""
+
+    def __init__(
+        self, max_keys: int = 100000, eviction_interval: float = 60,
+    ) -> None:
+        self.max_keys = max_keys
+        self.eviction_interval = eviction_interval
+        self.buckets: OrderedDict[str, tuple[float, float, float]] = (
+            OrderedDict()
+        )
+        self._last_eviction = 0.0
+
+    def acquire(self, key: str, rate_limit: RateLimit, now: float) -> float:
+        if now - self._last_eviction >= self.eviction_interval:
+            self.evict(now)
+
+        bucket = self.buckets.pop(key, None)
+        if bucket is None:
+            tokens = float(rate_limit.burst)
+        else:
+            tokens, updated_at, _ = bucket
+            tokens += (now - updated_at) * rate_limit.rate
+            tokens = min(float(rate_limit.burst), tokens)
+
+        retry_after = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / rate_limit.rate
+        # The time, when bucket is full again
+        full_at = now + (rate_limit.burst - tokens) / rate_limit.rate
+        # Bucket is moved to the end, so the first key is the oldest
+        self.buckets[key] = (tokens, now, full_at)
+        if len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
+        return retry_after
+
+    def evict(self, now: float) -> None:
+        """Buckets are removed from the start, so every bucket is
+        removed once and dict is not rebuilt"""
+        self._last_eviction = now
+        while self.buckets:
+            key, bucket = next(iter(self.buckets.items()))
+            if bucket[2] > now:
+                break
+            del self.buckets[key]
+
+
+class RateLimiter:
+    def __init__(self, store: Optional[RateLimitStore] = None) -> None:
+        self.store = store or InMemoryRateLimitStore()
+        # Limit of all routes without own limit, None means no limit
+        self.default_limit: Optional[RateLimit] = None
+        self.api_key_header = 'x-api-key'
+        self.trusted_header = ''
+        self.rejected_count = 0
+        metrics.register_collector(self.get_stats)
+
+    def configure(
+        self,
+        default_limit: Optional[RateLimit],
+        api_key_header: str = 'x-api-key',
+        trusted_header: str = '',
+        store: Optional[RateLimitStore] = None,
+    ) -> None:
+        self.default_limit = default_limit
+        self.api_key_header = api_key_header.lower()
+        self.trusted_header = trusted_header.lower()
+        if store is not None:
+            self.store = store
+
+    def get_client_ip(
+        self, client_address: Optional[str], headers: dict[str, str],
+    ) -> str:
+        """Forwarded header is used only if it is set in settings,
+        because any client can send it. The first address of the header
+        is address of client, next ones are addresses of proxies"""
+        if self.trusted_header:
+            forwarded = headers.get(self.trusted_header)
+            if forwarded:
+                return forwarded.split(',')[0].strip()
+        return client_address or ''
+
+    def check(
+        self,
+        route_limit: Optional[RateLimit],
+        route: str,
+        client_address: Optional[str],
+        headers: dict[str, str],
+    ) -> float:
+        """Returns seconds, after that client can repeat request,
+        or 0 if request is allowed. Limit of route has own buckets,
+        default limit has buckets shared by all routes"""
+        rate_limit = route_limit or self.default_limit
+        if rate_limit is None:
+            return 0
+
+        if rate_limit.key == ROUTE:
+            key = ''
+        elif rate_limit.key == API_KEY:
+            key = headers.get(self.api_key_header, '')
+        else:
+            key = self.get_client_ip(client_address, headers)
+        key = f'{rate_limit.key}:{key}'
+        if route_limit is not None:
+            key = f'{key}:{route}'
+
+        retry_after = self.store.acquire(key, rate_limit, time.monotonic())
+        if retry_after:
+            self.rejected_count += 1
+        return retry_after
+
+    def get_stats(self) -> list[tuple[str, str, int]]:
+        stats = [(
+            'martin_eden_rate_limit_rejected_total',
+            'Requests rejected by rate limit', self.rejected_count,
+        )]
+        if isinstance(self.store, InMemoryRateLimitStore):
+            stats.append((
+                'martin_eden_rate_limit_buckets',
+                'Token buckets in memory', len(self.store.buckets),
+            ))
+        return stats
+
+
+def get_retry_after_header(retry_after: float) -> str:
+    """Retry-After has integer seconds"""
+    return str(max(1, math.ceil(retry_after)))
+
+
+rate_limiter = RateLimiter()
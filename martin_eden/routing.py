@@ -1,11 +1,37 @@
-from typing import Callable, ParamSpecArgs, ParamSpecKwargs
+import inspect
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Iterable,
+    Optional,
+    ParamSpecArgs,
+    ParamSpecKwargs,
+)
 
 from martin_eden.base import Controller, CustomSchema
+from martin_eden.http_utils import HttpMethod, Request, Response
+from martin_eden.middleware import (
+    Middleware,
+    compile_middleware_chain,
+    global_middlewares,
+)
 from martin_eden.openapi import OpenApiBuilder
+from martin_eden.rate_limit import RateLimit
+from martin_eden.utils import get_argument_names
+
+# Modules with sqlalchemy and push connections are imported when route
+# needs them, so import of routing doesn't import database
+if TYPE_CHECKING:
+    from sqlalchemy import Executable
+
+    from martin_eden.pagination import CountStrategy
 
 DictOfRoutes = dict[str, dict[str, Controller]]
 
 routes: DictOfRoutes = {}
+# Controllers of static directories by prefixes of paths, longer
+# prefixes are first
+static_routes: dict[str, Controller] = {}
 
 
 class ControllerDefinitionError(Exception):
@@ -23,12 +49,16 @@ def _register_route(
     request_schema: CustomSchema = None,
     response_schema: CustomSchema = None,
     query_params: dict = None,
+    include_in_schema: bool = True,
+    bulk: bool = False,
 ) -> None:
     new_path = routes.setdefault(path, {})
     new_path[method.upper()] = controller
-    OpenApiBuilder().add_openapi_path(
-        path, method, request_schema, response_schema, query_params,
-    )
+    if include_in_schema:
+        OpenApiBuilder().add_openapi_path(
+            path, method, request_schema, response_schema, query_params,
+            bulk,
+        )
 
 
 def get_controller(path: str, method: str) -> Controller:
@@ -36,22 +66,87 @@ def get_controller(path: str, method: str) -> Controller:
         methods = routes[path]
         controller = methods[method.upper()]
     except KeyError as exc:
-        # Temp decision for not existing paths
-        # In future must return 404 not found
-        raise FindControllerError(
-            f'Controller not found with path: {path} and method: {method}',
-        ) from exc
+        controller = _find_static_controller(path, method)
+        if controller is None:
+            # Temp decision for not existing paths
+            # In future must return 404 not found
+            raise FindControllerError(
+                f'Controller not found with path: {path} '
+                f'and method: {method}',
+            ) from exc
     return controller
 
 
+def _find_static_controller(path: str, method: str) -> Optional[Controller]:
+    """Static directories are looked for only after routes, so they
+    don't slow down routing of other paths. They serve GET and HEAD"""
+    if method.upper() not in (HttpMethod.GET, HttpMethod.HEAD):
+        return None
+    for prefix, controller in static_routes.items():
+        if path.startswith(prefix):
+            return controller
+    return None
+
+
 def register_route(
     path: str,
     method: str,
     request_schema: CustomSchema = None,
     response_schema: CustomSchema = None,
     query_params: dict = None,
+    content_type: str = 'application/json',
+    include_in_schema: bool = True,
+    bulk: bool = False,
+    bulk_batch_size: int = 1000,
+    offload_serialization: bool = False,
+    query_statement: Optional['Executable'] = None,
+    eager_relations: Iterable[str] = (),
+    single_flight: bool = False,
+    rate_limit: Optional[RateLimit] = None,
+    middlewares: Iterable[Middleware] = (),
+    count_strategy: Optional['CountStrategy'] = None,
+    page_size: int = 100,
 ) -> Callable:
-    """This is decorator only, wrapping over _register_route."""
+    """This is decorator only, wrapping over _register_route.
+
+    Post route with bulk=True accepts json array or NDJSON of items of
+    request_schema. Controller gets list of dataclasses, it is called
+    for every bulk_batch_size valid items.
+
+    Response of route with offload_serialization=True is always serialized
+    in pool, not on event loop, it is for routes with big responses.
+
+    If query_statement is passed, controller can have "query" argument
+    instead of "query_params". It gets BoundQuery, that is the statement
+    with filters from query params, filters are bind parameters, so the
+    same statement is reused for requests with the same filter names.
+    Relations, that are loaded eagerly, are passed by names in
+    eager_relations, they are not loaded, if fields of response don't
+    have them.
+
+    Controller of route with query_statement can have "page" argument.
+    It gets Page of statement with "limit" and "offset" query params,
+    limit is not bigger than page_size. Total is counted by
+    count_strategy, for example CappedCount, without it total is not
+    counted. Controller returns the page, its json has items, total and
+    name of count strategy.
+
+    Concurrent GET requests of route with single_flight=True and the same
+    query params share one execution of controller and its response.
+    It is for routes, whose response is the same for all clients, so
+    controller of such route can't have "request" argument.
+
+    Route with rate_limit has own token buckets, other routes use default
+    limit from settings. Requests over the limit get 429 response.
+
+    Middlewares of route are run after global ones from add_middleware.
+
+    GET route is exported to NDJSON or CSV by "format" query parameter.
+    Route with response_schema or async generator controller, that
+    returns rows, also chooses the format by Accept header.
+
+    Controller with "request" argument gets Request with headers, cookies
+    and body. Controller can return Response to set status and headers"""
     def wrap(func: Callable) -> Callable:
         def wrapped_f(*args: ParamSpecArgs, **kwargs: ParamSpecKwargs) -> None:
             func(*args, **kwargs)
@@ -59,9 +154,142 @@ def register_route(
         func.request_schema = request_schema
         func.response_schema = response_schema
         func.query_params = query_params
+        func.content_type = content_type
+        func.bulk = bulk
+        func.bulk_batch_size = bulk_batch_size
+        func.offload_serialization = offload_serialization
+        func.single_flight = single_flight
+        func.rate_limit = rate_limit
+        func.middlewares = tuple(middlewares)
+        func.pass_request = 'request' in get_argument_names(func)
+        if single_flight and func.pass_request:
+            # Response, made for request of one client, would be
+            # shared with other clients
+            raise ControllerDefinitionError(
+                'controller with single_flight can\'t have request argument',
+            )
+        func.middleware_chain = compile_middleware_chain(func.middlewares)
+        func.push_kind = None
+        func.static_prefix = None
+        func.negotiates_accept = (
+            response_schema is not None or inspect.isasyncgenfunction(func)
+        )
+        func.query_template = None
+        if query_statement is not None:
+            from martin_eden.database import QueryTemplate
+
+            func.query_template = QueryTemplate(
+                query_statement, query_params or {},
+                eager_relations=eager_relations,
+            )
+        elif {'query', 'page'} & set(get_argument_names(func)):
+            raise ControllerDefinitionError(
+                'controller with query or page argument needs '
+                'query_statement',
+            )
+        func.count_strategy = count_strategy
+        func.page_size = page_size
         _register_route(
             path, method, func, request_schema, response_schema, query_params,
+            include_in_schema, bulk,
         )
         return wrapped_f
 
     return wrap
+
+
+def _register_push_route(path: str, push_kind: str) -> Callable:
+    def wrap(func: Callable) -> Callable:
+        func.push_kind = push_kind
+        func.static_prefix = None
+        func.negotiates_accept = False
+        func.single_flight = False
+        func.rate_limit = None
+        func.middlewares = ()
+        func.pass_request = False
+        func.middleware_chain = compile_middleware_chain()
+        _register_route(path, 'get', func, include_in_schema=False)
+        return func
+
+    return wrap
+
+
+def register_event_stream(path: str) -> Callable:
+    """Decorator of server-sent events route. Controller gets
+    EventStreamConnection, and sends messages to it, until client
+    disconnects. When controller returns, the stream is ended"""
+    from martin_eden.push import EVENT_STREAM
+
+    return _register_push_route(path, EVENT_STREAM)
+
+
+def register_websocket(path: str) -> Callable:
+    """Decorator of websocket route. Controller gets WebSocketConnection,
+    it sends messages to it and receives messages from client"""
+    from martin_eden.push import WEBSOCKET
+
+    return _register_push_route(path, WEBSOCKET)
+
+
+def register_static_directory(
+    prefix: str,
+    directory: str,
+    gzip: bool = True,
+    headers: Optional[dict[str, str]] = None,
+    rate_limit: Optional[RateLimit] = None,
+    middlewares: Iterable[Middleware] = (),
+) -> None:
+    """Files of directory are served on paths, that start with prefix,
+    for example "/static/" and "static/app.js". They are sent by
+    sendfile, with ETag, Last-Modified and Range support. If gzip is
+    True, client that accepts gzip gets "app.js.gz", if it exists.
+    Headers are added to every file, like Cache-Control"""
+    if not prefix.endswith('/'):
+        raise ControllerDefinitionError('prefix must end with "/"')
+    from martin_eden.static import StaticDirectory
+
+    static_directory = StaticDirectory(prefix, directory, gzip, headers)
+
+    async def get_static_file(request: Request) -> Response:
+        return static_directory.get_response(request.path)
+
+    get_static_file.push_kind = None
+    get_static_file.static_prefix = prefix
+    get_static_file.negotiates_accept = False
+    get_static_file.single_flight = False
+    get_static_file.rate_limit = rate_limit
+    get_static_file.middlewares = tuple(middlewares)
+    get_static_file.pass_request = True
+    get_static_file.middleware_chain = compile_middleware_chain(
+        get_static_file.middlewares,
+    )
+    get_static_file.response_schema = None
+    get_static_file.content_type = None
+    get_static_file.offload_serialization = False
+
+    static_routes[prefix] = get_static_file
+    sorted_routes = sorted(
+        static_routes.items(), key=lambda item: len(item[0]), reverse=True,
+    )
+    static_routes.clear()
+    static_routes.update(sorted_routes)
+
+
+def compile_middleware_chains() -> None:
+    """Compiles middlewares of every route, it is called on startup and
+    when global middleware is added"""
+    controllers = [
+        controller for methods in routes.values()
+        for controller in methods.values()
+    ]
+    for controller in [*controllers, *static_routes.values()]:
+        controller.middleware_chain = compile_middleware_chain(
+            controller.middlewares,
+        )
+
+
+def add_middleware(middleware: Middleware) -> None:
+    """Adds middleware to all routes, global middlewares are run in
+    order of adding, before middlewares of route"""
+    global_middlewares.append(middleware)
+    compile_middleware_chains()
@@ -0,0 +1,156 @@
+import asyncio
+import dataclasses
+import functools
+import json
+import time
+from concurrent.futures import (
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from typing import Any, Callable, Optional
+
+from marshmallow import Schema
+
+from martin_eden.metrics import metrics
+
+THREAD = 'thread'
+PROCESS = 'process'
+
+# Only so many items of every list are looked at during size estimation
+ESTIMATE_SAMPLE_SIZE = 10
+# Estimated size of json of number, boolean or null
+SCALAR_SIZE = 8
+
+
+def estimate_size(obj: Any) -> int:
+    """Cheap estimate of size of json for the object. Only the first
+    items of every list are estimated, size of other items is
+    considered the same, so estimation of huge list is not expensive"""
+    if isinstance(obj, str):
+        return len(obj) + 2
+    if isinstance(obj, dict):
+        return sum(
+            len(key) + estimate_size(value) for key, value in obj.items()
+        )
+    if isinstance(obj, (list, tuple)):
+        if not obj:
+            return 2
+        sample = obj[:ESTIMATE_SAMPLE_SIZE]
+        return len(obj) * sum(map(estimate_size, sample)) // len(sample)
+    if dataclasses.is_dataclass(obj) or hasattr(obj, '__dict__'):
+        return estimate_size(vars(obj))
+    return SCALAR_SIZE
+
+
+class ResponseSerializer:
+    """Serializes responses of controllers to json. Small responses are
+    serialized right on event loop, it is faster than passing them to
+    other thread. Responses that are estimated bigger than threshold,
+    or responses of routes with offload_serialization=True, are
+    serialized in pool, and event loop handles other requests meanwhile.
+
+    Process pool serializes only plain data with json.dumps, because
+    marshmallow schemas of the framework can't be pickled, so responses
+    with schema always go to thread pool. Marshmallow works with GIL in
+    thread too, but event loop gets GIL at least every switch interval
+    instead of waiting for the whole response"""
+
+    def __init__(self) -> None:
+        self.size_threshold = 0
+        self.executor_kind = THREAD
+        self.max_workers = 4
+        self._thread_executor: Optional[ThreadPoolExecutor] = None
+        self._process_executor: Optional[ProcessPoolExecutor] = None
+
+        self.loop_blocking_histogram = metrics.get_histogram(
+            'martin_eden_serialization_loop_blocking_seconds',
+            'Time of serialization of responses on event loop',
+        )
+        self.offloaded_histograms = {
+            executor_kind: metrics.get_histogram(
+                'martin_eden_serialization_offloaded_seconds',
+                'Time of serialization of responses in pool',
+                executor=executor_kind,
+            ) for executor_kind in (THREAD, PROCESS)
+        }
+
+    def configure(
+        self,
+        size_threshold: int,
+        executor_kind: str = THREAD,
+        max_workers: int = 4,
+    ) -> None:
+        """Threshold is in bytes, 0 means that responses are sent to
+        pool only for routes that opt in. Pools are created on first use"""
+        if executor_kind not in (THREAD, PROCESS):
+            raise ValueError(
+                f'Unknown executor of serialization: {executor_kind}',
+            )
+        self.shutdown()
+        self.size_threshold = size_threshold
+        self.executor_kind = executor_kind
+        self.max_workers = max_workers
+
+    def shutdown(self) -> None:
+        for executor in (self._thread_executor, self._process_executor):
+            if executor is not None:
+                executor.shutdown(wait=False)
+        self._thread_executor = None
+        self._process_executor = None
+
+    def _get_executor(self, executor_kind: str) -> Executor:
+        if executor_kind == PROCESS:
+            if self._process_executor is None:
+                self._process_executor = ProcessPoolExecutor(
+                    self.max_workers,
+                )
+            return self._process_executor
+
+        if self._thread_executor is None:
+            self._thread_executor = ThreadPoolExecutor(
+                self.max_workers, thread_name_prefix='serialization',
+            )
+        return self._thread_executor
+
+    def should_offload(self, obj: Any, force: bool = False) -> bool:
+        if force:
+            return True
+        if not self.size_threshold:
+            return False
+        return estimate_size(obj) >= self.size_threshold
+
+    async def dumps(
+        self,
+        obj: Any,
+        schema: Optional[Schema] = None,
+        offload: bool = False,
+    ) -> str:
+        """Dumps object with schema if it is passed, otherwise with
+        json.dumps. Offload forces serialization in pool"""
+        if schema is None:
+            function: Callable[[], str] = functools.partial(json.dumps, obj)
+            executor_kind = self.executor_kind
+        else:
+            function = functools.partial(schema.dumps, obj)
+            executor_kind = THREAD
+
+        if not self.should_offload(obj, offload):
+            start_time = time.perf_counter()
+            result = function()
+            self.loop_blocking_histogram.observe(
+                time.perf_counter() - start_time,
+            )
+            return result
+
+        start_time = time.perf_counter()
+        result = await asyncio.get_running_loop().run_in_executor(
+            self._get_executor(executor_kind), function,
+        )
+        self.offloaded_histograms[executor_kind].observe(
+            time.perf_counter() - start_time,
+        )
+        return result
+
+
+serializer = ResponseSerializer()
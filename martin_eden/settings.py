@@ -1,9 +1,19 @@
 import os
+from typing import Any, Callable
+
+
+class SettingNotDefinedError(KeyError):
+    pass
 
 
 def read_env(var_name, default=None):
     if default is None:
-        return os.environ[var_name]
+        try:
+            return os.environ[var_name]
+        except KeyError as exc:
+            raise SettingNotDefinedError(
+                f'Environment variable {var_name} is required',
+            ) from exc
     else:
         return os.environ.get(var_name, default=default)
 
@@ -12,12 +22,154 @@ def read_int(var_name, default=None):
     return int(read_env(var_name, default=default))
 
 
+def read_float(var_name, default=None):
+    return float(read_env(var_name, default=default))
+
+
 def read_str(var_name, default=None):
     return read_env(var_name, default=default)
 
 
+def read_bool(var_name, default=None):
+    value = str(read_env(var_name, default=default))
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+
+class EnvSetting:
+    """Value of setting is read from environment on first access to it
+    from instance of Settings, not on import. Therefore, import of the
+    framework doesn't require environment variables, that are not used"""
+
+    def __init__(
+        self, reader: Callable, var_name: str, default: Any = None,
+    ) -> None:
+        self.reader = reader
+        self.var_name = var_name
+        self.default = default
+        self.attribute_name = ''
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        self.attribute_name = name
+
+    def __get__(self, instance: Any, owner: type) -> Any:
+        if instance is None:
+            return self
+        value = self.reader(self.var_name, self.default)
+        # Next access will get the value from instance without descriptor
+        instance.__dict__[self.attribute_name] = value
+        return value
+
+
 class Settings:
-    server_host = read_str('SERVER_HOST')
-    server_port = read_int('SERVER_PORT')
-    postgres_url = read_str('POSTGRES_URL')
-    log_level = read_str('LOG_LEVEL')
+    server_host = EnvSetting(read_str, 'SERVER_HOST')
+    server_port = EnvSetting(read_int, 'SERVER_PORT')
+    postgres_url = EnvSetting(read_str, 'POSTGRES_URL')
+    log_level = EnvSetting(read_str, 'LOG_LEVEL')
+    # Part of requests, from 0 to 1, that will be written to access log
+    log_access_sample_rate = EnvSetting(
+        read_float, 'LOG_ACCESS_SAMPLE_RATE', 1.0,
+    )
+    database_echo = EnvSetting(read_bool, 'DATABASE_ECHO', False)
+    # Routes under /admin/, for example control of profiler. They need
+    # "Authorization: Bearer <ADMIN_TOKEN>" header, the token is required,
+    # when the routes are enabled
+    admin_routes_enabled = EnvSetting(read_bool, 'ADMIN_ROUTES_ENABLED', False)
+    admin_token = EnvSetting(read_str, 'ADMIN_TOKEN')
+    profiler_enabled = EnvSetting(read_bool, 'PROFILER_ENABLED', False)
+    profiler_every_n = EnvSetting(read_int, 'PROFILER_EVERY_N', 100)
+    # In seconds, 0 means that slow requests are not captured
+    profiler_slow_threshold = EnvSetting(
+        read_float, 'PROFILER_SLOW_THRESHOLD', 0,
+    )
+    # Report of profiler is written to the file when it is
+    # disabled by SIGUSR1 signal
+    profiler_dump_path = EnvSetting(read_str, 'PROFILER_DUMP_PATH', '')
+    # Otherwise documentation with json schemas
+    # is generated on first request to /schema/
+    openapi_on_startup = EnvSetting(read_bool, 'OPENAPI_ON_STARTUP', False)
+    # Responses that are estimated bigger than the number of bytes are
+    # serialized in pool of executor, 0 means only routes that opt in
+    serialization_offload_threshold = EnvSetting(
+        read_int, 'SERIALIZATION_OFFLOAD_THRESHOLD', 1048576,
+    )
+    # thread or process
+    serialization_executor = EnvSetting(
+        read_str, 'SERIALIZATION_EXECUTOR', 'thread',
+    )
+    serialization_max_workers = EnvSetting(
+        read_int, 'SERIALIZATION_MAX_WORKERS', 4,
+    )
+    # Interval of measuring of event loop lag in seconds, 0 disables it
+    loop_monitor_interval = EnvSetting(
+        read_float, 'LOOP_MONITOR_INTERVAL', 0.5,
+    )
+    # Stack of event loop is logged, when the loop is blocked longer
+    # than the number of seconds, 0 disables it
+    loop_block_threshold = EnvSetting(read_float, 'LOOP_BLOCK_THRESHOLD', 0)
+    # Max count of results in query cache and their time to live in seconds
+    query_cache_size = EnvSetting(read_int, 'QUERY_CACHE_SIZE', 1024)
+    query_cache_ttl = EnvSetting(read_float, 'QUERY_CACHE_TTL', 60)
+    # Size of cache of compiled statements of sqlalchemy engine
+    compiled_cache_size = EnvSetting(read_int, 'COMPILED_CACHE_SIZE', 500)
+    # Used only with asyncpg driver
+    prepared_statement_cache_size = EnvSetting(
+        read_int, 'PREPARED_STATEMENT_CACHE_SIZE', 500,
+    )
+    # Messages in queue of push connection, connection with full queue
+    # is closed as too slow
+    push_queue_size = EnvSetting(read_int, 'PUSH_QUEUE_SIZE', 100)
+    # Heartbeat is sent, if there were no messages during the seconds
+    push_heartbeat_interval = EnvSetting(
+        read_float, 'PUSH_HEARTBEAT_INTERVAL', 15,
+    )
+    websocket_max_message_size = EnvSetting(
+        read_int, 'WEBSOCKET_MAX_MESSAGE_SIZE', 1048576,
+    )
+    # Change feed listens to notifications of triggers from
+    # create_change_feed_trigger, it needs asyncpg
+    change_feed_enabled = EnvSetting(read_bool, 'CHANGE_FEED_ENABLED', False)
+    change_feed_channel = EnvSetting(
+        read_str, 'CHANGE_FEED_CHANNEL', 'martin_eden_changes',
+    )
+    # Events are sent to subscribers, when there were no new events during
+    # debounce seconds, but not later than max delay after the first one
+    change_feed_debounce = EnvSetting(
+        read_float, 'CHANGE_FEED_DEBOUNCE', 0.05,
+    )
+    change_feed_max_delay = EnvSetting(
+        read_float, 'CHANGE_FEED_MAX_DELAY', 0.5,
+    )
+    # Default rate limit of all routes in requests per second for every
+    # client, 0 disables it. Key is ip, api_key or route
+    rate_limit_rate = EnvSetting(read_float, 'RATE_LIMIT_RATE', 0)
+    rate_limit_burst = EnvSetting(read_int, 'RATE_LIMIT_BURST', 20)
+    rate_limit_key = EnvSetting(read_str, 'RATE_LIMIT_KEY', 'ip')
+    rate_limit_api_key_header = EnvSetting(
+        read_str, 'RATE_LIMIT_API_KEY_HEADER', 'X-Api-Key',
+    )
+    # Header with address of client from trusted proxy, for example
+    # X-Forwarded-For. Empty means address of socket
+    rate_limit_trusted_header = EnvSetting(
+        read_str, 'RATE_LIMIT_TRUSTED_HEADER', '',
+    )
+    # Seconds for requests to finish after SIGTERM, then they are cancelled
+    shutdown_drain_timeout = EnvSetting(
+        read_float, 'SHUTDOWN_DRAIN_TIMEOUT', 30,
+    )
+    # Http/2 cleartext with prior knowledge or upgrade, it needs h2
+    http2_enabled = EnvSetting(read_bool, 'HTTP2_ENABLED', False)
+    http2_max_concurrent_streams = EnvSetting(
+        read_int, 'HTTP2_MAX_CONCURRENT_STREAMS', 100,
+    )
+    # Path of unix socket, it is used instead of host and port
+    server_unix_socket = EnvSetting(read_str, 'SERVER_UNIX_SOCKET', '')
+    # Descriptor of listening socket, that is opened by parent process.
+    # With -1 socket of systemd socket activation is used, if it is passed
+    server_fd = EnvSetting(read_int, 'SERVER_FD', -1)
+    server_backlog = EnvSetting(read_int, 'SERVER_BACKLOG', 128)
+    tcp_nodelay = EnvSetting(read_bool, 'TCP_NODELAY', False)
+    # Seconds to wait for data of connection before accept, 0 disables it
+    tcp_defer_accept = EnvSetting(read_int, 'TCP_DEFER_ACCEPT', 0)
+    # Sizes of socket buffers in bytes, 0 keeps sizes of system
+    socket_send_buffer = EnvSetting(read_int, 'SOCKET_SEND_BUFFER', 0)
+    socket_receive_buffer = EnvSetting(read_int, 'SOCKET_RECEIVE_BUFFER', 0)
@@ -0,0 +1,49 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+from martin_eden.metrics import metrics
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share one execution. The
+    first call runs the function in task, other calls wait for the same
+    task and get the same result or exception. Key is forgotten, when
+    the task is done, so results are not cached after that.
+
+    Task is shielded, if the first client disconnects and its request
+    is cancelled, other clients still get the result"""
+
+    def __init__(self) -> None:
+        self.flights: dict[Hashable, asyncio.Future] = {}
+        self.executions_count = 0
+        self.shared_count = 0
+        metrics.register_collector(self.get_stats)
+
+    async def run(
+        self, key: Hashable, function: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        flight = self.flights.get(key)
+        if flight is None:
+            self.executions_count += 1
+            flight = asyncio.ensure_future(function())
+            self.flights[key] = flight
+            flight.add_done_callback(lambda _: self.flights.pop(key, None))
+        else:
+            self.shared_count += 1
+        return await asyncio.shield(flight)
+
+    def get_stats(self) -> list[tuple[str, str, int]]:
+        return [
+            ('martin_eden_single_flight_executions_total',
+             'Executions of controllers with single flight',
+             self.executions_count),
+            ('martin_eden_single_flight_shared_total',
+             'Requests, that got response of concurrent execution',
+             self.shared_count),
+            ('martin_eden_single_flight_in_flight',
+             'Executions with single flight running now',
+             len(self.flights)),
+        ]
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,291 @@
+# Files are sent by sendfile from page cache to socket, they are not
+# copied to user space. Http/2 streams need frames, so files are read by
+# chunks for them
+import asyncio
+import dataclasses
+import email.utils
+import mimetypes
+import os
+import stat
+from http import HTTPStatus
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Optional, Union
+
+from martin_eden.http_utils import Response, create_response_headers
+
+# Size of chunk of file, that is read for http/2 stream
+FILE_CHUNK_SIZE = 65536
+# Precompressed variant of file is near it with the suffix
+GZIP_SUFFIX = '.gz'
+
+
+class RangeNotSatisfiableError(Exception):
+    pass
+
+
+def get_etag(file_stat: os.stat_result, gzipped: bool = False) -> str:
+    """ETag is made from time of modification and size, so file is
+    not read for it"""
+    etag = f'{file_stat.st_mtime_ns:x}-{file_stat.st_size:x}'
+    return f'"{etag}-gz"' if gzipped else f'"{etag}"'
+
+
+def _get_range_bounds(start: str, end: str, size: int) -> tuple[int, int]:
+    """First and last bytes of range, without end the range lasts to the
+    end of file. Range without start is count of the last bytes"""
+    if not start:
+        suffix = int(end)
+        if suffix <= 0 or size == 0:
+            raise RangeNotSatisfiableError(f'-{end}')
+        return max(size - suffix, 0), size - 1
+    return int(start), int(end) if end else size - 1
+
+
+def parse_range(value: str, size: int) -> Optional[tuple[int, int]]:
+    """Returns offset and count of bytes from Range header: "bytes=0-99",
+    "bytes=100-" or "bytes=-100". Invalid header and several ranges are
+    ignored, then None is returned and the whole file is sent"""
+    unit, _, byte_range = value.partition('=')
+    start, separator, end = byte_range.strip().partition('-')
+    if unit.strip().lower() != 'bytes' or ',' in byte_range or (
+        not separator
+    ):
+        return None
+    try:
+        first, last = _get_range_bounds(start, end, size)
+    except ValueError:
+        return None
+    if first >= size:
+        raise RangeNotSatisfiableError(value)
+    if first < 0 or last < first:
+        return None
+    return first, min(last, size - 1) - first + 1
+
+
+@dataclasses.dataclass
+class OpenedFile:
+    file: BinaryIO
+    stat: os.stat_result
+    gzipped: bool
+    # Precompressed variant exists, so response depends on Accept-Encoding
+    has_gzip_variant: bool
+
+
+def _open_regular_file(
+    path: Path,
+) -> Optional[tuple[BinaryIO, os.stat_result]]:
+    try:
+        # File stays open until it is sent, sending closes it
+        file = path.open('rb')  # noqa: SIM115
+    except OSError:
+        return None
+    file_stat = os.fstat(file.fileno())
+    if not stat.S_ISREG(file_stat.st_mode):
+        file.close()
+        return None
+    return file, file_stat
+
+
+def open_file(
+    path: str, use_gzip: bool, accepts_gzip: bool,
+) -> Optional[OpenedFile]:
+    """Opens precompressed .gz file, if client accepts it, or the file
+    itself. It makes blocking calls, so it is run in thread"""
+    gzip_path = Path(path + GZIP_SUFFIX)
+    has_gzip_variant = use_gzip and (
+        accepts_gzip or gzip_path.is_file()
+    )
+    if use_gzip and accepts_gzip:
+        opened = _open_regular_file(gzip_path)
+        if opened is not None:
+            return OpenedFile(*opened, gzipped=True, has_gzip_variant=True)
+        has_gzip_variant = False
+    opened = _open_regular_file(Path(path))
+    if opened is None:
+        return None
+    return OpenedFile(
+        *opened, gzipped=False, has_gzip_variant=has_gzip_variant,
+    )
+
+
+def _is_not_modified(
+    request_headers: dict[str, str], etag: str, modified_time: float,
+) -> bool:
+    """If-None-Match is checked instead of If-Modified-Since,
+    when request has both"""
+    if_none_match = request_headers.get('if-none-match')
+    if if_none_match is not None:
+        return if_none_match.strip() == '*' or etag in (
+            tag.strip().removeprefix('W/') for tag in if_none_match.split(',')
+        )
+    if_modified_since = request_headers.get('if-modified-since')
+    if not if_modified_since:
+        return False
+    try:
+        since = email.utils.parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    return int(modified_time) <= since.timestamp()
+
+
+class FileResponse(Response):
+    """Controller returns it to send file. Before sending, the file is
+    prepared for request: conditional request gets 304, Range request
+    gets part of file, client that accepts gzip gets precompressed .gz
+    file, if it exists"""
+    __slots__ = ('path', 'gzip', 'file', 'offset', 'count')
+
+    def __init__(
+        self,
+        path: str,
+        status: int = HTTPStatus.OK,
+        headers: Optional[dict[str, str]] = None,
+        content_type: Optional[str] = None,
+        gzip: bool = True,
+    ) -> None:
+        if content_type is None:
+            content_type = (
+                mimetypes.guess_type(path)[0] or 'application/octet-stream'
+            )
+        super().__init__(b'', status, headers, content_type)
+        self.path = path
+        self.gzip = gzip
+        # Next attributes are filled by prepare
+        self.file: Optional[BinaryIO] = None
+        self.offset = 0
+        self.count = 0
+
+    def render_headers(self) -> bytes:
+        """Content type of file is sent without charset"""
+        return create_response_headers(
+            self.status,
+            extra_headers={
+                'Content-Type': self.content_type, **(self.headers or {}),
+            },
+        ).encode('utf8')
+
+    async def prepare(self, request_headers: dict[str, str]) -> Response:
+        """Opens file and sets headers for request. Returns itself, or
+        response without file: 304, 416, or 404 if there is no file"""
+        opened = await asyncio.to_thread(
+            open_file, self.path, self.gzip,
+            'gzip' in request_headers.get('accept-encoding', ''),
+        )
+        if opened is None:
+            return Response(
+                '404 not found', HTTPStatus.NOT_FOUND,
+                content_type='text/plain',
+            )
+
+        headers = dict(self.headers or {})
+        if opened.has_gzip_variant:
+            headers['Vary'] = 'Accept-Encoding'
+        etag = get_etag(opened.stat, opened.gzipped)
+        last_modified = email.utils.formatdate(
+            opened.stat.st_mtime, usegmt=True,
+        )
+        headers['ETag'] = etag
+        headers['Last-Modified'] = last_modified
+        if self.status == HTTPStatus.OK and _is_not_modified(
+            request_headers, etag, opened.stat.st_mtime,
+        ):
+            opened.file.close()
+            return Response(
+                b'', HTTPStatus.NOT_MODIFIED, headers=headers,
+                content_type=None,
+            )
+
+        headers['Accept-Ranges'] = 'bytes'
+        if opened.gzipped:
+            headers['Content-Encoding'] = 'gzip'
+        self.headers = headers
+        self.file = opened.file
+        self.offset, self.count = 0, opened.stat.st_size
+        # Range is applied, if file is not changed since If-Range
+        range_header = request_headers.get('range')
+        if_range = request_headers.get('if-range')
+        if range_header and self.status == HTTPStatus.OK and (
+            if_range is None or if_range in (etag, last_modified)
+        ):
+            try:
+                self._apply_range(range_header, opened.stat.st_size)
+            except RangeNotSatisfiableError:
+                opened.file.close()
+                return Response(
+                    '416 range not satisfiable',
+                    HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE,
+                    headers={
+                        'Content-Range': f'bytes */{opened.stat.st_size}',
+                    },
+                    content_type='text/plain',
+                )
+        headers['Content-Length'] = str(self.count)
+        return self
+
+    def _apply_range(self, range_header: str, size: int) -> None:
+        byte_range = parse_range(range_header, size)
+        if byte_range is None:
+            return
+        self.offset, self.count = byte_range
+        self.status = HTTPStatus.PARTIAL_CONTENT
+        self.headers['Content-Range'] = (
+            f'bytes {self.offset}-{self.offset + self.count - 1}/{size}'
+        )
+
+    async def iter_chunks(self) -> AsyncIterator[bytes]:
+        """Headers and chunks of file for connections, where sendfile
+        can't be used. Chunks are read in executor"""
+        loop = asyncio.get_running_loop()
+        try:
+            yield self.render_headers()
+            self.file.seek(self.offset)
+            remaining = self.count
+            while remaining > 0:
+                chunk = await loop.run_in_executor(
+                    None, self.file.read, min(FILE_CHUNK_SIZE, remaining),
+                )
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        finally:
+            self.file.close()
+
+
+class StaticDirectory:
+    """Files of directory, that are served by route with prefix.
+    Path of request can't leave the directory"""
+
+    def __init__(
+        self,
+        prefix: str,
+        directory: str,
+        gzip: bool = True,
+        headers: Optional[dict[str, str]] = None,
+    ) -> None:
+        self.prefix = prefix
+        self.directory = Path(directory).resolve()
+        self.gzip = gzip
+        self.headers = headers
+
+    def get_file_path(self, request_path: str) -> Optional[str]:
+        """Path of request is already decoded by parser, so names with
+        spaces and percent-encoded characters are found as they are"""
+        relative_path = request_path[len(self.prefix):]
+        # ".." are removed without access to disk, symlinks inside the
+        # directory are followed, like in nginx
+        path = Path(os.path.normpath(self.directory / relative_path))
+        if path == self.directory or not path.is_relative_to(
+            self.directory,
+        ):
+            return None
+        return str(path)
+
+    def get_response(self, request_path: str) -> Union[FileResponse, Response]:
+        path = self.get_file_path(request_path)
+        if path is None:
+            return Response(
+                '404 not found', HTTPStatus.NOT_FOUND,
+                content_type='text/plain',
+            )
+        return FileResponse(path, headers=self.headers, gzip=self.gzip)
@@ -1,4 +1,5 @@
 import json
+from typing import Optional
 
 from sqlalchemy.orm import Mapped, mapped_column
 
@@ -36,6 +37,34 @@ base_http_request = (
     'EetDaRq0uVnaC8vMKj2YhEYL5Fs\n'
 )
 
+
+def create_request(
+    path: str = '/users/',
+    method: str = 'GET',
+    headers: Optional[dict[str, Optional[str]]] = None,
+    body: str = '',
+) -> bytes:
+    """Message from base_http_request with other path and method.
+    Headers replace headers of base request with the same name, header
+    with None value is removed"""
+    headers = headers or {}
+    replaced_names = {name.lower() for name in headers}
+    first_line, *header_lines = base_http_request.splitlines()
+    lines = [f'{method} {path} HTTP/1.1']
+    lines.extend(
+        line for line in header_lines
+        if line.partition(':')[0].lower() not in replaced_names
+    )
+    lines.extend(
+        f'{name}: {value}' for name, value in headers.items()
+        if value is not None
+    )
+    message = '\n'.join(lines) + '\n'
+    if body:
+        message += '\n' + body
+    return message.encode('utf8')
+
+
 # These headers are makes by framework
 # And needs to compare in asserts
 base_http_result_headers = (
@@ -0,0 +1,125 @@
+import asyncio
+import json
+import signal
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from martin_eden.core import Backend, HttpMessageHandler, readiness
+from martin_eden.database import EXECUTEMANY, bulk_insert
+from martin_eden.http_utils import (
+    HttpHeadersParser,
+    get_content_length,
+    iter_json_items,
+)
+from martin_eden.routing import register_route
+from tests import conftest
+
+pytest_plugins = ('pytest_asyncio',)
+
+received_batches = []
+
+
+@register_route(
+    '/test_bulk/', 'post',
+    request_schema=conftest.TestSchema(),
+    bulk=True,
+    bulk_batch_size=2,
+)
+async def create_tests(tests: list[conftest.TestDataclass]) -> int:
+    received_batches.append(tests)
+    return len(tests)
+
+
+def test_iter_json_items_of_ndjson():
+    items = list(iter_json_items('{"a": 1}\n\nbroken\n{"a": 2}\n'))
+    assert items[0] == ({'a': 1}, None)
+    assert items[1][0] is None
+    assert items[1][1]
+    assert items[2] == ({'a': 2}, None)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('body', [
+    json.dumps([
+        {'name': 'one', 'age': 1},
+        {'name': 'two', 'age': 'wrong'},
+        {'name': 'three', 'age': 3},
+        {'name': 'four', 'age': 4},
+    ]),
+    '\n'.join([
+        '{"name": "one", "age": 1}',
+        '{"name": "two", "age": "wrong"}',
+        '{"name": "three", "age": 3}',
+        '{"name": "four", "age": 4}',
+    ]),
+])
+async def test_bulk_post_method(body):
+    received_batches.clear()
+    handler = HttpMessageHandler(
+        conftest.create_request('/test_bulk/', 'POST', body=body),
+    )
+    response = await handler.handle_request()
+
+    result = json.loads(HttpHeadersParser(response.decode('utf8')).body)
+    assert result['accepted'] == 3
+    assert result['rejected'] == 1
+    assert result['errors'][0]['index'] == 1
+    assert 'age' in result['errors'][0]['errors']
+    assert result['results'] == [2, 1]
+    assert [
+        [test.name for test in batch] for batch in received_batches
+    ] == [['one', 'three'], ['four']]
+
+
+@pytest.mark.asyncio
+async def test_bulk_insert():
+    pytest.importorskip('aiosqlite')
+    engine = create_async_engine('sqlite+aiosqlite://')
+    async with engine.begin() as connection:
+        await connection.run_sync(conftest.TestModel.__table__.create)
+
+    async with async_sessionmaker(engine)() as session:
+        inserted_count = await bulk_insert(session, conftest.TestModel, [
+            conftest.TestDataclass(name='one', age=1),
+            {'name': 'two', 'age': 2},
+        ], method=EXECUTEMANY)
+        await session.commit()
+
+        assert inserted_count == 2
+        count = await session.scalar(select(func.count(conftest.TestModel.pk)))
+        assert count == 2
+    await engine.dispose()
+
+
+def test_invalid_content_length_is_ignored():
+    for value in (b'abc', b'-1', b''):
+        headers = b'POST /test_bulk/ HTTP/1.1\r\nContent-Length: ' + value
+        assert get_content_length(headers) is None
+    assert get_content_length(b'Content-Length: 12') == 12
+
+
+@pytest.mark.asyncio
+async def test_malformed_content_length_gets_response(monkeypatch):
+    monkeypatch.setenv('SERVER_PORT', '0')
+    monkeypatch.setenv('LOOP_MONITOR_INTERVAL', '0')
+    backend = Backend()
+    main_task = asyncio.create_task(backend.main())
+    await asyncio.sleep(0.01)
+    port = backend.server_socket.getsockname()[1]
+
+    reader, writer = await asyncio.open_connection('localhost', port)
+    writer.write(conftest.create_request(
+        '/health/', headers={'Content-Length': 'abc'},
+    ))
+    await writer.drain()
+    assert (await reader.read()).endswith(b'{"status": "ready"}')
+    writer.close()
+
+    backend.stop()
+    await asyncio.wait_for(main_task, 1)
+    loop = asyncio.get_running_loop()
+    for stop_signal in (signal.SIGTERM, signal.SIGINT, signal.SIGUSR1):
+        loop.remove_signal_handler(stop_signal)
+    readiness.ready = True
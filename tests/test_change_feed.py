@@ -0,0 +1,166 @@
+import asyncio
+from typing import Callable, Optional
+
+import pytest
+
+from martin_eden.database import (
+    DELETE,
+    INSERT,
+    UPDATE,
+    ChangeEvent,
+    ChangeFeed,
+    decode_change_notification,
+    get_change_feed_sql,
+    invalidate_query_cache,
+    query_cache,
+)
+from martin_eden.push import (
+    EVENT_STREAM,
+    EventStreamConnection,
+    broadcast_changes,
+    broadcaster,
+    get_change_broadcast_channel,
+)
+from tests import conftest
+
+pytest_plugins = ('pytest_asyncio',)
+
+
+def test_decode_change_notification():
+    assert decode_change_notification(
+        '{"table": "test", "op": "UPDATE", "pk": [5]}',
+    ) == ChangeEvent('test', UPDATE, 5)
+    assert decode_change_notification(
+        '{"table": "test", "op": "DELETE", "pk": [1, "a"]}',
+    ) == ChangeEvent('test', DELETE, (1, 'a'))
+    assert decode_change_notification('not json') is None
+    assert ChangeEvent('test', INSERT, 1).model.__tablename__ == 'test'
+
+
+def test_change_feed_sql():
+    function_sql, drop_sql, create_sql = get_change_feed_sql(
+        conftest.TestModel,
+    )
+    assert 'pg_notify' in function_sql
+    assert drop_sql == (
+        'DROP TRIGGER IF EXISTS test_martin_eden_notify_change ON test'
+    )
+    assert create_sql.endswith(
+        "martin_eden_notify_change('martin_eden_changes', 'pk')",
+    )
+
+
+@pytest.mark.asyncio
+async def test_events_are_coalesced_and_debounced():
+    feed = ChangeFeed(debounce=0.01, max_delay=0.2, max_pending=3)
+    batches = []
+    feed.subscribe(batches.append)
+    other_batches = []
+    feed.subscribe(other_batches.append, tables=['other'])
+
+    for _ in range(3):
+        feed.add_event(ChangeEvent('test', UPDATE, 1))
+    feed.add_event(ChangeEvent('test', DELETE, 2))
+    assert batches == []
+    await asyncio.sleep(0.05)
+    assert batches == [[
+        ChangeEvent('test', UPDATE, 1), ChangeEvent('test', DELETE, 2),
+    ]]
+    assert other_batches == []
+
+    # Too many changed rows become one event of the table
+    for primary_key in range(5):
+        feed.add_event(ChangeEvent('test', INSERT, primary_key))
+    feed.flush()
+    assert batches[1] == [ChangeEvent('test', INSERT)]
+
+
+@pytest.mark.asyncio
+async def test_max_delay_of_events():
+    feed = ChangeFeed(debounce=0.05, max_delay=0.05)
+    batches = []
+    feed.subscribe(batches.append)
+    # Events come more often than debounce, but subscriber
+    # gets them not later than max delay
+    for primary_key in range(5):
+        feed.add_event(ChangeEvent('test', INSERT, primary_key))
+        await asyncio.sleep(0.02)
+    assert batches
+
+
+def test_change_events_invalidate_and_broadcast():
+    query_cache.clear()
+    query_cache.set(('a',), frozenset({'test'}), 'result')
+
+    feed = ChangeFeed()
+    feed.subscribe(broadcast_changes)
+    feed.subscribe(invalidate_query_cache)
+
+    connection = EventStreamConnection()
+    channel = get_change_broadcast_channel('test')
+    with broadcaster.subscribe(channel, connection):
+        feed.pending[('test', 1)] = ChangeEvent('test', UPDATE, 1)
+        feed.flush()
+
+    assert ('a',) not in query_cache.entries
+    message = connection.queue.get_nowait()
+    assert message.encode(EVENT_STREAM) == (
+        b'event: change\ndata: [{"op": "UPDATE", "pk": 1}]\n\n'
+    )
+
+
+class FakeConnection:
+    def __init__(self, error: Optional[Exception]) -> None:
+        self.error = error
+        self.listening = asyncio.Event()
+
+    def add_termination_listener(self, _callback: Callable) -> None:
+        pass
+
+    async def add_listener(self, _channel: str, _callback: Callable) -> None:
+        if self.error is not None:
+            raise self.error
+        self.listening.set()
+
+    def is_closed(self) -> bool:
+        return False
+
+    def terminate(self) -> None:
+        pass
+
+
+@pytest.mark.asyncio
+async def test_dropped_connection_is_reconnected(monkeypatch):
+    asyncpg = pytest.importorskip('asyncpg')
+    connections = [
+        FakeConnection(asyncpg.InterfaceError('connection is closed')),
+        FakeConnection(None),
+    ]
+
+    async def connect(_dsn: str) -> FakeConnection:
+        return connections.pop(0)
+
+    monkeypatch.setattr(asyncpg, 'connect', connect)
+    feed = ChangeFeed()
+    feed.start('postgresql+asyncpg://localhost/test', reconnect_delay=0)
+    listening = connections[1].listening
+    await asyncio.wait_for(listening.wait(), 1)
+    assert feed.reconnections_count == 1
+    feed.stop()
+
+
+@pytest.mark.asyncio
+async def test_unexpected_error_of_change_feed_is_logged(
+    monkeypatch, caplog,
+):
+    asyncpg = pytest.importorskip('asyncpg')
+
+    async def connect(_dsn: str) -> FakeConnection:
+        raise RuntimeError('unexpected')
+
+    monkeypatch.setattr(asyncpg, 'connect', connect)
+    feed = ChangeFeed()
+    feed.start('postgresql+asyncpg://localhost/test')
+    with pytest.raises(RuntimeError):
+        await asyncio.wait_for(feed._task, 1)
+    assert 'Change feed has stopped' in caplog.text
@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+from martin_eden.core import HttpMessageHandler
+from martin_eden.export import CSV, JSON, NDJSON, negotiate_export_format
+from martin_eden.routing import register_route
+from tests import conftest
+
+pytest_plugins = ('pytest_asyncio',)
+
+received_query_params = []
+
+
+@register_route(
+    '/test_export/', 'get',
+    response_schema=conftest.TestSchema(many=True),
+    query_params={conftest.TestModel: ['name']},
+)
+async def get_tests(query_params: list):
+    received_query_params.append(query_params)
+    for pk in range(1, 4):
+        yield conftest.TestModel(pk=pk, name=f'name, {pk}', age=pk * 10)
+
+
+async def read_response(handler: HttpMessageHandler) -> str:
+    response = await handler.handle_request()
+    return b''.join([chunk async for chunk in response]).decode('utf8')
+
+
+def test_negotiate_export_format():
+    assert negotiate_export_format(None, 'text/html, */*') == JSON
+    assert negotiate_export_format(
+        None, 'application/x-ndjson; q=0.9',
+    ) == NDJSON
+    assert negotiate_export_format('csv', 'application/x-ndjson') == CSV
+    assert negotiate_export_format('xml', '') == JSON
+
+
+@pytest.mark.asyncio
+async def test_export_ndjson_by_accept_header():
+    handler = HttpMessageHandler(conftest.create_request(
+        '/test_export/', headers={'Accept': 'application/x-ndjson'},
+    ))
+    response = await read_response(handler)
+
+    headers, body = response.split('\n\n', 1)
+    assert 'Content-Type: application/x-ndjson' in headers
+    assert [json.loads(line) for line in body.splitlines()] == [
+        {'pk': pk, 'name': f'name, {pk}', 'age': pk * 10}
+        for pk in range(1, 4)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_export_csv_by_format_query_param():
+    received_query_params.clear()
+    handler = HttpMessageHandler(
+        conftest.create_request('/test_export/?format=csv'),
+    )
+    response = await read_response(handler)
+
+    headers, body = response.split('\n\n', 1)
+    assert 'Content-Type: text/csv' in headers
+    assert body.splitlines() == [
+        'age,name,pk',
+        '10,"name, 1",1',
+        '20,"name, 2",2',
+        '30,"name, 3",3',
+    ]
+    # Format is not a filter
+    assert received_query_params == [[True]]
+
+
+@pytest.mark.asyncio
+async def test_export_json_from_async_generator():
+    handler = HttpMessageHandler(conftest.create_request('/test_export/'))
+    response = await handler.handle_request()
+
+    body = response.decode('utf8').split('\n\n', 1)[1]
+    assert json.loads(body)[0] == {'pk': 1, 'name': 'name, 1', 'age': 10}
+
+
+@register_route('/test_export_without_rows/', 'get')
+async def get_without_rows() -> str:
+    return '[{"pk": 1}]'
+
+
+@pytest.mark.asyncio
+async def test_accept_is_read_only_by_routes_with_rows():
+    handler = HttpMessageHandler(conftest.create_request(
+        '/test_export_without_rows/', headers={'Accept': 'text/csv'},
+    ))
+    response = await handler.handle_request()
+    assert response.endswith(b'[{"pk": 1}]')
+
+    handler = HttpMessageHandler(conftest.create_request(
+        '/test_export_without_rows/?format=csv',
+    ))
+    response = await read_response(handler)
+    assert response.split('\n\n', 1)[1].splitlines() == ['pk', '1']
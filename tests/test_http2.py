@@ -0,0 +1,183 @@
+import asyncio
+import socket
+
+import pytest
+
+from martin_eden.core import Backend
+from martin_eden.http_utils import H2_PREFACE, Request, is_h2c_message
+from martin_eden.routing import register_route
+from tests import conftest
+
+h2 = pytest.importorskip('h2')
+from h2.config import H2Configuration  # noqa: E402
+from h2.connection import H2Connection  # noqa: E402
+from h2.events import (  # noqa: E402
+    DataReceived,
+    ResponseReceived,
+    StreamEnded,
+)
+
+from martin_eden.http2 import (  # noqa: E402
+    H2cConnection,
+    h2_request_to_message,
+    parse_http1_response,
+)
+
+pytest_plugins = ('pytest_asyncio',)
+
+
+@register_route('/test_http2/', 'get')
+async def get_http2(request: Request) -> str:
+    await asyncio.sleep(0.01)
+    return f'"{request.query_params["name"]}"'
+
+
+@register_route('/test_http2_big/', 'get')
+async def get_http2_big() -> str:
+    return '"' + 'a' * 100000 + '"'
+
+
+def request_headers(path: str) -> list[tuple[str, str]]:
+    return [
+        (':method', 'GET'),
+        (':path', path),
+        (':scheme', 'http'),
+        (':authority', 'localhost'),
+        ('cookie', 'person_pk=1'),
+        ('cookie', 'token=a0966813f9b27b2a545c75966fd87815660787a3'),
+    ]
+
+
+async def read_responses(
+    loop, client_socket, client: H2Connection, count: int,
+) -> dict[int, tuple[dict, bytes]]:
+    responses = {}
+    ended = set()
+    while len(ended) < count:
+        data = await loop.sock_recv(client_socket, 65536)
+        assert data
+        for event in client.receive_data(data):
+            if isinstance(event, ResponseReceived):
+                responses[event.stream_id] = (dict(event.headers), b'')
+            elif isinstance(event, DataReceived):
+                client.acknowledge_received_data(
+                    event.flow_controlled_length, event.stream_id,
+                )
+                headers, body = responses[event.stream_id]
+                responses[event.stream_id] = (headers, body + event.data)
+            elif isinstance(event, StreamEnded):
+                ended.add(event.stream_id)
+        await loop.sock_sendall(client_socket, client.data_to_send())
+    return responses
+
+
+@pytest.fixture
+def socket_pair():
+    server_socket, client_socket = socket.socketpair()
+    server_socket.setblocking(False)
+    client_socket.setblocking(False)
+    yield server_socket, client_socket
+    server_socket.close()
+    client_socket.close()
+
+
+def test_request_to_message():
+    message = h2_request_to_message(request_headers('/test_http2/'), b'')
+    assert message.startswith(b'GET /test_http2/ HTTP/2\r\nhost: localhost')
+    assert b'cookie: person_pk=1; token=' in message
+
+    headers, body = parse_http1_response(
+        b'HTTP/1.0 201\nContent-Type: text/plain\nConnection: close\n\nok',
+    )
+    assert headers == [(':status', '201'), ('content-type', 'text/plain')]
+    assert body == b'ok'
+
+
+@pytest.mark.asyncio
+async def test_prior_knowledge_multiplexes_streams(monkeypatch, socket_pair):
+    monkeypatch.setenv('SERVER_PORT', '0')
+    backend = Backend()
+    loop = asyncio.get_running_loop()
+    backend.event_loop = loop
+    server_socket, client_socket = socket_pair
+
+    client = H2Connection(H2Configuration(header_encoding='utf-8'))
+    client.initiate_connection()
+    client.send_headers(1, request_headers('/test_http2/?name=one'), True)
+    client.send_headers(3, request_headers('/test_http2/?name=two'), True)
+    client.send_headers(5, request_headers('/test_http2_big/'), True)
+    message = client.data_to_send()
+    assert is_h2c_message(message)
+
+    connection = H2cConnection(
+        loop, server_socket, None, backend._run_handler,
+    )
+    task = asyncio.create_task(connection.run(message))
+    responses = await read_responses(loop, client_socket, client, 3)
+
+    headers, body = responses[1]
+    assert headers[':status'] == '200'
+    assert headers['content-length'] == '5'
+    assert 'connection' not in headers
+    assert body == b'"one"'
+    assert responses[3][1] == b'"two"'
+    # Body is bigger than default window, it is sent after window updates
+    assert len(responses[5][1]) == 100002
+
+    client.close_connection()
+    await loop.sock_sendall(client_socket, client.data_to_send())
+    await asyncio.wait_for(task, 1)
+
+
+@pytest.mark.asyncio
+async def test_upgrade(monkeypatch, socket_pair):
+    monkeypatch.setenv('SERVER_PORT', '0')
+    backend = Backend()
+    loop = asyncio.get_running_loop()
+    backend.event_loop = loop
+    server_socket, client_socket = socket_pair
+
+    client = H2Connection(H2Configuration(header_encoding='utf-8'))
+    settings = client.initiate_upgrade_connection()
+    message = conftest.create_request(
+        '/test_http2/?name=upgraded',
+        headers={'Upgrade': 'h2c', 'HTTP2-Settings': settings.decode()},
+    )
+    assert is_h2c_message(message)
+
+    connection = H2cConnection(
+        loop, server_socket, None, backend._run_handler,
+    )
+    task = asyncio.create_task(connection.run(message))
+
+    switching = b''
+    while b'\r\n\r\n' not in switching:
+        switching += await loop.sock_recv(client_socket, 1)
+    assert switching.startswith(b'HTTP/1.1 101')
+    await loop.sock_sendall(client_socket, client.data_to_send())
+
+    responses = await read_responses(loop, client_socket, client, 1)
+    assert responses[1][1] == b'"upgraded"'
+
+    client.close_connection()
+    await loop.sock_sendall(client_socket, client.data_to_send())
+    await asyncio.wait_for(task, 1)
+
+
+@pytest.mark.asyncio
+async def test_preface_in_several_segments(monkeypatch, socket_pair):
+    monkeypatch.setenv('SERVER_PORT', '0')
+    backend = Backend()
+    loop = asyncio.get_running_loop()
+    backend.event_loop = loop
+    server_socket, client_socket = socket_pair
+
+    read_task = asyncio.create_task(
+        backend._read_http_message(server_socket),
+    )
+    # The first segment ends with empty line, like end of headers
+    await loop.sock_sendall(client_socket, H2_PREFACE[:18])
+    await asyncio.sleep(0.01)
+    await loop.sock_sendall(client_socket, H2_PREFACE[18:])
+    message = await asyncio.wait_for(read_task, 1)
+    assert is_h2c_message(message)
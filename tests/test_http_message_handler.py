@@ -92,6 +92,11 @@ async def test_openapi_schema(http_get_request):
 @pytest.mark.asyncio
 @pytest.mark.parametrize('query_param_source, query_param_result', [
     (b'test__name__like=martin', '["test.name LIKE :name_1"]'),
+    (b'test__name__search=martin', (
+        '["to_tsvector(\'simple\', test.name) @@ '
+        'plainto_tsquery(\'simple\', :plainto_tsquery_1)"]'
+    )),
+    (b'test__name__trigram=martin', '["test.name % :name_1"]'),
     (b'test__age__exactly=123', '["test.age IN (__[POSTCOMPILE_age_1])"]'),
     (b'test__age__in=123', '["test.age IN (__[POSTCOMPILE_age_1])"]'),
     (b'test__age__in=123,345', '["test.age IN (__[POSTCOMPILE_age_1])"]'),
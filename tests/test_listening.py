@@ -0,0 +1,93 @@
+import asyncio
+import os
+import signal
+import socket
+from pathlib import Path
+
+import pytest
+
+from martin_eden.core import Backend, get_inherited_fd, readiness
+from tests import conftest
+
+pytest_plugins = ('pytest_asyncio',)
+
+# systemd passes the first socket with this descriptor
+SYSTEMD_FD = 3
+BUFFER_SIZE = 65536
+
+HEALTH_REQUEST = conftest.create_request('/health/')
+
+
+async def stop_backend(backend: Backend, main_task: asyncio.Task) -> None:
+    backend.stop()
+    await asyncio.wait_for(main_task, 1)
+    loop = asyncio.get_running_loop()
+    for stop_signal in (signal.SIGTERM, signal.SIGINT, signal.SIGUSR1):
+        loop.remove_signal_handler(stop_signal)
+    readiness.ready = True
+
+
+@pytest.fixture
+def backend_env(monkeypatch):
+    monkeypatch.setenv('LOOP_MONITOR_INTERVAL', '0')
+    return monkeypatch
+
+
+@pytest.mark.asyncio
+async def test_unix_socket(backend_env, tmp_path):
+    path = str(tmp_path / 'backend.sock')
+    backend_env.setenv('SERVER_UNIX_SOCKET', path)
+    backend_env.delenv('SERVER_HOST', raising=False)
+    # Socket file of previous process is replaced
+    Backend().server_socket.close()
+    backend = Backend()
+    main_task = asyncio.create_task(backend.main())
+    await asyncio.sleep(0.01)
+
+    reader, writer = await asyncio.open_unix_connection(path)
+    writer.write(HEALTH_REQUEST)
+    await writer.drain()
+    assert (await reader.read()).endswith(b'{"status": "ready"}')
+    writer.close()
+
+    await stop_backend(backend, main_task)
+    assert not Path(path).exists()
+
+
+@pytest.mark.asyncio
+async def test_inherited_fd(backend_env):
+    listening_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listening_socket.bind(('localhost', 0))
+    port = listening_socket.getsockname()[1]
+    backend_env.setenv('SERVER_FD', str(listening_socket.detach()))
+    backend_env.setenv('TCP_NODELAY', '1')
+    backend_env.setenv('SOCKET_SEND_BUFFER', str(BUFFER_SIZE))
+    backend = Backend()
+    assert backend.server_socket.getsockname()[1] == port
+    assert backend.server_socket.getsockopt(
+        socket.SOL_SOCKET, socket.SO_SNDBUF,
+    ) >= BUFFER_SIZE
+
+    main_task = asyncio.create_task(backend.main())
+    await asyncio.sleep(0.01)
+    reader, writer = await asyncio.open_connection('localhost', port)
+    writer.write(HEALTH_REQUEST)
+    await writer.drain()
+    assert (await reader.read()).endswith(b'{"status": "ready"}')
+    writer.close()
+    await stop_backend(backend, main_task)
+
+
+def test_systemd_socket_activation(monkeypatch):
+    monkeypatch.setenv('LISTEN_PID', str(os.getpid()))
+    monkeypatch.setenv('LISTEN_FDS', '1')
+    assert get_inherited_fd() == SYSTEMD_FD
+    # Variables are removed, so the socket is taken only once
+    assert 'LISTEN_FDS' not in os.environ
+    assert get_inherited_fd() is None
+
+    monkeypatch.setenv('LISTEN_PID', '1')
+    monkeypatch.setenv('LISTEN_FDS', '1')
+    assert get_inherited_fd() is None
+    server_fd = 7
+    assert get_inherited_fd(server_fd) == server_fd
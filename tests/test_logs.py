@@ -0,0 +1,54 @@
+import logging
+
+from martin_eden import logs
+from martin_eden.logs import (
+    ACCESS_LOGGER_NAME,
+    AccessLogger,
+    JsonFormatter,
+    configure_logging,
+)
+
+
+def test_json_formatter_adds_fields():
+    record = logging.LogRecord(
+        ACCESS_LOGGER_NAME, logging.INFO, __file__, 1, 'access', None, None,
+    )
+    record.fields = {'method': 'GET', 'status': 200}
+    result = JsonFormatter().format(record)
+    assert '"method": "GET"' in result
+    assert '"status": 200' in result
+    assert '"message": "access"' in result
+
+
+def test_access_logger_not_sampled_for_disabled_level():
+    access_logger = AccessLogger()
+    access_logger.logger.setLevel(logging.WARNING)
+    try:
+        assert access_logger.is_sampled() is False
+    finally:
+        access_logger.logger.setLevel(logging.NOTSET)
+
+
+def test_access_logger_zero_sample_rate():
+    access_logger = AccessLogger(sample_rate=0)
+    access_logger.logger.setLevel(logging.INFO)
+    try:
+        assert access_logger.is_sampled() is False
+    finally:
+        access_logger.logger.setLevel(logging.NOTSET)
+
+
+def test_configure_logging_keeps_handlers_of_application(monkeypatch):
+    monkeypatch.setattr(logs, '_queue_listener', None)
+    root_logger = logging.getLogger()
+    handler = logging.NullHandler()
+    monkeypatch.setattr(root_logger, 'handlers', [handler])
+    level = root_logger.level
+    try:
+        configure_logging('WARNING')
+        assert root_logger.handlers == [handler]
+        assert root_logger.level == logging.WARNING
+        # Listener isn't started, no records would reach it
+        assert logs._queue_listener is None
+    finally:
+        root_logger.setLevel(level)
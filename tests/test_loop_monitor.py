@@ -0,0 +1,46 @@
+import asyncio
+import logging
+import time
+
+import pytest
+
+from martin_eden.loop_monitor import loop_monitor
+from martin_eden.metrics import metrics
+
+pytest_plugins = ('pytest_asyncio',)
+
+
+def block_event_loop():
+    time.sleep(0.3)
+
+
+@pytest.mark.asyncio
+async def test_lag_of_blocked_event_loop(caplog):
+    blocks_count = loop_monitor.blocks_count
+    loop_monitor.start(interval=0.01, block_threshold=0.1)
+    try:
+        await asyncio.sleep(0.05)
+        with caplog.at_level(logging.WARNING, 'martin_eden.loop_monitor'):
+            block_event_loop()
+            await asyncio.sleep(0.05)
+    finally:
+        loop_monitor.stop()
+
+    assert loop_monitor.max_lag >= 0.2
+    assert loop_monitor.blocks_count == blocks_count + 1
+    assert 'block_event_loop' in caplog.text
+    assert 'martin_eden_event_loop_lag_seconds_count' in (
+        metrics.render_prometheus()
+    )
+
+
+@pytest.mark.asyncio
+async def test_monitor_without_watchdog():
+    loop_monitor.start(interval=0.01)
+    try:
+        await asyncio.sleep(0.05)
+    finally:
+        loop_monitor.stop()
+
+    assert not loop_monitor.running
+    assert loop_monitor.lag_histogram.count > 0
@@ -0,0 +1,58 @@
+import pytest
+
+from martin_eden.core import HttpMessageHandler
+from martin_eden.http_utils import HttpHeadersParser
+from martin_eden.metrics import (
+    CONTROLLER,
+    Histogram,
+    MetricsRegistry,
+    RequestTimer,
+)
+from tests.conftest import create_request
+
+pytest_plugins = ('pytest_asyncio',)
+
+
+def test_histogram_observe():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5)
+    assert histogram.counts == [1, 1, 1]
+    assert histogram.cumulative_counts() == [1, 2, 3]
+    assert histogram.count == 3
+
+
+def test_render_prometheus():
+    registry = MetricsRegistry()
+    timer = RequestTimer()
+    timer.lap(CONTROLLER)
+    registry.record_request('/test/', 'GET', 200, 0.01, timer)
+    registry.record_request(None, 'GET', 200, 0.01, timer)
+    registry.register_collector(lambda: [
+        ('some_gauge', 'help', 3), ('some_total', 'help', 5),
+    ])
+
+    result = registry.render_prometheus()
+    assert (
+        'martin_eden_requests_total'
+        '{route="/test/",method="GET",status="200"} 1'
+    ) in result
+    assert 'route="<unmatched>"' in result
+    assert (
+        'martin_eden_request_phase_seconds_count'
+        '{route="/test/",method="GET",phase="controller"} 1'
+    ) in result
+    assert '# TYPE some_gauge gauge\nsome_gauge 3' in result
+    # Counter of collector is exported as counter, so rate() works
+    assert '# TYPE some_total counter\nsome_total 5' in result
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint():
+    handler = HttpMessageHandler(create_request('/metrics/'))
+    response = await handler.handle_request()
+
+    parser = HttpHeadersParser(response.decode('utf8'))
+    assert 'Content-Type: text/plain; version=0.0.4' in parser.http_message
+    assert 'martin_eden_requests_in_flight' in parser.body
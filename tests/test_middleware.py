@@ -0,0 +1,161 @@
+from http import HTTPStatus
+
+import pytest
+
+from martin_eden.core import HttpMessageHandler
+from martin_eden.http_utils import HttpHeadersParser, Request
+from martin_eden.middleware import Middleware, global_middlewares
+from martin_eden.routing import (
+    add_middleware,
+    compile_middleware_chains,
+    get_controller,
+    register_route,
+)
+from tests import conftest
+
+pytest_plugins = ('pytest_asyncio',)
+
+calls = []
+
+
+class RecordMiddleware(Middleware):
+    def __init__(self, name: str, stop: bool = False) -> None:
+        self.name = name
+        self.stop = stop
+
+    async def before_request(self, _handler, _request):
+        calls.append(f'before {self.name}')
+        if self.stop:
+            return b'stopped'
+        return None
+
+    async def after_response(self, _handler, _request, response):
+        calls.append(f'after {self.name}')
+        return response + f' {self.name}'.encode()
+
+
+class ErrorMiddleware(Middleware):
+    async def on_error(self, handler, _request, error):
+        calls.append(f'error {error}')
+        handler.status = HTTPStatus.INTERNAL_SERVER_ERROR
+        return b'error'
+
+
+class AuthMiddleware(Middleware):
+    async def before_request(self, handler, request):
+        calls.append(request)
+        if request.cookies.get('person_pk') != request.query_params['pk']:
+            return handler.create_status_response(
+                HTTPStatus.FORBIDDEN, '403 forbidden',
+            )
+        return None
+
+
+@register_route(
+    '/test_middleware/', 'get',
+    middlewares=[RecordMiddleware('first'), RecordMiddleware('second')],
+)
+async def get_with_middlewares() -> str:
+    calls.append('controller')
+    return '"ok"'
+
+
+@register_route(
+    '/test_middleware_stop/', 'get',
+    middlewares=[
+        RecordMiddleware('first'),
+        RecordMiddleware('second', stop=True),
+        RecordMiddleware('third'),
+    ],
+)
+async def get_stopped() -> str:
+    calls.append('controller')
+    return '"ok"'
+
+
+@register_route(
+    '/test_middleware_error/', 'get',
+    middlewares=[ErrorMiddleware(), RecordMiddleware('first')],
+)
+async def get_error() -> str:
+    raise ValueError('broken')
+
+
+@register_route(
+    '/test_middleware_request/', 'get', middlewares=[AuthMiddleware()],
+)
+async def get_with_request(request: Request) -> str:
+    calls.append(request)
+    return '"ok"'
+
+
+@register_route('/test_middleware_none/', 'get')
+async def get_without_middlewares() -> str:
+    return '"ok"'
+
+
+async def request(path: str) -> bytes:
+    calls.clear()
+    handler = HttpMessageHandler(conftest.create_request(path))
+    return await handler.handle_request()
+
+
+@pytest.fixture
+def global_middleware():
+    add_middleware(RecordMiddleware('global'))
+    yield
+    global_middlewares.clear()
+    compile_middleware_chains()
+
+
+@pytest.mark.asyncio
+async def test_order_of_hooks():
+    response = await request('/test_middleware/')
+    assert calls == [
+        'before first', 'before second', 'controller',
+        'after second', 'after first',
+    ]
+    assert response.endswith(b'"ok" second first')
+
+
+@pytest.mark.asyncio
+async def test_before_request_returns_response():
+    response = await request('/test_middleware_stop/')
+    assert calls == [
+        'before first', 'before second', 'after second', 'after first',
+    ]
+    assert response == b'stopped second first'
+
+
+@pytest.mark.asyncio
+async def test_on_error():
+    response = await request('/test_middleware_error/')
+    assert calls == ['before first', 'error broken']
+    assert response == b'error'
+
+
+@pytest.mark.asyncio
+async def test_hooks_get_request():
+    response = await request('/test_middleware_request/?pk=1')
+    assert response.endswith(b'"ok"')
+    # Controller gets the same Request, that middleware has checked
+    assert isinstance(calls[0], Request)
+    assert calls[1] is calls[0]
+
+    await request('/test_middleware_request/?pk=2')
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('global_middleware')
+async def test_global_middleware():
+    response = await request('/test_middleware/')
+    assert calls[0] == 'before global'
+    assert calls[-1] == 'after global'
+    parser = HttpHeadersParser(response.decode('utf8'))
+    assert parser.body == '"ok" second first global'
+
+
+def test_route_without_middlewares_has_no_chain():
+    controller = get_controller('/test_middleware_none/', 'GET')
+    assert controller.middleware_chain is None
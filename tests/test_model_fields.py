@@ -0,0 +1,77 @@
+import enum
+from datetime import date
+
+from sqlalchemy import ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+from martin_eden.database import (
+    ENUM_FIELD,
+    RELATION_FIELD,
+    SIMPLE_FIELD,
+    Base,
+    MarshmallowToDataclass,
+    SqlAlchemyToMarshmallow,
+    get_model_fields,
+)
+
+
+class Color(enum.Enum):
+    red = 'red'
+    green = 'green'
+
+
+class FieldsCountry(Base):
+    __tablename__ = 'fields_country'
+    __table_args__ = {'extend_existing': True}
+    pk: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str]
+    cities: Mapped[list['FieldsCity']] = relationship(
+        back_populates='country',
+    )
+
+
+# Schema is created before related model is defined
+class FieldsCountrySchema(FieldsCountry, metaclass=SqlAlchemyToMarshmallow):
+    pass
+
+
+class FieldsCity(Base):
+    __tablename__ = 'fields_city'
+    __table_args__ = {'extend_existing': True}
+    pk: Mapped[int] = mapped_column(primary_key=True)
+    founded: Mapped[date]
+    color: Mapped[Color]
+    country_id: Mapped[int] = mapped_column(ForeignKey('fields_country.pk'))
+    country: Mapped['FieldsCountry'] = relationship(back_populates='cities')
+
+
+class FieldsCitySchema(FieldsCity, metaclass=SqlAlchemyToMarshmallow):
+    country = FieldsCountrySchema()
+
+
+class FieldsCityDataclass(FieldsCitySchema, metaclass=MarshmallowToDataclass):
+    country: FieldsCountrySchema
+
+
+def test_model_fields():
+    assert get_model_fields(FieldsCity) == (
+        ('color', ENUM_FIELD, Color),
+        ('country', RELATION_FIELD, None),
+        ('country_id', SIMPLE_FIELD, int),
+        ('founded', SIMPLE_FIELD, date),
+        ('pk', SIMPLE_FIELD, int),
+    )
+    # secondary relation "cities" is skipped
+    assert get_model_fields(FieldsCountry) == (
+        ('name', SIMPLE_FIELD, str),
+        ('pk', SIMPLE_FIELD, int),
+    )
+
+
+def test_generated_schema_and_dataclass():
+    assert list(FieldsCitySchema._declared_fields) == [
+        'color', 'country', 'country_id', 'founded', 'pk',
+    ]
+    city = FieldsCityDataclass(pk=1, color=Color.red)
+    assert city.color is Color.red
+    assert city.founded is None
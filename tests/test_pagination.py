@@ -0,0 +1,134 @@
+import json
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import asyncpg
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from martin_eden import core
+from martin_eden.core import HttpMessageHandler
+from martin_eden.database import FrameworkSession, query_cache
+from martin_eden.pagination import (
+    CachedCount,
+    CappedCount,
+    EstimateCount,
+    ExactCount,
+    Page,
+    paginate,
+)
+from martin_eden.routing import register_route
+from tests import conftest
+
+pytest_plugins = ('pytest_asyncio',)
+
+
+@register_route(
+    '/test_paginated/', 'get',
+    query_statement=select(conftest.TestModel).order_by(
+        conftest.TestModel.pk,
+    ),
+    query_params={conftest.TestModel: ['name', 'age']},
+    response_schema=conftest.TestSchema(many=True),
+    count_strategy=CappedCount(cap=3),
+    page_size=2,
+)
+async def get_paginated(page: Page) -> Page:
+    return page
+
+
+@pytest_asyncio.fixture
+async def create_session(tmp_path):
+    pytest.importorskip('aiosqlite')
+    # Every session of paginate gets its own connection,
+    # so database must be file, not memory
+    engine = create_async_engine(f'sqlite+aiosqlite:///{tmp_path}/test.db')
+    async with engine.begin() as connection:
+        await connection.run_sync(conftest.TestModel.__table__.create)
+    create_session = async_sessionmaker(
+        engine, sync_session_class=FrameworkSession,
+    )
+    async with create_session() as session:
+        session.add_all([
+            conftest.TestModel(name=f'name_{number}', age=number)
+            for number in range(5)
+        ])
+        await session.commit()
+    query_cache.clear()
+    yield create_session
+    await engine.dispose()
+
+
+def select_tests():
+    return select(conftest.TestModel).where(
+        conftest.TestModel.name.like('%name%'),
+    ).order_by(conftest.TestModel.pk)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('count_strategy, expected', [
+    (ExactCount(), (5, True, 'exact', '5')),
+    (CappedCount(cap=3), (3, False, 'capped', '3+')),
+    (CappedCount(cap=10), (5, True, 'capped', '5')),
+    # Sqlite has no estimate, exact count is used
+    (EstimateCount(), (5, True, 'exact', '5')),
+    (CachedCount(ttl=10), (5, True, 'cached_exact', '5')),
+])
+async def test_paginate_with_count_strategy(
+    create_session, count_strategy, expected,
+):
+    page = await paginate(
+        create_session, select_tests(), limit=2, offset=1,
+        count_strategy=count_strategy,
+    )
+    result = page.to_dict(conftest.TestSchema())
+
+    assert [item['name'] for item in result['items']] == [
+        'name_1', 'name_2',
+    ]
+    assert (
+        result['total'],
+        result['total_is_exact'],
+        result['count_strategy'],
+        result['total_label'],
+    ) == expected
+
+
+@pytest.mark.asyncio
+async def test_cached_count_is_invalidated(create_session):
+    count_strategy = CachedCount(ttl=10)
+    async with create_session() as session:
+        assert (await count_strategy.count(session, select_tests())).total == 5
+        session.add(conftest.TestModel(name='name_5', age=5))
+        await session.commit()
+    async with create_session() as session:
+        assert (await count_strategy.count(session, select_tests())).total == 6
+
+
+@pytest.mark.asyncio
+async def test_route_with_count_strategy(monkeypatch, create_session):
+    monkeypatch.setattr(core.db, 'create_session', create_session)
+    # Limit is not bigger than page size of route
+    handler = HttpMessageHandler(
+        conftest.create_request('/test_paginated/?offset=1&limit=5'),
+    )
+    response = await handler.handle_request()
+    result = json.loads(response.split(b'\n\n', 1)[1])
+
+    assert [item['name'] for item in result['items']] == [
+        'name_1', 'name_2',
+    ]
+    assert result['total'] == 3
+    assert result['total_label'] == '3+'
+    assert result['count_strategy'] == 'capped'
+
+
+def test_estimate_binds_values_of_filters():
+    statement = select_tests().where(
+        conftest.TestModel.age.in_([1, 2]),
+    )
+    sql, params = EstimateCount.make_explain(statement, asyncpg.dialect())
+
+    assert sql.startswith('EXPLAIN (FORMAT JSON) SELECT')
+    assert '%name%' not in sql
+    assert sorted(map(str, params)) == ['%name%', '1', '2']
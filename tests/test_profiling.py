@@ -0,0 +1,92 @@
+import asyncio
+from http import HTTPStatus
+
+import pytest
+
+from martin_eden.core import Backend, HttpMessageHandler
+from martin_eden.profiling import ProfilerConfig, RequestProfiler
+from martin_eden.settings import SettingNotDefinedError
+from tests import conftest
+
+pytest_plugins = ('pytest_asyncio',)
+
+
+async def some_request_handling() -> str:
+    await asyncio.sleep(0.02)
+    return 'result'
+
+
+@pytest.mark.asyncio
+async def test_every_n_request_is_profiled():
+    profiler = RequestProfiler()
+    profiler.enable(every_n=2)
+
+    for _ in range(4):
+        result = await profiler.run(some_request_handling(), lambda: '/test/')
+        assert result == 'result'
+
+    top_functions = profiler.get_top_functions()
+    assert profiler.requests_count == 4
+    assert any(
+        'some_request_handling' in function['function']
+        for function in top_functions['/test/']
+    )
+
+
+@pytest.mark.asyncio
+async def test_slow_request_stack_is_captured():
+    profiler = RequestProfiler()
+    profiler.enable(every_n=0, slow_threshold=0.01)
+
+    await profiler.run(some_request_handling(), lambda: '/slow/')
+
+    report = profiler.get_report()
+    assert report['slow_requests']['/slow/']['count'] == 1
+    assert report['slow_stacks'][0]['route'] == '/slow/'
+    assert report['top_functions'] == {}
+
+
+def test_configure():
+    profiler = RequestProfiler()
+    profiler.configure(ProfilerConfig(enabled=True, every_n=5))
+    assert profiler.enabled
+    assert profiler.every_n == 5
+
+    profiler.configure(ProfilerConfig(enabled=False))
+    assert not profiler.enabled
+
+
+@pytest.fixture
+def admin_backend(monkeypatch):
+    monkeypatch.setenv('SERVER_PORT', '0')
+    monkeypatch.setenv('ADMIN_ROUTES_ENABLED', '1')
+    monkeypatch.setenv('ADMIN_TOKEN', 'secret')
+    backend = Backend()
+    yield backend
+    backend.server_socket.close()
+
+
+def test_admin_routes_need_token(monkeypatch):
+    monkeypatch.setenv('SERVER_PORT', '0')
+    monkeypatch.setenv('ADMIN_ROUTES_ENABLED', '1')
+    monkeypatch.delenv('ADMIN_TOKEN', raising=False)
+    with pytest.raises(SettingNotDefinedError):
+        Backend()
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('admin_backend')
+async def test_admin_route_checks_token():
+    for authorization in (None, 'Bearer wrong'):
+        handler = HttpMessageHandler(conftest.create_request(
+            '/admin/profiler/', headers={'Authorization': authorization},
+        ))
+        await handler.handle_request()
+        assert handler.status == HTTPStatus.UNAUTHORIZED
+
+    handler = HttpMessageHandler(conftest.create_request(
+        '/admin/profiler/', headers={'Authorization': 'Bearer secret'},
+    ))
+    response = await handler.handle_request()
+    assert handler.status == HTTPStatus.OK
+    assert b'"top_functions"' in response
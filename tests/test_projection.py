@@ -0,0 +1,135 @@
+import json
+
+import pytest
+from marshmallow import Schema, fields
+from sqlalchemy import ForeignKey, inspect, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+from martin_eden.core import HttpMessageHandler
+from martin_eden.database import (
+    Base,
+    QueryTemplate,
+    get_projected_schema,
+    parse_fields,
+)
+from martin_eden.routing import register_route
+from tests import conftest
+
+pytest_plugins = ('pytest_asyncio',)
+
+
+class ProjectionAuthor(Base):
+    __tablename__ = 'test_projection_author'
+    pk: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str]
+
+
+class ProjectionBook(Base):
+    __tablename__ = 'test_projection_book'
+    pk: Mapped[int] = mapped_column(primary_key=True)
+    title: Mapped[str]
+    pages: Mapped[int]
+    author_id: Mapped[int] = mapped_column(
+        ForeignKey('test_projection_author.pk'),
+    )
+    author: Mapped[ProjectionAuthor] = relationship()
+
+
+@register_route(
+    '/test_projection/', 'get',
+    response_schema=conftest.TestSchema(many=True),
+)
+async def get_tests() -> list:
+    return [
+        {'pk': pk, 'name': f'name_{pk}', 'age': pk * 10}
+        for pk in range(1, 3)
+    ]
+
+
+def test_parse_fields_and_projected_schema():
+    schema = conftest.TestSchema(many=True)
+    field_names = parse_fields('name, unknown,age.x,pk', schema)
+    assert field_names == frozenset({'name', 'pk'})
+    assert parse_fields('unknown', schema) is None
+
+    projected_schema = get_projected_schema(schema, field_names)
+    assert set(projected_schema.fields) == {'name', 'pk'}
+    assert projected_schema is get_projected_schema(schema, field_names)
+
+
+def test_parse_nested_fields():
+    class CitySchema(Schema):
+        name = fields.Str()
+
+    class PersonSchema(Schema):
+        name = fields.Str()
+        city = fields.Nested(CitySchema)
+
+    schema = PersonSchema()
+    field_names = parse_fields('name,city.name,city.bogus', schema)
+    assert field_names == frozenset({'name', 'city.name'})
+    assert get_projected_schema(schema, field_names).dump(
+        {'name': 'Martin', 'city': {'name': 'Oakland'}},
+    ) == {'name': 'Martin', 'city': {'name': 'Oakland'}}
+
+
+@pytest.mark.asyncio
+async def test_response_with_fields():
+    handler = HttpMessageHandler(
+        conftest.create_request('/test_projection/?fields=name'),
+    )
+    response = await handler.handle_request()
+
+    body = response.decode('utf8').split('\n\n', 1)[1]
+    assert json.loads(body) == [{'name': 'name_1'}, {'name': 'name_2'}]
+
+
+@pytest.mark.asyncio
+async def test_csv_export_with_fields():
+    handler = HttpMessageHandler(conftest.create_request(
+        '/test_projection/?fields=age,name&format=csv',
+    ))
+    response = await handler.handle_request()
+
+    body = b''.join([chunk async for chunk in response]).decode('utf8')
+    assert body.split('\n\n', 1)[1].splitlines() == [
+        'age,name', '10,name_1', '20,name_2',
+    ]
+
+
+@pytest.mark.asyncio
+async def test_query_template_reads_only_requested_columns():
+    pytest.importorskip('aiosqlite')
+    engine = create_async_engine('sqlite+aiosqlite://')
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all, tables=[
+            ProjectionAuthor.__table__, ProjectionBook.__table__,
+        ])
+
+    template = QueryTemplate(
+        select(ProjectionBook), {}, use_any=False,
+        eager_relations=('author',),
+    )
+    async with async_sessionmaker(engine)() as session:
+        session.add(ProjectionBook(
+            title='Martin Eden', pages=400,
+            author=ProjectionAuthor(name='Jack London'),
+        ))
+        await session.commit()
+        session.expunge_all()
+
+        query = template.bind({}, frozenset({'title'}))
+        assert 'pages' not in str(query.statement)
+        book = (await query.execute(session)).scalar_one()
+        loaded_fields = inspect(book).dict
+        assert loaded_fields['title'] == 'Martin Eden'
+        assert 'pages' not in loaded_fields
+        assert 'author' not in loaded_fields
+        session.expunge_all()
+
+        query = template.bind({}, frozenset({'title', 'author'}))
+        book = (await query.execute(session)).scalar_one()
+        # Eager loading of requested relation is kept
+        assert inspect(book).dict['author'].name == 'Jack London'
+    await engine.dispose()
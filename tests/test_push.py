@@ -0,0 +1,156 @@
+import asyncio
+import os
+import socket
+from http import HTTPStatus
+
+import pytest
+
+from martin_eden.core import HttpMessageHandler
+from martin_eden.push import (
+    CLOSE,
+    EVENT_STREAM,
+    PING,
+    PONG,
+    TEXT,
+    WEBSOCKET,
+    Broadcaster,
+    EventStreamConnection,
+    PushMessage,
+    WebSocketConnection,
+    encode_websocket_frame,
+    get_websocket_accept_key,
+    unmask_websocket_payload,
+)
+from martin_eden.routing import register_event_stream, register_websocket
+from tests import conftest
+
+pytest_plugins = ('pytest_asyncio',)
+
+
+@register_event_stream('/test_events/')
+async def send_events(connection: EventStreamConnection) -> None:
+    connection.send('first')
+    connection.send(PushMessage('second\nline', event='update'))
+
+
+@register_websocket('/test_websocket/')
+async def echo(connection: WebSocketConnection) -> None:
+    while (message := await connection.receive()) is not None:
+        connection.send(message.upper())
+
+
+def mask_frame(payload: bytes, opcode: int = TEXT) -> bytes:
+    """Frames of client are masked"""
+    mask = os.urandom(4)
+    frame = encode_websocket_frame(payload, opcode)
+    header = bytearray(frame[:len(frame) - len(payload)])
+    header[1] |= 0x80
+    return bytes(header) + mask + unmask_websocket_payload(payload, mask)
+
+
+def test_websocket_accept_key():
+    # Example from RFC 6455
+    assert get_websocket_accept_key('dGhlIHNhbXBsZSBub25jZQ==') == (
+        's3pPLMBiTxaQ9kYGzzhZRbK+xOo='
+    )
+
+
+def test_broadcast_encodes_message_once():
+    broadcaster = Broadcaster()
+    first = EventStreamConnection()
+    second = EventStreamConnection()
+    with broadcaster.subscribe('tests', first):
+        with broadcaster.subscribe('tests', second):
+            assert broadcaster.publish('tests', 'hello') == 2
+        assert broadcaster.publish('tests', 'again') == 1
+    assert broadcaster.publish('tests', 'nobody') == 0
+    assert not broadcaster.channels
+
+    first_message = first.queue.get_nowait()
+    assert first_message is second.queue.get_nowait()
+    assert first_message.encode(EVENT_STREAM) == b'data: hello\n\n'
+    assert first_message.encode(EVENT_STREAM) is (
+        first_message.encode(EVENT_STREAM)
+    )
+
+
+@pytest.mark.asyncio
+async def test_slow_connection_is_closed(monkeypatch):
+    monkeypatch.setattr(EventStreamConnection, 'queue_size', 2)
+    connection = EventStreamConnection()
+    assert connection.send('one')
+    assert connection.send('two')
+    assert not connection.send('three')
+    assert connection.closed
+    # Messages of closed connection are dropped
+    assert [chunk async for chunk in connection.iter_messages()] == []
+
+
+@pytest.mark.asyncio
+async def test_event_stream_route():
+    handler = HttpMessageHandler(conftest.create_request('/test_events/'))
+    stream = await handler.handle_request()
+    chunks = [chunk async for chunk in stream]
+
+    assert b'Content-Type: text/event-stream' in chunks[0]
+    assert b'Cache-Control: no-cache' in chunks[0]
+    assert chunks[1:] == [
+        b'data: first\n\n',
+        b'event: update\ndata: second\ndata: line\n\n',
+    ]
+
+
+@pytest.mark.asyncio
+async def test_event_stream_heartbeat(monkeypatch):
+    monkeypatch.setattr(EventStreamConnection, 'heartbeat_interval', 0.01)
+    connection = EventStreamConnection()
+    messages = connection.iter_messages()
+    assert await messages.__anext__() == b': heartbeat\n\n'
+    connection.close()
+    assert [chunk async for chunk in messages] == []
+
+
+@pytest.mark.asyncio
+async def test_websocket_echo():
+    handler = HttpMessageHandler(conftest.create_request(
+        '/test_websocket/', headers={
+            'Upgrade': 'websocket',
+            'Sec-WebSocket-Key': 'dGhlIHNhbXBsZSBub25jZQ==',
+        },
+    ))
+    connection = await handler.handle_request()
+    assert handler.status == HTTPStatus.SWITCHING_PROTOCOLS
+    assert connection.kind == WEBSOCKET
+
+    loop = asyncio.get_running_loop()
+    server_socket, client_socket = socket.socketpair()
+    server_socket.setblocking(False)
+    client_socket.setblocking(False)
+    server_task = asyncio.create_task(connection.run(loop, server_socket))
+
+    async def receive_until(expected: bytes) -> bytes:
+        received = b''
+        while not received.endswith(expected):
+            received += await loop.sock_recv(client_socket, 65536)
+        return received
+
+    await loop.sock_sendall(client_socket, mask_frame(b'hello'))
+    received = await receive_until(encode_websocket_frame(b'HELLO'))
+    assert received.startswith(b'HTTP/1.1 101 Switching Protocols\r\n')
+    assert b's3pPLMBiTxaQ9kYGzzhZRbK+xOo=' in received
+
+    await loop.sock_sendall(client_socket, mask_frame(b'ping', PING))
+    received += await receive_until(encode_websocket_frame(b'ping', PONG))
+    await loop.sock_sendall(client_socket, mask_frame(b'', CLOSE))
+    received += await receive_until(encode_websocket_frame(b'', CLOSE))
+    assert await server_task == len(received)
+    server_socket.close()
+    client_socket.close()
+
+
+@pytest.mark.asyncio
+async def test_websocket_route_without_upgrade():
+    handler = HttpMessageHandler(conftest.create_request('/test_websocket/'))
+    response = await handler.handle_request()
+    assert handler.status == HTTPStatus.BAD_REQUEST
+    assert response.startswith(b'HTTP/1.0 400')
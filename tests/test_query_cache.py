@@ -0,0 +1,88 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from martin_eden.database import FrameworkSession, QueryCache, query_cache
+from tests import conftest
+
+pytest_plugins = ('pytest_asyncio',)
+
+
+@pytest_asyncio.fixture
+async def create_session():
+    pytest.importorskip('aiosqlite')
+    engine = create_async_engine('sqlite+aiosqlite://')
+    async with engine.begin() as connection:
+        await connection.run_sync(conftest.TestModel.__table__.create)
+    query_cache.clear()
+    yield async_sessionmaker(engine, sync_session_class=FrameworkSession)
+    await engine.dispose()
+
+
+def select_tests():
+    return select(conftest.TestModel).where(
+        conftest.TestModel.age.in_([1, 2]),
+    ).order_by(conftest.TestModel.pk)
+
+
+@pytest.mark.asyncio
+async def test_query_cache_hit_and_invalidation(create_session):
+    async with create_session() as session:
+        session.add(conftest.TestModel(name='one', age=1))
+        await session.commit()
+
+    async with create_session() as session:
+        result = await query_cache.execute(session, select_tests())
+        assert [test.name for test in result.scalars()] == ['one']
+    hits = query_cache.hits
+
+    async with create_session() as session:
+        result = await query_cache.execute(session, select_tests())
+        tests = result.scalars().all()
+        assert [test.name for test in tests] == ['one']
+        # Object of cached result belongs to session of caller
+        assert tests[0] in session
+    assert query_cache.hits == hits + 1
+
+    async with create_session() as session:
+        session.add(conftest.TestModel(name='two', age=2))
+        await session.commit()
+
+    async with create_session() as session:
+        result = await query_cache.execute(session, select_tests())
+        assert [test.name for test in result.scalars()] == ['one', 'two']
+    assert query_cache.hits == hits + 1
+
+
+def test_key_has_values_of_parameters():
+    dialect = sqlite.dialect()
+    key = QueryCache.make_key(select_tests(), dialect)
+    assert key == QueryCache.make_key(select_tests(), dialect)
+    assert key[-1] == ((1, 2),)
+    assert key != QueryCache.make_key(
+        select(conftest.TestModel).where(
+            conftest.TestModel.age.in_([3]),
+        ).order_by(conftest.TestModel.pk),
+        dialect,
+    )
+
+
+def test_query_cache_lru_and_stale_results():
+    cache = QueryCache(max_size=2)
+    cache.set(('a',), frozenset({'test'}), 'first')
+    cache.set(('b',), frozenset({'test'}), 'second')
+    cache.get(('a',))
+    cache.set(('c',), frozenset({'other'}), 'third')
+    assert list(cache.entries) == [('a',), ('c',)]
+
+    invalidations_count = cache.invalidations_count
+    cache.invalidate_tables(['test'])
+    assert list(cache.entries) == [('c',)]
+    # Result was read before invalidation of its table
+    cache.set(
+        ('d',), frozenset({'test'}), 'stale',
+        invalidations_count=invalidations_count,
+    )
+    assert ('d',) not in cache.entries
@@ -0,0 +1,92 @@
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from martin_eden.core import HttpMessageHandler
+from martin_eden.database import BoundQuery, QueryTemplate
+from martin_eden.routing import ControllerDefinitionError, register_route
+from tests import conftest
+
+pytest_plugins = ('pytest_asyncio',)
+
+QUERY_FILTERS = {conftest.TestModel: ['name', 'age']}
+
+received_queries = []
+
+
+@register_route(
+    '/test_template/', 'get',
+    query_params=QUERY_FILTERS,
+    query_statement=select(conftest.TestModel),
+)
+async def get_tests(query: BoundQuery) -> list:
+    received_queries.append(query)
+    return []
+
+
+def test_same_shape_gets_the_same_statement():
+    template = QueryTemplate(select(conftest.TestModel), QUERY_FILTERS)
+    first_query = template.bind({
+        'test__age__in': '1,2', 'test__name__like': 'a',
+    })
+    second_query = template.bind({
+        'test__name__like': 'b', 'test__age__in': '3',
+    })
+
+    assert first_query.statement is second_query.statement
+    assert second_query.params == {
+        'test__age__in': [3], 'test__name__like': '%b%',
+    }
+
+
+def test_sql_with_any_does_not_depend_on_length_of_list():
+    template = QueryTemplate(
+        select(conftest.TestModel), QUERY_FILTERS, use_any=True,
+    )
+    statement = template.bind({'test__age__in': '1,2,3'}).statement
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+    assert '= ANY (%(test__age__in)s' in sql
+
+
+@pytest.mark.asyncio
+async def test_bound_query_execute():
+    pytest.importorskip('aiosqlite')
+    engine = create_async_engine('sqlite+aiosqlite://')
+    async with engine.begin() as connection:
+        await connection.run_sync(conftest.TestModel.__table__.create)
+
+    template = QueryTemplate(
+        select(conftest.TestModel.name), QUERY_FILTERS, use_any=False,
+    )
+    async with async_sessionmaker(engine)() as session:
+        session.add_all([
+            conftest.TestModel(name=name, age=age)
+            for name, age in (('one', 1), ('two', 2), ('three', 3))
+        ])
+        await session.commit()
+
+        for value, names in (('1,3', ['one', 'three']), ('2', ['two'])):
+            query = template.bind({'test__age__in': value})
+            result = await query.execute(session)
+            assert sorted(result.scalars()) == sorted(names)
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_controller_gets_bound_query():
+    received_queries.clear()
+    handler = HttpMessageHandler(conftest.create_request(
+        '/test_template/?test__age__exactly=5&format=json',
+    ))
+    await handler.handle_request()
+
+    query, = received_queries
+    assert query.params == {'test__age__exactly': [5]}
+
+
+def test_query_argument_needs_query_statement():
+    with pytest.raises(ControllerDefinitionError):
+        @register_route('/test_template_error/', 'get')
+        async def get_tests_without_statement(query: BoundQuery) -> list:
+            return list(query.params)
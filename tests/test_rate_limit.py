@@ -0,0 +1,109 @@
+from http import HTTPStatus
+
+import pytest
+
+from martin_eden.core import HttpMessageHandler
+from martin_eden.http_utils import HttpHeadersParser
+from martin_eden.rate_limit import (
+    API_KEY,
+    InMemoryRateLimitStore,
+    RateLimit,
+    RateLimiter,
+    rate_limiter,
+)
+from martin_eden.routing import register_route
+from tests import conftest
+
+pytest_plugins = ('pytest_asyncio',)
+
+
+@register_route(
+    '/test_rate_limit/', 'get',
+    rate_limit=RateLimit(rate=1, burst=2),
+)
+async def get_limited() -> str:
+    return '"ok"'
+
+
+def test_token_bucket():
+    store = InMemoryRateLimitStore()
+    rate_limit = RateLimit(rate=2, burst=2)
+    assert store.acquire('a', rate_limit, 10) == 0
+    assert store.acquire('a', rate_limit, 10) == 0
+    assert store.acquire('a', rate_limit, 10) == 0.5
+    # Other key has own bucket
+    assert store.acquire('b', rate_limit, 10) == 0
+    # Bucket gets one token in 0.5 seconds
+    assert store.acquire('a', rate_limit, 10.5) == 0
+
+
+def test_eviction_of_buckets():
+    store = InMemoryRateLimitStore(max_keys=2, eviction_interval=5)
+    rate_limit = RateLimit(rate=1, burst=1)
+    store.acquire('a', rate_limit, 0)
+    store.acquire('b', rate_limit, 0)
+    store.acquire('a', rate_limit, 0)
+    store.acquire('c', rate_limit, 0)
+    # Least recently used bucket is removed
+    assert list(store.buckets) == ['a', 'c']
+
+    store.buckets['c'] = (1, 3, 3)
+    store.acquire('d', rate_limit, 5)
+    # Full buckets are the same as absent ones
+    assert list(store.buckets) == ['d']
+
+
+def test_keys_of_buckets():
+    limiter = RateLimiter()
+    limiter.configure(
+        RateLimit(rate=1, burst=1, key=API_KEY),
+        trusted_header='X-Forwarded-For',
+    )
+    assert limiter.check(None, '/a/', '1.1.1.1', {'x-api-key': 'one'}) == 0
+    assert limiter.check(None, '/b/', '1.1.1.1', {'x-api-key': 'one'}) > 0
+    assert limiter.check(None, '/a/', '1.1.1.1', {'x-api-key': 'two'}) == 0
+
+    route_limit = RateLimit(rate=1, burst=1)
+    headers = {'x-forwarded-for': '2.2.2.2, 10.0.0.1'}
+    assert limiter.get_client_ip('10.0.0.1', headers) == '2.2.2.2'
+    assert limiter.check(route_limit, '/a/', '10.0.0.1', headers) == 0
+    assert limiter.check(route_limit, '/a/', '10.0.0.1', headers) > 0
+    assert limiter.check(route_limit, '/a/', '10.0.0.1', {}) == 0
+    assert limiter.rejected_count == 2
+
+
+@pytest.mark.asyncio
+async def test_too_many_requests():
+    request = conftest.create_request('/test_rate_limit/')
+
+    for _ in range(2):
+        handler = HttpMessageHandler(request, '3.3.3.3')
+        await handler.handle_request()
+        assert handler.status == HTTPStatus.OK
+
+    handler = HttpMessageHandler(request, '3.3.3.3')
+    response = await handler.handle_request()
+    assert handler.status == HTTPStatus.TOO_MANY_REQUESTS
+    parser = HttpHeadersParser(response.decode('utf8'))
+    assert parser.headers['retry-after'] == '1'
+    assert parser.body == '429 too many requests'
+
+    handler = HttpMessageHandler(request, '4.4.4.4')
+    await handler.handle_request()
+    assert handler.status == HTTPStatus.OK
+
+
+@pytest.mark.asyncio
+async def test_unknown_path_counts_against_default_limit():
+    rate_limiter.configure(RateLimit(rate=1, burst=1))
+    try:
+        request = conftest.create_request('/test_rate_limit_unknown/')
+        handler = HttpMessageHandler(request, '5.5.5.5')
+        response = await handler.handle_request()
+        assert response.endswith(b'404 not found')
+
+        handler = HttpMessageHandler(request, '5.5.5.5')
+        await handler.handle_request()
+        assert handler.status == HTTPStatus.TOO_MANY_REQUESTS
+    finally:
+        rate_limiter.configure(None)
@@ -0,0 +1,88 @@
+from http import HTTPStatus
+
+import pytest
+
+from martin_eden.core import HttpMessageHandler
+from martin_eden.http_utils import (
+    HttpHeadersParser,
+    Request,
+    Response,
+)
+from martin_eden.routing import register_route
+from tests import conftest
+
+pytest_plugins = ('pytest_asyncio',)
+
+
+@register_route('/test_request/', 'get')
+async def get_with_request(request: Request) -> Response:
+    return Response(
+        f'"{request.cookies["person_pk"]} {request.client_address}"',
+        status=HTTPStatus.CREATED,
+        headers={'Cache-Control': 'max-age=60'},
+    )
+
+
+@register_route('/test_request/', 'post')
+async def post_raw_body(request: Request) -> Response:
+    return Response(str(request.json()['age'] + 1), content_type='text/plain')
+
+
+@register_route('/test_stream_response/', 'get')
+async def get_stream() -> Response:
+    async def iter_body():
+        yield 'first,'
+        yield b'second'
+
+    return Response(iter_body(), content_type='text/plain')
+
+
+def test_request_is_parsed_lazily():
+    parser = HttpHeadersParser(
+        conftest.create_request('/test_request/?a=1').decode('utf8'),
+    )
+    request = Request(parser, '1.1.1.1')
+    assert 'headers' not in parser.__dict__
+    assert request.path == '/test_request/'
+    assert request.query_params == {'a': '1'}
+    assert 'headers' not in parser.__dict__
+
+    assert request.cookies['person_pk'] == '1'
+    assert request.cookies['token'] == (
+        'a0966813f9b27b2a545c75966fd87815660787a3'  # noqa: S105
+    )
+    assert request.headers['host'] == 'localhost:8001'
+    assert not hasattr(request, '__dict__')
+
+
+@pytest.mark.asyncio
+async def test_controller_gets_request_and_returns_response():
+    handler = HttpMessageHandler(
+        conftest.create_request('/test_request/'), '1.1.1.1',
+    )
+    response = await handler.handle_request()
+
+    assert handler.status == HTTPStatus.CREATED
+    parser = HttpHeadersParser(response.decode('utf8'))
+    assert parser.headers['cache-control'] == 'max-age=60'
+    assert parser.body == '"1 1.1.1.1"'
+
+
+@pytest.mark.asyncio
+async def test_post_controller_reads_body():
+    handler = HttpMessageHandler(conftest.create_request(
+        '/test_request/', 'POST', body='{"age": 30}',
+    ))
+    response = await handler.handle_request()
+    assert HttpHeadersParser(response.decode('utf8')).body == '31'
+
+
+@pytest.mark.asyncio
+async def test_streaming_body():
+    handler = HttpMessageHandler(
+        conftest.create_request('/test_stream_response/'),
+    )
+    stream = await handler.handle_request()
+    chunks = [chunk async for chunk in stream]
+    assert chunks[0].startswith(b'HTTP/1.0 200')
+    assert chunks[1:] == [b'first,', b'second']
@@ -0,0 +1,79 @@
+import json
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import asyncpg
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import Mapped, mapped_column
+
+from martin_eden.database import (
+    Base,
+    QueryTemplate,
+    create_search_indexes,
+    render_search_indexes_migration,
+)
+from martin_eden.openapi import OpenApiBuilder
+from martin_eden.pagination import EstimateCount
+
+pytest_plugins = ('pytest_asyncio',)
+
+
+class SearchModel(Base):
+    __tablename__ = 'test_search'
+    pk: Mapped[int] = mapped_column(primary_key=True)
+    title: Mapped[str]
+
+
+search_indexes = create_search_indexes(SearchModel, ['title'])
+
+
+def test_migration_of_search_indexes():
+    migration = render_search_indexes_migration(search_indexes)
+
+    assert 'CREATE EXTENSION IF NOT EXISTS pg_trgm' in migration
+    assert (
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_test_search_title_search '
+        'ON test_search USING gin (to_tsvector(\'simple\', title))'
+    ) in migration
+    assert (
+        'ON test_search USING gin (title gin_trgm_ops)'
+    ) in migration
+    assert 'DROP INDEX CONCURRENTLY IF EXISTS' in migration
+    # Rendering of migration doesn't change indexes of table
+    assert not search_indexes[0].dialect_options['postgresql']['concurrently']
+
+
+@pytest.mark.asyncio
+async def test_search_indexes_are_skipped_in_other_databases():
+    pytest.importorskip('aiosqlite')
+    engine = create_async_engine('sqlite+aiosqlite://')
+    async with engine.begin() as connection:
+        await connection.run_sync(SearchModel.__table__.create)
+    await engine.dispose()
+
+
+def test_openapi_has_search_filters():
+    openapi = json.loads(OpenApiBuilder().get_openapi_json())
+    parameter_names = [
+        parameter['name'] for parameter
+        in openapi['paths']['/test_query/']['get']['parameters']
+    ]
+    assert 'test__name__search' in parameter_names
+    assert 'test__name__trigram' in parameter_names
+    assert 'test__age__search' not in parameter_names
+
+
+def test_estimate_of_search_filter_compiles_for_postgres():
+    template = QueryTemplate(
+        select(SearchModel), {SearchModel: ['title']}, use_any=True,
+    )
+    query = template.bind({'test_search__title__search': 'martin eden'})
+    statement = query.statement.params(query.params)
+    sql, params = EstimateCount.make_explain(statement, asyncpg.dialect())
+
+    assert "plainto_tsquery('simple', $1::VARCHAR)" in sql
+    assert params == ('martin eden',)
+    # Value of search has type, so it can be rendered as literal too
+    assert "'martin eden'" in str(statement.compile(
+        dialect=asyncpg.dialect(), compile_kwargs={'literal_binds': True},
+    ))
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from martin_eden.core import HttpMessageHandler
+from martin_eden.routing import register_route
+from martin_eden.serialization import (
+    PROCESS,
+    THREAD,
+    estimate_size,
+    serializer,
+)
+from tests import conftest
+
+pytest_plugins = ('pytest_asyncio',)
+
+
+@register_route('/test_offload/', 'get', offload_serialization=True)
+async def get_big_response() -> list:
+    return [{'number': number} for number in range(100)]
+
+
+def test_estimate_size_of_big_list():
+    rows = [{'name': 'x' * 10, 'age': 1}] * 100000
+    estimation = estimate_size(rows)
+    assert 0.5 < estimation / len(json.dumps(rows)) < 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('executor_kind', [THREAD, PROCESS])
+async def test_big_response_is_serialized_in_pool(executor_kind):
+    histogram = serializer.offloaded_histograms[executor_kind]
+    count_before = histogram.count
+    serializer.configure(size_threshold=100, executor_kind=executor_kind)
+    try:
+        small_result = await serializer.dumps([1])
+        big_result = await serializer.dumps(list(range(100)))
+    finally:
+        serializer.configure(size_threshold=0)
+
+    assert small_result == '[1]'
+    assert big_result == json.dumps(list(range(100)))
+    assert histogram.count == count_before + 1
+
+
+@pytest.mark.asyncio
+async def test_route_with_offload_serialization():
+    histogram = serializer.offloaded_histograms[THREAD]
+    count_before = histogram.count
+    handler = HttpMessageHandler(conftest.create_request('/test_offload/'))
+    response = await handler.handle_request()
+
+    body = response.decode('utf8').split('\n\n', 1)[1]
+    assert json.loads(body)[99] == {'number': 99}
+    assert histogram.count == count_before + 1
@@ -0,0 +1,80 @@
+import asyncio
+import signal
+from http import HTTPStatus
+
+import pytest
+
+from martin_eden.core import Backend, HttpMessageHandler, readiness
+from martin_eden.http_utils import HttpHeadersParser
+from martin_eden.routing import register_route
+from tests import conftest
+
+pytest_plugins = ('pytest_asyncio',)
+
+HEALTH_REQUEST = conftest.create_request('/health/')
+
+
+@register_route('/test_slow/', 'get')
+async def get_slow() -> str:
+    await asyncio.sleep(0.1)
+    return '"slow"'
+
+
+@pytest.fixture
+def not_ready():
+    readiness.ready = False
+    yield
+    readiness.ready = True
+
+
+@pytest.mark.asyncio
+async def test_health_is_ready():
+    handler = HttpMessageHandler(HEALTH_REQUEST)
+    response = await handler.handle_request()
+    assert handler.status == HTTPStatus.OK
+    assert HttpHeadersParser(response.decode('utf8')).body == (
+        '{"status": "ready"}'
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('not_ready')
+async def test_health_is_not_ready_during_drain():
+    handler = HttpMessageHandler(HEALTH_REQUEST)
+    response = await handler.handle_request()
+    assert handler.status == HTTPStatus.SERVICE_UNAVAILABLE
+    assert response.startswith(b'HTTP/1.0 503')
+
+
+@pytest.mark.asyncio
+async def test_shutdown_drains_requests(monkeypatch):
+    monkeypatch.setenv('SERVER_PORT', '0')
+    monkeypatch.setenv('LOOP_MONITOR_INTERVAL', '0')
+    backend = Backend()
+    main_task = asyncio.create_task(backend.main())
+    await asyncio.sleep(0.01)
+    port = backend.server_socket.getsockname()[1]
+
+    reader, writer = await asyncio.open_connection('localhost', port)
+    writer.write(conftest.create_request('/test_slow/'))
+    await writer.drain()
+    await asyncio.sleep(0.02)
+    assert len(backend.request_tasks) == 1
+
+    backend.stop()
+    await asyncio.sleep(0.01)
+    assert not readiness.ready
+    # Request, that was accepted before stop, gets its response
+    response = await reader.read()
+    assert response.endswith(b'"slow"')
+    writer.close()
+
+    await asyncio.wait_for(main_task, 1)
+    assert not backend.request_tasks
+    with pytest.raises(OSError):
+        await asyncio.open_connection('localhost', port)
+
+    loop = asyncio.get_running_loop()
+    for stop_signal in (signal.SIGTERM, signal.SIGINT, signal.SIGUSR1):
+        loop.remove_signal_handler(stop_signal)
+    readiness.ready = True
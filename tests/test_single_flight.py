@@ -0,0 +1,130 @@
+import asyncio
+from http import HTTPStatus
+
+import pytest
+
+from martin_eden.core import HttpMessageHandler
+from martin_eden.http_utils import Request, Response
+from martin_eden.routing import ControllerDefinitionError, register_route
+from martin_eden.single_flight import SingleFlight
+from tests import conftest
+
+pytest_plugins = ('pytest_asyncio',)
+
+QUERY_FILTERS = {conftest.TestModel: ['name', 'age']}
+
+executions = []
+
+
+@register_route(
+    '/test_single_flight/', 'get',
+    query_params=QUERY_FILTERS,
+    single_flight=True,
+)
+async def get_tests(query_params: list) -> list:
+    executions.append(query_params)
+    await asyncio.sleep(0.01)
+    return list(map(str, query_params))
+
+
+@register_route(
+    '/test_single_flight/', 'post',
+    request_schema=conftest.TestSchema(),
+    single_flight=True,
+)
+async def create_test(test: conftest.TestDataclass) -> list:
+    executions.append(test)
+    await asyncio.sleep(0.01)
+    return [len(executions)]
+
+
+@register_route('/test_single_flight_status/', 'get', single_flight=True)
+async def get_created() -> Response:
+    executions.append(1)
+    await asyncio.sleep(0.01)
+    return Response('"created"', status=HTTPStatus.CREATED)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_gets_share_response():
+    executions.clear()
+    requests = [
+        conftest.create_request(f'/test_single_flight/?{query}')
+        for query in (
+            'test__age__exactly=1&test__name__like=a',
+            'test__name__like=a&test__age__exactly=1',
+            'test__age__exactly=1&test__name__like=a',
+            'test__age__exactly=2',
+        )
+    ]
+    responses = await asyncio.gather(*(
+        HttpMessageHandler(request).handle_request() for request in requests
+    ))
+
+    assert len(executions) == 2
+    assert responses[0] is responses[1] is responses[2]
+    assert responses[0] != responses[3]
+
+    # Result is not cached after execution
+    await HttpMessageHandler(requests[0]).handle_request()
+    assert len(executions) == 3
+
+
+@pytest.mark.asyncio
+async def test_posts_are_not_shared():
+    executions.clear()
+    request = conftest.create_request(
+        '/test_single_flight/', 'POST',
+        body='{"pk": 1, "name": "martin", "age": 30}',
+    )
+    await asyncio.gather(
+        HttpMessageHandler(request).handle_request(),
+        HttpMessageHandler(request).handle_request(),
+    )
+    assert len(executions) == 2
+
+
+@pytest.mark.asyncio
+async def test_error_is_shared_and_cancel_does_not_stop_others():
+    flight = SingleFlight()
+    calls = []
+
+    async def fail() -> None:
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise ValueError('error')
+
+    first = asyncio.create_task(flight.run('key', fail))
+    second = asyncio.create_task(flight.run('key', fail))
+    await asyncio.sleep(0)
+    first.cancel()
+    with pytest.raises(ValueError):
+        await second
+    assert calls == [1]
+    assert flight.shared_count == 1
+    assert not flight.flights
+
+
+@pytest.mark.asyncio
+async def test_status_is_shared():
+    executions.clear()
+    handlers = [
+        HttpMessageHandler(
+            conftest.create_request('/test_single_flight_status/'),
+        )
+        for _ in range(2)
+    ]
+    await asyncio.gather(*(handler.handle_request() for handler in handlers))
+    assert len(executions) == 1
+    assert [handler.status for handler in handlers] == [
+        HTTPStatus.CREATED, HTTPStatus.CREATED,
+    ]
+
+
+def test_request_argument_is_not_allowed():
+    with pytest.raises(ControllerDefinitionError):
+        @register_route(
+            '/test_single_flight_request/', 'get', single_flight=True,
+        )
+        async def get_with_request(request: Request) -> str:
+            return request.path
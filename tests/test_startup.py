@@ -0,0 +1,44 @@
+import subprocess
+import sys
+
+import pytest
+
+from martin_eden.database import DataBase
+from martin_eden.settings import SettingNotDefinedError, Settings
+
+
+def test_import_of_package_is_lazy():
+    output = subprocess.check_output([  # noqa: S603
+        sys.executable, '-c',
+        'import sys, martin_eden; '
+        'print("martin_eden.core" in sys.modules)',
+    ])
+    assert output.strip() == b'False'
+
+
+def test_import_of_routing_does_not_import_database():
+    output = subprocess.check_output([  # noqa: S603
+        sys.executable, '-c',
+        'import sys, martin_eden.routing; '
+        'print("sqlalchemy" in sys.modules)',
+    ])
+    assert output.strip() == b'False'
+
+
+def test_settings_are_read_on_access(monkeypatch):
+    monkeypatch.delenv('SERVER_HOST', raising=False)
+    settings = Settings()
+    with pytest.raises(SettingNotDefinedError):
+        _ = settings.server_host
+
+    monkeypatch.setenv('SERVER_HOST', 'example.com')
+    assert Settings().server_host == 'example.com'
+
+
+def test_database_engine_is_created_on_access():
+    database = DataBase()
+    assert database.get_pool_stats() == []
+    assert 'engine' not in database.__dict__
+
+    assert database.engine is database.engine
+    assert database.get_pool_stats()
@@ -0,0 +1,196 @@
+import asyncio
+import gzip
+import signal
+from http import HTTPStatus
+from typing import Optional
+
+import pytest
+
+from martin_eden.core import Backend, HttpMessageHandler, readiness
+from martin_eden.routing import register_static_directory
+from martin_eden.static import (
+    FileResponse,
+    RangeNotSatisfiableError,
+    parse_range,
+)
+from tests import conftest
+
+pytest_plugins = ('pytest_asyncio',)
+
+CONTENT = b'0123456789' * 1000
+
+
+@pytest.fixture
+def static_directory(tmp_path):
+    directory = tmp_path / 'static'
+    directory.mkdir()
+    (directory / 'data.txt').write_bytes(CONTENT)
+    (directory / 'app.js').write_bytes(b'console.log(1)')
+    (directory / 'app.js.gz').write_bytes(gzip.compress(b'console.log(1)'))
+    (directory / 'my report%.csv').write_bytes(b'a,b')
+    (tmp_path / 'secret.txt').write_bytes(b'secret')
+    register_static_directory(
+        '/test_static/', str(directory),
+        headers={'Cache-Control': 'max-age=60'},
+    )
+    return directory
+
+
+def make_request(
+    path: str, method: str = 'GET', headers: Optional[dict] = None,
+) -> bytes:
+    """Files are requested without Accept-Encoding of base request"""
+    return conftest.create_request(
+        path, method, headers={'Accept-Encoding': None, **(headers or {})},
+    )
+
+
+async def get_file(path: str, headers: Optional[dict] = None):
+    handler = HttpMessageHandler(make_request(path, headers=headers))
+    response = await handler.handle_request()
+    return handler, response
+
+
+def read_file_response(response: FileResponse) -> bytes:
+    with response.file:
+        response.file.seek(response.offset)
+        return response.file.read(response.count)
+
+
+def test_parse_range():
+    assert parse_range('bytes=0-99', 1000) == (0, 100)
+    assert parse_range('bytes=900-', 1000) == (900, 100)
+    assert parse_range('bytes=-100', 1000) == (900, 100)
+    assert parse_range('bytes=990-2000', 1000) == (990, 10)
+    # Several ranges and broken headers are ignored
+    assert parse_range('bytes=0-1,5-6', 1000) is None
+    assert parse_range('bytes=9-1', 1000) is None
+    assert parse_range('items=0-1', 1000) is None
+    with pytest.raises(RangeNotSatisfiableError):
+        parse_range('bytes=1000-', 1000)
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('static_directory')
+async def test_file_with_validators():
+    handler, response = await get_file('/test_static/data.txt')
+    assert isinstance(response, FileResponse)
+    assert handler.status == HTTPStatus.OK
+    assert handler.route == '/test_static/'
+    assert response.headers['Content-Length'] == str(len(CONTENT))
+    assert response.headers['Cache-Control'] == 'max-age=60'
+    assert b'Content-Type: text/plain\n' in response.render_headers()
+    assert read_file_response(response) == CONTENT
+
+    etag = response.headers['ETag']
+    handler, response = await get_file(
+        '/test_static/data.txt', {'If-None-Match': etag},
+    )
+    assert handler.status == HTTPStatus.NOT_MODIFIED
+    assert response.startswith(b'HTTP/1.0 304')
+
+    last_modified = response.decode('utf8').split('Last-Modified: ')[1]
+    handler, response = await get_file(
+        '/test_static/data.txt',
+        {'If-Modified-Since': last_modified.splitlines()[0]},
+    )
+    assert handler.status == HTTPStatus.NOT_MODIFIED
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('static_directory')
+async def test_range():
+    handler, response = await get_file(
+        '/test_static/data.txt', {'Range': 'bytes=10-19'},
+    )
+    assert handler.status == HTTPStatus.PARTIAL_CONTENT
+    assert response.headers['Content-Range'] == f'bytes 10-19/{len(CONTENT)}'
+    assert read_file_response(response) == b'0123456789'
+
+    # Range of changed file is not applied
+    handler, response = await get_file(
+        '/test_static/data.txt',
+        {'Range': 'bytes=10-19', 'If-Range': '"old"'},
+    )
+    assert handler.status == HTTPStatus.OK
+    response.file.close()
+
+    handler, response = await get_file(
+        '/test_static/data.txt', {'Range': 'bytes=20000-'},
+    )
+    assert handler.status == HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE
+    assert f'Content-Range: bytes */{len(CONTENT)}'.encode() in response
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('static_directory')
+async def test_precompressed_gzip():
+    handler, response = await get_file(
+        '/test_static/app.js', {'Accept-Encoding': 'gzip, br'},
+    )
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert response.content_type.endswith('javascript')
+    assert gzip.decompress(read_file_response(response)) == b'console.log(1)'
+
+    handler, response = await get_file('/test_static/app.js')
+    assert 'Content-Encoding' not in response.headers
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert read_file_response(response) == b'console.log(1)'
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('static_directory')
+async def test_path_outside_directory():
+    for path in (
+        '/test_static/../secret.txt', '/test_static/%2E%2E/secret.txt',
+    ):
+        handler, response = await get_file(path)
+        assert handler.status == HTTPStatus.NOT_FOUND
+        assert not isinstance(response, FileResponse)
+
+    handler, _ = await get_file('/test_static/missing.txt')
+    assert handler.status == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('static_directory')
+async def test_encoded_name_and_head():
+    handler, response = await get_file('/test_static/my%20report%25.csv')
+    assert handler.status == HTTPStatus.OK
+    assert read_file_response(response) == b'a,b'
+
+    handler = HttpMessageHandler(
+        make_request('/test_static/data.txt', 'HEAD'),
+    )
+    response = await handler.handle_request()
+    assert handler.status == HTTPStatus.OK
+    assert response.endswith(f'Content-Length: {len(CONTENT)}\n\n'.encode())
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('static_directory')
+async def test_sendfile(monkeypatch):
+    monkeypatch.setenv('SERVER_PORT', '0')
+    monkeypatch.setenv('LOOP_MONITOR_INTERVAL', '0')
+    backend = Backend()
+    main_task = asyncio.create_task(backend.main())
+    await asyncio.sleep(0.01)
+    port = backend.server_socket.getsockname()[1]
+
+    reader, writer = await asyncio.open_connection('localhost', port)
+    writer.write(make_request(
+        '/test_static/data.txt', headers={'Range': 'bytes=-15'},
+    ))
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    assert response.startswith(b'HTTP/1.0 206')
+    assert response.endswith(b'\n\n' + CONTENT[-15:])
+
+    backend.stop()
+    await asyncio.wait_for(main_task, 1)
+    loop = asyncio.get_running_loop()
+    for stop_signal in (signal.SIGTERM, signal.SIGINT, signal.SIGUSR1):
+        loop.remove_signal_handler(stop_signal)
+    readiness.ready = True